@@ -0,0 +1,95 @@
+# Benchmark mesin analitik fakta: kubus NumPy vs. perulangan Python per sel.
+#
+#   python -m benchmarks.bench_analytics --metrics 200 --years 10
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "stub")
+os.environ.setdefault("VOYAGE_API_KEY", "stub")
+os.environ.setdefault("GEMINI_API_KEY", "stub")
+os.environ.setdefault("QDRANT_URL", "http://localhost:6333")
+
+from services.banks import BANKS
+from services.analytics import FactCube
+
+
+def make_facts(metrics, years, seed=0):
+    rng = random.Random(seed)
+    facts = []
+    for bank in BANKS:
+        for m in range(metrics):
+            value = rng.uniform(1e5, 1e8)
+            for year in range(2024 - years + 1, 2025):
+                value *= rng.uniform(0.8, 1.3)
+                facts.append({
+                    "bank": bank, "tahun": year, "metric": f"metrik {m}",
+                    "value": round(value), "unit": "jutaan Rupiah",
+                })
+    return facts
+
+
+def python_baseline(facts, banks, metrics, years):
+    # Cara lama: hitung tiap sel satu per satu dari dict, dengan keluaran setara analyze()
+    table = {(f["bank"], f["metric"], f["tahun"]): f["value"] for f in facts}
+    result = {}
+    for bank in banks:
+        for metric in metrics:
+            series = [table.get((bank, metric, y)) for y in years]
+            pairs = list(zip(series, series[1:]))
+            diff = [curr - prev if prev is not None and curr is not None else None for prev, curr in pairs]
+            growth = [d / abs(prev) if d is not None and prev else None for d, (prev, _) in zip(diff, pairs)]
+            first, last = series[0], series[-1]
+            cagr = (last / first) ** (1 / (len(years) - 1)) - 1 if first and last and first > 0 and last > 0 else None
+            reference = [table.get((banks[0], metric, y)) for y in years]
+            vs_diff = [v - r if v is not None and r is not None else None for v, r in zip(series, reference)]
+            vs_ratio = [v / r if v is not None and r else None for v, r in zip(series, reference)]
+            result[(bank, metric)] = (series, diff, growth, cagr, vs_diff, vs_ratio)
+    return result
+
+
+def main(args):
+    facts = make_facts(args.metrics, args.years)
+    banks = list(BANKS)
+    metrics = [f"metrik {m}" for m in range(args.metrics)]
+    years = list(range(2024 - args.years + 1, 2025))
+
+    start = time.perf_counter()
+    cube = FactCube(facts)
+    build_seconds = time.perf_counter() - start
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        cube.analyze(banks, metrics, years, ratios=[("metrik 0", "metrik 1")])
+        timings.append(time.perf_counter() - start)
+
+    baseline = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        python_baseline(facts, banks, metrics, years)
+        baseline.append(time.perf_counter() - start)
+
+    # Bagian hitung saja (tanpa serialisasi hasil ke dict) untuk melihat biaya NumPy murni
+    sub = cube.values
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        prev, curr = sub[..., :-1], sub[..., 1:]
+        (curr - prev) / abs(prev)
+        sub / sub[:1]
+    kernel_seconds = (time.perf_counter() - start) / args.repeat
+
+    print(f"sel bank-tahun-metrik : {len(facts)}")
+    print(f"bangun kubus          : {build_seconds * 1000:.1f} ms")
+    print(f"analyze (NumPy + dict): {min(timings) * 1000:.1f} ms")
+    print(f"kernel NumPy saja     : {kernel_seconds * 1000:.2f} ms")
+    print(f"baseline Python       : {min(baseline) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--metrics", type=int, default=200)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,54 @@
+# Benchmark extract_pdf_with_gemini dengan stub Gemini berlatensi tetap.
+#
+#   python -m benchmarks.bench_extractor --pages 60 --latency 0.5 --workers 1 4 8 16
+import argparse
+import os
+import tempfile
+import time
+
+from PyPDF2 import PdfWriter
+
+from services.extractor import extract_pdf_with_gemini
+from services.stubs import StubGeminiClient
+
+
+def make_blank_pdf(path, pages):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=595, height=842)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "bench.pdf")
+        make_blank_pdf(pdf_path, args.pages)
+
+        print(f"{'workers':>7} {'detik':>8} {'halaman/detik':>14} {'dokumen':>8}")
+        for workers in args.workers:
+            client = StubGeminiClient(latency=args.latency, failure_rate=args.failure_rate)
+            start = time.perf_counter()
+            documents = extract_pdf_with_gemini(
+                pdf_path,
+                output_path=os.path.join(tmp, "output_qna.csv"),
+                max_workers=workers,
+                rate_limit_per_minute=args.rate_limit,
+                client=client,
+                use_cache=args.use_cache
+            )
+            elapsed = time.perf_counter() - start
+            pages = [d.metadata["page"] for d in documents]
+            assert pages == sorted(pages), "urutan halaman tidak terjaga"
+            print(f"{workers:>7} {elapsed:>8.2f} {args.pages / elapsed:>14.1f} {len(documents):>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0, help="request per menit, 0 = tanpa batas")
+    parser.add_argument("--use-cache", action="store_true", help="aktifkan cache ekstraksi per halaman")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    main(parser.parse_args())
@@ -0,0 +1,152 @@
+# Benchmark latensi pencarian terfilter di Qdrant: filter lama (bank/tahun string,
+# tanpa payload index) vs. filter kanonik (bank_id keyword + tahun_int integer
+# dengan payload index, termasuk rentang tahun). Butuh server Qdrant sungguhan.
+#
+#   python -m benchmarks.bench_qdrant_filters --sizes 10000,100000,1000000
+import argparse
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault("QDRANT_URL", "http://localhost:6333")
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as rest
+
+from services.banks import BANKS
+from services.qdrant_init import PAYLOAD_INDEXES, ensure_payload_indexes
+
+YEARS = list(range(2015, 2025))
+
+
+def make_payloads(rng, count):
+    banks = list(BANKS)
+    bank_idx = rng.integers(0, len(banks), count)
+    years = rng.integers(0, len(YEARS), count)
+    return [
+        {
+            "bank": banks[b],
+            "bank_id": BANKS[banks[b]]["id"],
+            "tahun": str(YEARS[y]),
+            "tahun_int": YEARS[y],
+            "jenis_laporan": "Laporan Tahunan",
+            "source": f"dokumen-{i % 500}.pdf",
+        }
+        for i, (b, y) in enumerate(zip(bank_idx, years))
+    ]
+
+
+def wait_green(client, collection, timeout=600):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if client.get_collection(collection).status == rest.CollectionStatus.GREEN:
+            return
+        time.sleep(0.5)
+    print(f"⚠️ {collection} belum selesai diindeks setelah {timeout} detik")
+
+
+def build_collection(client, name, size, dim, indexed, batch_size, seed):
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(name, vectors_config=rest.VectorParams(size=dim, distance=rest.Distance.COSINE))
+    if indexed:
+        ensure_payload_indexes(client, name)
+
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    for offset in range(0, size, batch_size):
+        count = min(batch_size, size - offset)
+        client.upsert(name, points=rest.Batch(
+            ids=list(range(offset, offset + count)),
+            vectors=rng.standard_normal((count, dim), dtype=np.float32).tolist(),
+            payloads=make_payloads(rng, count),
+        ), wait=False)
+    wait_green(client, name)
+    return time.perf_counter() - start
+
+
+def legacy_filter(bank, year):
+    return rest.Filter(must=[
+        rest.FieldCondition(key="bank", match=rest.MatchValue(value=bank)),
+        rest.FieldCondition(key="tahun", match=rest.MatchValue(value=str(year))),
+    ])
+
+
+def canonical_filter(bank, year, year_end=None):
+    return rest.Filter(must=[
+        rest.FieldCondition(key="bank_id", match=rest.MatchValue(value=BANKS[bank]["id"])),
+        rest.FieldCondition(key="tahun_int", range=rest.Range(gte=year, lte=year_end or year)),
+    ])
+
+
+def measure(client, collection, queries, filters, top_k):
+    timings, results = [], []
+    for vector, query_filter in zip(queries, filters):
+        start = time.perf_counter()
+        response = client.query_points(collection, query=vector, query_filter=query_filter, limit=top_k)
+        timings.append((time.perf_counter() - start) * 1000)
+        results.append({point.id for point in response.points})
+    timings = np.asarray(timings)
+    return np.percentile(timings, 50), np.percentile(timings, 95), results
+
+
+def exact_results(client, collection, queries, filters, top_k):
+    return [
+        {point.id for point in client.query_points(
+            collection, query=vector, query_filter=query_filter, limit=top_k,
+            search_params=rest.SearchParams(exact=True),
+        ).points}
+        for vector, query_filter in zip(queries, filters)
+    ]
+
+
+def recall(found, exact):
+    hits = sum(len(f & e) for f, e in zip(found, exact))
+    return hits / max(1, sum(len(e) for e in exact))
+
+
+def main(args):
+    client = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"), timeout=1000.0)
+    rng = np.random.default_rng(args.seed + 1)
+    banks = list(BANKS)
+
+    print(f"{'point':>9} {'skenario':<32} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}")
+    for size in args.sizes:
+        plain, indexed = f"bench-filter-plain-{size}", f"bench-filter-indexed-{size}"
+        plain_seconds = build_collection(client, plain, size, args.dim, False, args.batch_size, args.seed)
+        indexed_seconds = build_collection(client, indexed, size, args.dim, True, args.batch_size, args.seed)
+        print(f"{size:>9} upload tanpa index {plain_seconds:.1f} s, dengan index {indexed_seconds:.1f} s "
+              f"({', '.join(p['field_name'] for p in PAYLOAD_INDEXES)})")
+
+        queries = rng.standard_normal((args.queries, args.dim), dtype=np.float32).tolist()
+        picks = [(banks[rng.integers(len(banks))], YEARS[rng.integers(len(YEARS))]) for _ in queries]
+        scenarios = [
+            ("lama: bank+tahun, tanpa index", plain, [legacy_filter(b, y) for b, y in picks]),
+            ("lama: bank+tahun, dengan index", indexed, [legacy_filter(b, y) for b, y in picks]),
+            ("kanonik: bank_id+tahun_int", indexed, [canonical_filter(b, y) for b, y in picks]),
+            ("kanonik: rentang 3 tahun", indexed, [canonical_filter(b, min(y, YEARS[-3]), min(y, YEARS[-3]) + 2) for b, y in picks]),
+        ]
+        for label, collection, filters in scenarios:
+            measure(client, collection, queries[:5], filters[:5], args.top_k)  # pemanasan
+            p50, p95, found = measure(client, collection, queries, filters, args.top_k)
+            exact = exact_results(client, collection, queries, filters, args.top_k) if args.recall else None
+            recall_text = f"{recall(found, exact):.3f}" if exact else "-"
+            print(f"{size:>9} {label:<32} {p50:>8.2f} {p95:>8.2f} {recall_text:>7}")
+
+        if not args.keep:
+            client.delete_collection(plain)
+            client.delete_collection(indexed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--recall", action="store_true", help="Bandingkan hasil dengan pencarian eksak")
+    parser.add_argument("--keep", action="store_true", help="Jangan hapus koleksi benchmark setelah selesai")
+    main(parser.parse_args())
@@ -0,0 +1,129 @@
+# Akurasi dan latensi analisis query berbasis aturan terhadap korpus berlabel.
+#
+#   python -m benchmarks.bench_query_analysis              # aturan saja
+#   python -m benchmarks.bench_query_analysis --with-llm   # + kesepakatan dengan jalur LLM (butuh GROQ_API_KEY)
+import argparse
+import json
+import os
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "stub")
+os.environ.setdefault("VOYAGE_API_KEY", "stub")
+os.environ.setdefault("GEMINI_API_KEY", "stub")
+os.environ.setdefault("QDRANT_URL", "http://localhost:6333")
+
+from services.analyze_query import analyze_query_with_llm, subqueries_from_analysis
+from services.query_rules import analyze_query_with_rules, QUERY_RULES_MIN_CONFIDENCE
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "query_corpus.jsonl")
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def signature(analysis):
+    # Bentuk pembanding: jumlah query + himpunan pasangan (bank, tahun)
+    if not analysis or not analysis.get("num_queries"):
+        return 0, frozenset()
+    pairs = frozenset(
+        ((f or {}).get("bank") or None, str((f or {}).get("tahun") or "") or None)
+        for _, f in subqueries_from_analysis(analysis)
+    )
+    return analysis["num_queries"], pairs
+
+
+def rewritten_queries(analysis):
+    if not analysis or not analysis.get("num_queries"):
+        return []
+    return [query for query, _ in subqueries_from_analysis(analysis)]
+
+
+def label_signature(item):
+    pairs = frozenset((f["bank"], f["tahun"]) for f in item["filters"])
+    return item["num_queries"], pairs
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def time_call(fn, query, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(query)
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def main(args):
+    corpus = load_corpus(args.corpus)
+    rule_timings, llm_timings, path_timings = [], [], []
+    routed = routed_correct = rules_correct = routing_correct = 0
+    llm_correct = rules_llm_agree = 0
+    disagreements = []
+
+    for item in corpus:
+        expected = label_signature(item)
+        rules, timings = time_call(analyze_query_with_rules, item["query"], args.repeat)
+        rule_timings.extend(timings)
+
+        confident = rules["confidence"] >= QUERY_RULES_MIN_CONFIDENCE
+        # Label "queries" = teks query hasil tulis ulang yang diharapkan; "llm" = pertanyaan
+        # (penjelasan/definisi, bank tak dikenal) yang wajib diserahkan ke LLM
+        rules_ok = signature(rules) == expected and rewritten_queries(rules) == item.get("queries", rewritten_queries(rules))
+        rules_correct += rules_ok
+        routing_correct += confident != bool(item.get("llm"))
+        if confident:
+            routed += 1
+            routed_correct += rules_ok and not item.get("llm")
+            if not rules_ok or item.get("llm"):
+                disagreements.append((item["query"], rules))
+
+        if args.with_llm:
+            llm, timings = time_call(analyze_query_with_llm, item["query"], 1)
+            llm_timings.extend(timings)
+            llm_correct += signature(llm) == expected
+            rules_llm_agree += signature(rules) == signature(llm)
+            path_timings.append(min(rule_timings[-args.repeat:]) if confident else timings[0])
+
+    total = len(corpus)
+    report = {
+        "jumlah_query": total,
+        "ambang_confidence": QUERY_RULES_MIN_CONFIDENCE,
+        "rules": {
+            "akurasi_semua": rules_correct / total,
+            "akurasi_routing": routing_correct / total,
+            "cakupan_jalur_cepat": routed / total,
+            "akurasi_jalur_cepat": routed_correct / routed if routed else None,
+            "p50_ms": percentile(rule_timings, 0.5) * 1000,
+            "p99_ms": percentile(rule_timings, 0.99) * 1000,
+        },
+    }
+    if args.with_llm:
+        report["llm"] = {
+            "akurasi": llm_correct / total,
+            "kesepakatan_dengan_rules": rules_llm_agree / total,
+            "p50_ms": percentile(llm_timings, 0.5) * 1000,
+            "p99_ms": percentile(llm_timings, 0.99) * 1000,
+        }
+        report["jalur_gabungan"] = {
+            "p50_ms": percentile(path_timings, 0.5) * 1000,
+            "p99_ms": percentile(path_timings, 0.99) * 1000,
+        }
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    for query, analysis in disagreements:
+        print(f"⚠️ Jalur cepat salah: {query!r} -> {analysis}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", default=CORPUS_PATH)
+    parser.add_argument("--repeat", type=int, default=200, help="pengulangan per query untuk latensi aturan")
+    parser.add_argument("--with-llm", action="store_true")
+    main(parser.parse_args())
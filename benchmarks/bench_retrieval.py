@@ -0,0 +1,344 @@
+# Benchmark kualitas dan latensi retrieval dengan gold set dari output_qna.csv.
+#
+#   python -m benchmarks.bench_retrieval                       # backend lokal + embedding hash
+#   python -m benchmarks.bench_retrieval --backend qdrant-memory --modes hybrid
+#   python -m benchmarks.bench_retrieval --embed voyage        # butuh VOYAGE_API_KEY
+#   python -m benchmarks.bench_retrieval --update-baseline     # simpan hasil sebagai baseline
+#
+# Setiap baris CSV (pertanyaan -> jawaban) diingest lewat create_vector_index
+# seperti hasil ekstraksi PDF; teks halaman PDF di temp/ ikut sebagai pengecoh.
+# Pertanyaan ditulis ulang dengan alias bank agar tidak identik dengan dokumen,
+# lalu dijalankan lewat smart_rag_search_async (jalur /chat) dan smart_rag_search
+# (jalur sinkron); keduanya dicatat. Hasil dibandingkan dengan baseline.
+import argparse
+import asyncio
+import contextlib
+import csv
+import glob
+import io
+import json
+import os
+import platform
+import re
+import tempfile
+import time
+
+WORK_DIR = tempfile.mkdtemp(prefix="bench-retrieval-")
+os.environ.setdefault("QDRANT_URL", "http://localhost:6333")
+# Indeks BM25 dan arsip embedding benchmark tidak menyentuh storage/ aplikasi
+os.environ["LEXICAL_DB_PATH"] = os.path.join(WORK_DIR, "lexical.sqlite3")
+os.environ["EMBEDDING_ARCHIVE_DIR"] = ""
+os.environ["STORAGE_DB_PATH"] = os.path.join(WORK_DIR, "docstore.sqlite3")
+
+import numpy as np
+from llama_index.core import Document, VectorStoreIndex
+from llama_index.core.schema import QueryBundle
+
+import services.analyze_query as analyze_query
+import services.searcher as searcher
+from services.banks import BANKS, canonicalize_bank
+from services.indexer import create_vector_index
+from services.lexical_index import get_lexical_index
+from services.vector_backends import LocalVectorStore
+from services.model_init import get_embed_model, set_provider
+from services.stubs import StubLLM, HashEmbedding
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GOLD_CSV = os.path.join(ROOT, "temp_uploads", "output_qna.csv")
+PDF_DIR = os.path.join(ROOT, "temp")
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "retrieval_baseline.json")
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), "results", "retrieval.json")
+STAGES = ("analisis", "embed_query", "dense", "bm25", "pencarian", "end_to_end", "end_to_end_async")
+
+
+def load_gold(path):
+    with open(path, encoding="utf-8") as f:
+        rows = [row for row in csv.DictReader(f) if row.get("Pertanyaan") and row.get("Jawaban")]
+    return [
+        {
+            "pertanyaan": row["Pertanyaan"].strip(),
+            "jawaban": row["Jawaban"].strip(),
+            "bank": row["Bank"].strip(),
+            "tahun": row["Tahun"].strip(),
+        }
+        for row in rows
+    ]
+
+
+def gold_documents(gold, source):
+    # Bentuk sama dengan Document dari extract_pdf_with_gemini
+    return [
+        Document(
+            text=f"Q: {item['pertanyaan']}\nA: {item['jawaban']}",
+            metadata={
+                "bank": item["bank"], "tahun": item["tahun"], "jenis_laporan": "Laporan Tidak Diketahui",
+                "page": i + 1, "source": source,
+            },
+        )
+        for i, item in enumerate(gold)
+    ]
+
+
+def pdf_documents(pdf_dir):
+    if not pdf_dir:
+        return []
+    from PyPDF2 import PdfReader
+
+    documents = []
+    for path in sorted(glob.glob(os.path.join(pdf_dir, "*.pdf"))):
+        for page, pdf_page in enumerate(PdfReader(path).pages):
+            text = (pdf_page.extract_text() or "").strip()
+            if text:
+                documents.append(Document(text=text, metadata={
+                    "bank": canonicalize_bank(text) or "BANK TIDAK DIKETAHUI", "tahun": "0000",
+                    "jenis_laporan": "PDF mentah", "page": page + 1, "source": os.path.basename(path),
+                }))
+    return documents
+
+
+def paraphrase(question):
+    # Nama lengkap bank diganti alias terpendek ("PT Bank Central Asia Tbk" -> "BCA")
+    for canonical, info in BANKS.items():
+        pattern = re.compile(re.escape(info["display"]), re.IGNORECASE)
+        if pattern.search(question):
+            alias = min(info["aliases"], key=len).upper()
+            return pattern.sub(alias, question)
+    return question
+
+
+def make_vector_store(backend):
+    if backend == "local":
+        return LocalVectorStore()
+    from qdrant_client import QdrantClient
+    from services.qdrant_backend import QdrantBackend
+
+    client = QdrantClient(":memory:") if backend == "qdrant-memory" else QdrantClient(
+        url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY")
+    )
+    collection = f"bench-retrieval-{int(time.time())}"
+    return QdrantBackend(client=client, collection_name=collection)
+
+
+def make_embed_model(name):
+    if name == "hash":
+        return HashEmbedding()
+    return get_embed_model()
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = np.asarray(values) * 1000
+    return {
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+    }
+
+
+def timed(timings, stage, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    timings[stage].append(time.perf_counter() - start)
+    return result
+
+
+async def timed_async(timings, stage, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = await fn(*args, **kwargs)
+    timings[stage].append(time.perf_counter() - start)
+    return result
+
+
+def answer_rank(item, nodes1, nodes2):
+    ranked = nodes1 + nodes2
+    return next((i + 1 for i, n in enumerate(ranked) if item["jawaban"] in n.node.get_content()), None)
+
+
+def score(ranks, ks):
+    return {
+        "recall": {f"@{k}": round(sum(bool(rank and rank <= k) for rank in ranks) / len(ranks), 4) for k in ks},
+        "mrr": round(float(np.mean([1.0 / rank if rank else 0.0 for rank in ranks])), 4),
+    }
+
+
+async def end_to_end_async(index, gold, top_k, timings):
+    # Satu event loop untuk semua pertanyaan, seperti server; sub-query dijalankan
+    # paralel lewat similarity_search_multi_async
+    ranks = []
+    for item in gold:
+        nodes1, nodes2, _ = await timed_async(
+            timings, "end_to_end_async", analyze_query.smart_rag_search_async, index, paraphrase(item["pertanyaan"]), top_k
+        )
+        ranks.append(answer_rank(item, nodes1, nodes2))
+    return ranks
+
+
+def ingest(documents, vector_store, embed_model):
+    progress = {}
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_vector_index(
+            documents, vector_store, embed_model,
+            progress_callback=lambda key, done, total: progress.__setitem__(key, done),
+        )
+    seconds = time.perf_counter() - start
+    chunks = progress.get("point_diupsert", 0)
+    return {
+        "dokumen": len(documents),
+        "chunk": chunks,
+        "detik": round(seconds, 3),
+        "chunk_per_detik": round(chunks / seconds, 1) if seconds else None,
+    }
+
+
+def evaluate(index, embed_model, gold, ks, mode):
+    searcher.HYBRID_SEARCH = mode == "hybrid"
+    lexical = get_lexical_index()
+    timings = {stage: [] for stage in STAGES}
+    sync_ranks = []
+    top_k = max(ks)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for item in gold:
+            query = paraphrase(item["pertanyaan"])
+            analysis = timed(timings, "analisis", analyze_query.analyze_query, query)
+            subquery, filter_dict = (analyze_query.subqueries_from_analysis(analysis) or [(query, None)])[0]
+
+            embedding = timed(timings, "embed_query", embed_model.get_query_embedding, subquery)
+            retriever = searcher.build_retriever(index, filter_dict, top_k)
+            timed(timings, "dense", retriever.retrieve, QueryBundle(query_str=subquery, embedding=embedding))
+            if mode == "hybrid" and lexical is not None:
+                timed(timings, "bm25", searcher.lexical_search, lexical, subquery, filter_dict)
+            timed(timings, "pencarian", searcher.similarity_search_dual, index, subquery, None, filter_dict, None, top_k)
+
+            nodes1, nodes2, _ = timed(timings, "end_to_end", analyze_query.smart_rag_search, index, query, top_k)
+            sync_ranks.append(answer_rank(item, nodes1, nodes2))
+
+        async_ranks = asyncio.run(end_to_end_async(index, gold, top_k, timings))
+
+    # recall/MRR utama dari jalur async yang dipakai /chat
+    return {
+        **score(async_ranks, ks),
+        "sinkron": score(sync_ranks, ks),
+        "latensi_ms": {stage: percentiles(values) for stage, values in timings.items() if values},
+    }
+
+
+def compare(results, baseline, recall_tolerance, latency_tolerance):
+    # Regresi: recall/MRR turun melebihi toleransi absolut, atau p95 naik melebihi toleransi relatif
+    regressions, notes = [], []
+    if baseline.get("konfigurasi") != results.get("konfigurasi"):
+        notes.append("konfigurasi berbeda dari baseline; perbandingan hanya indikatif")
+    for mode, current in results["mode"].items():
+        previous = baseline.get("mode", {}).get(mode)
+        if previous is None:
+            notes.append(f"mode {mode} tidak ada di baseline")
+            continue
+        for k, value in current["recall"].items():
+            before = previous["recall"].get(k)
+            if before is not None and value < before - recall_tolerance:
+                regressions.append(f"{mode} recall{k}: {before} -> {value}")
+        if current["mrr"] < previous["mrr"] - recall_tolerance:
+            regressions.append(f"{mode} MRR: {previous['mrr']} -> {current['mrr']}")
+        before = (previous.get("sinkron") or {}).get("mrr")
+        if before is not None and current["sinkron"]["mrr"] < before - recall_tolerance:
+            regressions.append(f"{mode} MRR sinkron: {before} -> {current['sinkron']['mrr']}")
+        for stage, stats in current["latensi_ms"].items():
+            before = (previous["latensi_ms"].get(stage) or {}).get("p95")
+            # Di bawah 1 ms selisihnya didominasi derau pengukuran
+            if before and stats["p95"] > max(before * (1 + latency_tolerance), before + 1.0):
+                regressions.append(f"{mode} p95 {stage}: {before} ms -> {stats['p95']} ms")
+    before = baseline.get("ingest", {}).get("chunk_per_detik")
+    after = results["ingest"]["chunk_per_detik"]
+    if before and after and after < before / (1 + latency_tolerance):
+        regressions.append(f"throughput ingest: {before} -> {after} chunk/detik")
+    return regressions, notes
+
+
+def print_report(results):
+    ingest_stats = results["ingest"]
+    print(f"Ingest: {ingest_stats['dokumen']} dokumen, {ingest_stats['chunk']} chunk, "
+          f"{ingest_stats['detik']} s ({ingest_stats['chunk_per_detik']} chunk/detik)")
+    for mode, data in results["mode"].items():
+        recall = "  ".join(f"R{k}={v:.3f}" for k, v in data["recall"].items())
+        print(f"\n[{mode}] {recall}  MRR={data['mrr']:.3f}  (sinkron: MRR={data['sinkron']['mrr']:.3f})")
+        print(f"  {'tahap':<16} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for stage, stats in data["latensi_ms"].items():
+            print(f"  {stage:<16} {stats['p50']:>9.2f} {stats['p95']:>9.2f} {stats['p99']:>9.2f}")
+
+
+def main(args):
+    # Analisis query tanpa jaringan: aturan dulu, StubLLM bila aturan tidak yakin
+    set_provider("llm", StubLLM(analysis_latency=0, answer_latency=0))
+
+    gold = load_gold(args.gold)
+    if args.limit:
+        gold = gold[:args.limit]
+    documents = gold_documents(gold, os.path.basename(args.gold)) + pdf_documents(args.pdf_dir)
+
+    embed_model = make_embed_model(args.embed)
+    vector_store = make_vector_store(args.backend)
+    ingest_stats = ingest(documents, vector_store, embed_model)
+    index = VectorStoreIndex.from_vector_store(vector_store, embed_model=embed_model)
+
+    results = {
+        "konfigurasi": {
+            "backend": args.backend,
+            "embed": args.embed,
+            "gold": os.path.basename(args.gold),
+            "jumlah_pertanyaan": len(gold),
+            "pdf": bool(args.pdf_dir),
+            "k": args.ks,
+            "hybrid_candidates": searcher.HYBRID_CANDIDATES,
+        },
+        "lingkungan": {"python": platform.python_version(), "mesin": platform.machine()},
+        "ingest": ingest_stats,
+        "mode": {mode: evaluate(index, embed_model, gold, args.ks, mode) for mode in args.modes},
+    }
+    print_report(results)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Hasil disimpan ke {args.output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"📌 Baseline diperbarui: {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("ℹ️ Belum ada baseline; jalankan dengan --update-baseline")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions, notes = compare(results, baseline, args.recall_tolerance, args.latency_tolerance)
+    for note in notes:
+        print(f"ℹ️ {note}")
+    if regressions:
+        print("❌ Regresi dibanding baseline:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1 if args.fail_on_regression else 0
+    print("✅ Tidak ada regresi dibanding baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--gold", default=GOLD_CSV)
+    parser.add_argument("--pdf-dir", default=PDF_DIR, help="Kosongkan untuk tanpa PDF pengecoh")
+    parser.add_argument("--backend", choices=["local", "qdrant-memory", "qdrant"], default="local")
+    parser.add_argument("--embed", choices=["hash", "voyage"], default="hash")
+    parser.add_argument("--modes", type=lambda s: s.split(","), default=["dense", "hybrid"])
+    parser.add_argument("--ks", type=lambda s: [int(x) for x in s.split(",")], default=[1, 3, 5, 10])
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--output", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--recall-tolerance", type=float, default=0.02)
+    parser.add_argument("--latency-tolerance", type=float, default=0.5)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    raise SystemExit(main(parser.parse_args()))
@@ -0,0 +1,148 @@
+# Benchmark cold start: waktu import main, startup (lifespan) dan request
+# pertama/kedua, masing-masing di interpreter baru.
+#
+#   python -m benchmarks.bench_startup                   # provider stub + backend lokal
+#   python -m benchmarks.bench_startup --providers env   # provider sesuai environment (butuh kredensial)
+#   python -m benchmarks.bench_startup --importtime      # tampilkan modul termahal saat import main
+#
+# Setiap proses berjalan di direktori kerja sementara sehingga storage/, cache/
+# dan jobs/ aplikasi tidak tersentuh.
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASES = ("import_main", "startup", "request_pertama", "request_kedua")
+# Modul berat yang seharusnya tidak dimuat hanya karena main diimpor
+HEAVY_MODULES = (
+    "torch", "qdrant_client", "google.genai", "llama_index.llms.groq",
+    "llama_index.embeddings.voyageai", "llama_index.vector_stores.qdrant",
+)
+STUB_ENV = {
+    "LLM_PROVIDER": "stub",
+    "EMBED_PROVIDER": "stub",
+    "EXTRACTOR_PROVIDER": "stub",
+    "VECTOR_BACKEND": "local",
+    "LOG_LEVEL": "WARNING",
+}
+QUERY = "Berapa laba bersih BCA tahun 2024?"
+
+
+def seed():
+    # Isi backend lokal + indeks leksikal di direktori kerja dengan beberapa dokumen
+    from llama_index.core import Document
+
+    from services.indexer import create_vector_index
+    from services.model_init import get_embed_model, get_vector_store
+
+    documents = [
+        Document(
+            text=f"Q: Berapa {metric} PT Bank Central Asia Tbk tahun {year}?\nA: {metric} tahun {year} adalah {value}.",
+            metadata={"bank": "PT BANK CENTRAL ASIA TBK", "tahun": str(year), "page": i + 1, "source": "seed.pdf"},
+        )
+        for i, (metric, year, value) in enumerate(
+            (m, y, 1000 + 7 * y + len(m)) for m in ("laba bersih", "beban bunga", "total aset") for y in (2022, 2023, 2024)
+        )
+    ]
+    create_vector_index(documents, get_vector_store(), get_embed_model())
+
+
+async def measure():
+    timings = {}
+    start = time.perf_counter()
+    import main
+    timings["import_main"] = time.perf_counter() - start
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    import httpx
+
+    start = time.perf_counter()
+    async with main.app.router.lifespan_context(main.app):
+        timings["startup"] = time.perf_counter() - start
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            for phase in ("request_pertama", "request_kedua"):
+                start = time.perf_counter()
+                response = await client.post("/chat", json={"query": QUERY})
+                timings[phase] = time.perf_counter() - start
+                response.raise_for_status()
+                body = response.json()
+                if "error" in body:
+                    raise RuntimeError(body["error"])
+
+    return {"detik": timings, "modul_berat_saat_import": loaded}
+
+
+def run_child(mode, workdir, env):
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", f"--{mode}"],
+        cwd=workdir, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f"❌ Proses {mode} gagal:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1]) if mode == "child" else None
+
+
+def import_profile(workdir, env, top):
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=workdir, env=env, capture_output=True, text=True,
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)", line)
+        # Hanya impor langsung dari main dan services (kedalaman 1-2)
+        if match and len(match.group(3)) <= 3:
+            rows.append((int(match.group(2)) / 1e6, match.group(4)))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(args):
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))}
+    if args.providers == "stub":
+        env.update(STUB_ENV)
+
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as workdir:
+        if args.providers == "stub":
+            run_child("seed", workdir, env)
+
+        runs = [run_child("child", workdir, env) for _ in range(args.repeat)]
+
+        print(f"{'tahap':<16} {'median s':>9} {'min s':>8} {'max s':>8}")
+        for phase in PHASES:
+            values = [run["detik"][phase] for run in runs]
+            print(f"{phase:<16} {statistics.median(values):>9.3f} {min(values):>8.3f} {max(values):>8.3f}")
+        first_request = [run["detik"]["import_main"] + run["detik"]["startup"] + run["detik"]["request_pertama"] for run in runs]
+        print(f"{'s/d request 1':<16} {statistics.median(first_request):>9.3f} {min(first_request):>8.3f} {max(first_request):>8.3f}")
+        loaded = runs[-1]["modul_berat_saat_import"]
+        print(f"\nModul berat dimuat oleh `import main`: {', '.join(loaded) if loaded else '-'}")
+
+        if args.importtime:
+            print(f"\n{'kumulatif s':>11}  modul")
+            for seconds, name in import_profile(workdir, env, args.top):
+                print(f"{seconds:>11.3f}  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--providers", choices=["stub", "env"], default="stub")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="Profil python -X importtime untuk import main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--seed", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(measure())))
+    elif args.seed:
+        seed()
+    else:
+        main(args)
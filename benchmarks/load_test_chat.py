@@ -0,0 +1,83 @@
+# Load test /chat dengan backend stub pada satu worker.
+#
+#   python -m benchmarks.load_test_chat --requests-per-level 64
+#   python -m benchmarks.load_test_chat --fast-paths   # tabel fakta + analisis aturan tetap aktif
+#
+# Dengan jalur async, throughput harus naik hampir linear terhadap
+# concurrency karena waktu tunggu LLM/retrieval tidak memblokir event loop.
+# Secara default tabel fakta dan jalur cepat analisis aturan dimatikan agar
+# setiap request benar-benar melewati analisis LLM, pencarian dan generasi.
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+
+def install_stubs(args):
+    import main
+    import services.analyze_query as analyze_query
+    from services.answer_cache import AnswerCache
+    from benchmarks.stubs import StubIndexRegistry, make_stub_search
+    from services.model_init import set_provider
+    from services.stubs import StubLLM
+
+    stub_llm = StubLLM(analysis_latency=args.analysis_latency, answer_latency=args.answer_latency)
+    set_provider("llm", stub_llm)
+    analyze_query.similarity_search_multi_async = make_stub_search(args.search_latency)
+    main.index_registry = StubIndexRegistry()
+    # Ukur jalur penuh, bukan cache jawaban
+    main.answer_cache = AnswerCache(max_entries=0)
+    return main
+
+
+async def run_level(client, concurrency, total, query, sources):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/chat", json={"query": query})
+            response.raise_for_status()
+            sources[response.json().get("sumber")] = sources.get(response.json().get("sumber"), 0) + 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return total / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99) - 1]
+
+
+async def main_async(args):
+    main = install_stubs(args)
+    sources = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'concurrency':>11} {'req/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+        for concurrency in args.levels:
+            rps, p50, p99 = await run_level(client, concurrency, args.requests_per_level, args.query, sources)
+            print(f"{concurrency:>11} {rps:>8.1f} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f}")
+    # Selain "rag", angka di atas tidak mengukur jalur LLM
+    print(f"\nSumber jawaban: {sources}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--requests-per-level", type=int, default=64)
+    parser.add_argument("--analysis-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.02)
+    parser.add_argument("--answer-latency", type=float, default=0.1)
+    parser.add_argument("--query", default="Berapa laba bersih BCA tahun 2024?")
+    parser.add_argument("--fast-paths", action="store_true", help="Jangan matikan tabel fakta dan analisis aturan")
+    args = parser.parse_args()
+
+    # Harus diset sebelum main diimpor: konfigurasi dibaca saat import modul
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if not args.fast_paths:
+        os.environ["FACTS_DB_PATH"] = ""
+        os.environ["QUERY_RULES_MIN_CONFIDENCE"] = "1.01"
+    asyncio.run(main_async(args))
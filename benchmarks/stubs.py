@@ -0,0 +1,29 @@
+import asyncio
+
+from llama_index.core.schema import NodeWithScore, TextNode
+
+
+# Registry dan pencarian tiruan untuk benchmark jalur request; provider stub
+# (LLM, Gemini, embedding) ada di services/stubs.py.
+class StubIndexRegistry:
+    def get(self):
+        return object()
+
+    def reload(self):
+        return self.get()
+
+    def status(self):
+        return {"tersedia": True, "generation": 1, "loaded_at": None, "load_seconds": 0.0}
+
+
+def make_stub_search(latency=0.02):
+    node = TextNode(
+        text="Q: Berapa laba bersih PT Bank Central Asia Tbk tahun 2024?\nA: 54.836.341 (dalam jutaan Rupiah).",
+        metadata={"bank": "PT BANK CENTRAL ASIA TBK", "tahun": "2024"},
+    )
+
+    async def similarity_search_multi_async(index, queries, filters=None, **kwargs):
+        await asyncio.sleep(latency)
+        return [[NodeWithScore(node=node, score=0.9)] if q else [] for q in queries]
+
+    return similarity_search_multi_async
@@ -2,25 +2,82 @@ from fastapi import FastAPI, UploadFile, File, Query,Body
 from pydantic import BaseModel
 from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 
-import pprint
+import json
+import logging
 
 from llama_index.core.llms import ChatMessage
-import shutil
 import os
 from services.create_vector_index_from_qa_csv import create_vector_index_from_qa_csv
 
 
 from services.extractor import extract_pdf_with_gemini
-from services.indexer import create_vector_index, load_index
-from services.searcher import similarity_search_dual
-from services.model_init import vector_store, embed_model
-from services.generator import generate_answer_with_llm
-from services.analyze_query import smart_rag_search
+from services.indexer import create_vector_index
+from services.index_registry import IndexRegistry
+from services.jobs import JobManager
+from services.extraction_cache import get_extraction_cache
+from services.searcher import (
+    similarity_search_dual_async,
+    build_metadata_filters,
+    set_canonical_filters,
+    canonical_filters_enabled,
+    CANONICAL_FILTERS,
+)
+from services.vector_backends import decode_cursor, iter_node_pages
+from services.lexical_index import get_lexical_index
+from services.model_init import get_vector_store, get_embed_model, provider_status
+from services.generator import generate_answer_with_llm_async, astream_answer_with_llm, strip_think
+from services.analyze_query import (
+    analyze_query_async,
+    early_message_from_analysis,
+    search_from_analysis_async,
+    subqueries_from_analysis,
+)
+from services.answer_cache import answer_cache
+from services.context_builder import build_context
+from services.facts import get_fact_store, answer_from_facts
+from services.analytics import get_fact_cube, analytics_block_for
+from services.telemetry import (
+    configure_logging,
+    start_trace,
+    finish_request,
+    record_cache,
+    render_metrics,
+    RESPONSE_TIMING,
+)
+
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Batas ukuran halaman /all-nodes dan ukuran halaman internal ekspor NDJSON
+ALL_NODES_MAX_PAGE = int(os.getenv("ALL_NODES_MAX_PAGE", "1000"))
+ALL_NODES_EXPORT_PAGE = int(os.getenv("ALL_NODES_EXPORT_PAGE", "500"))
+# Ukuran potongan saat body upload disalin ke disk
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1 << 20)))
+
+index_registry = IndexRegistry(get_vector_store)
+job_manager = JobManager(get_vector_store, get_embed_model, on_complete=index_registry.reload)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # qdrant_init memuat qdrant_client; tidak perlu diimpor saat modul ini diimpor
+    from services.qdrant_init import ensure_schema, canonical_filters_ready
+
+    vector_store = get_vector_store()
+    ensure_schema(vector_store)
+    if CANONICAL_FILTERS == "auto":
+        set_canonical_filters(canonical_filters_ready(vector_store))
+    index_registry.reload()
+    job_manager.resume_pending()
+    yield
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
@@ -32,72 +89,282 @@ app.add_middleware(
 class ChatRequest(BaseModel):
     query: str
     history: Optional[List[dict]] = [] 
-    
+    timing: bool = False  # sertakan rincian waktu per tahap di respons
+
+
+class AnalyticsRequest(BaseModel):
+    bank: List[str]
+    metrik: List[str]
+    tahun: Optional[List[int]] = None
+    rasio: Optional[List[List[str]]] = []
+
     
 @app.post("/chat")
 async def rag_query(payload: ChatRequest = Body(...)):
     query = payload.query
     history_dict = payload.history or []
+    start_trace()
+    with_timing = payload.timing or RESPONSE_TIMING
+
+    index = index_registry.get()
 
-    index = load_index(vector_store)
-    
     if not index:
+        finish_request("chat", "error")
         return {"error": "❌ Index belum tersedia di Qdrant. Silakan upload dokumen terlebih dahulu."}
 
     try:
-        nodes1, nodes2, message = smart_rag_search(index, query)
+        analysis = await analyze_query_async(query)
+        message = early_message_from_analysis(analysis)
+        fact_answer = None if message else answer_from_facts(get_fact_store(), query, subqueries_from_analysis(analysis))
+        if not message:
+            record_cache("fakta", "hit" if fact_answer else "miss")
+        if fact_answer:
+            response = fact_response(query, fact_answer, history_dict)
+            timing = finish_request("chat", "fakta")
+            return {**response, "timing": timing} if with_timing else response
+        if not message:
+            nodes1, nodes2 = await search_from_analysis_async(index, analysis)
     except Exception as e:
-        print(f"❌ Error saat smart_rag_search: {e}")
+        logger.error("❌ Error saat smart_rag_search: %s", e)
+        finish_request("chat", "error")
         return {"error": "Terjadi kesalahan saat pencarian."}
 
+    cached = False
+    context_stats = None
+    source = "rag"
     if message:
-        print(f"💬 Dikenali sebagai sapaan/non-query: {message}")
+        logger.debug("💬 Dikenali sebagai sapaan/non-query: %s", message)
         generated_answer_clean = message
+        source = "langsung"
     else:
         nodes = (nodes1 or []) + (nodes2 or [])
         if not nodes:
-            print("⚠️ Tidak ada hasil dari similarity search.")
+            logger.info("⚠️ Tidak ada hasil dari similarity search.")
             generated_answer_clean = "Maaf, informasi tersebut tidak tersedia dalam dokumen."
+            source = "kosong"
         else:
-            context_combined = "\n\n".join([n.node.get_content() for n in nodes])
-
+            subqueries = subqueries_from_analysis(analysis)
             history = [ChatMessage(role=h.get("role"), content=h.get("content")) for h in history_dict]
-
-            generated_answer_clean, new_history = generate_answer_with_llm(query, context_combined, history)
-
-            new_history_dict = [{"role": msg.role, "content": msg.content} for msg in new_history]
-
-    return {
+            used_nodes, context_combined, history, context_stats = build_context(query, subqueries, nodes, history)
+            analytics_block = analytics_block_for(subqueries)
+            if analytics_block:
+                context_combined = analytics_block + "\n\n" + context_combined
+
+            cache_key = answer_cache.make_key(subqueries, nodes, history_dict)
+            entry = answer_cache.get(cache_key)
+            record_cache("jawaban", "hit" if entry else "miss")
+
+            if entry:
+                cached = True
+                source = "cache"
+                generated_answer_clean = entry["jawaban"]
+                new_history_dict = entry["history"]
+            else:
+                generated_answer_clean, new_history = await generate_answer_with_llm_async(query, context_combined, history)
+
+                new_history_dict = [{"role": msg.role, "content": msg.content} for msg in new_history]
+
+                if len(new_history) > len(history):  # hanya jawaban yang berhasil disimpan
+                    answer_cache.put(
+                        cache_key, generated_answer_clean, new_history_dict,
+                        answer_cache.tags_for(subqueries, nodes)
+                    )
+
+    response = {
         "query": query,
         "jawaban": generated_answer_clean,
-        "jumlah_konteks_digunakan": len(context_combined.split("\n\n")) if not message and nodes else 0,
-        "history": new_history_dict if not message and nodes else history_dict  # kembalikan history terbaru
+        "jumlah_konteks_digunakan": len(used_nodes) if not message and nodes else 0,
+        "history": new_history_dict if not message and nodes else history_dict,  # kembalikan history terbaru
+        "cached": cached,
+        "konteks_stats": context_stats,
+        "sumber": source
+    }
+    timing = finish_request("chat", source)
+    if with_timing:
+        response["timing"] = timing
+    return response
+
+
+def fact_response(query, fact_answer, history_dict):
+    logger.debug("🔢 Dijawab dari tabel fakta: %d fakta", len(fact_answer["fakta"]))
+    new_history_dict = history_dict + [
+        {"role": "user", "content": f"Pertanyaan: {query}"},
+        {"role": "assistant", "content": fact_answer["jawaban"]},
+    ]
+    return {
+        "query": query,
+        "jawaban": fact_answer["jawaban"],
+        "jumlah_konteks_digunakan": 0,
+        "history": new_history_dict,
+        "cached": False,
+        "konteks_stats": None,
+        "sumber": "fakta",
+        "fakta": fact_answer["fakta"]
     }
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def describe_nodes(nodes):
+    return [
+        {
+            "score": n.score,
+            "bank": n.node.metadata.get("bank"),
+            "tahun": n.node.metadata.get("tahun"),
+            "source": n.node.metadata.get("source"),
+            "page": n.node.metadata.get("page"),
+        }
+        for n in nodes
+    ]
+
+
+@app.post("/chat/stream")
+async def rag_query_stream(payload: ChatRequest = Body(...)):
+    query = payload.query
+    history_dict = payload.history or []
+    with_timing = payload.timing or RESPONSE_TIMING
+
+    def done_event(source, data):
+        timing = finish_request("chat_stream", source)
+        data.setdefault("sumber", source)
+        if with_timing:
+            data["timing"] = timing
+        return sse_event("done", data)
+
+    async def events():
+        start_trace()
+        index = index_registry.get()
+        if not index:
+            finish_request("chat_stream", "error")
+            yield sse_event("error", {"message": "❌ Index belum tersedia di Qdrant. Silakan upload dokumen terlebih dahulu."})
+            return
+
+        try:
+            analysis = await analyze_query_async(query)
+            message = early_message_from_analysis(analysis)
+            yield sse_event("analysis", {
+                "num_queries": (analysis or {}).get("num_queries", 0),
+                "queries": [q for q, _ in subqueries_from_analysis(analysis)] if not message else [],
+                "source": (analysis or {}).get("source", "llm"),
+            })
+            if message:
+                yield sse_event("token", {"text": message})
+                yield done_event("langsung", {"query": query, "jawaban": message, "history": history_dict, "cached": False})
+                return
+
+            fact_answer = answer_from_facts(get_fact_store(), query, subqueries_from_analysis(analysis))
+            record_cache("fakta", "hit" if fact_answer else "miss")
+            if fact_answer:
+                response = fact_response(query, fact_answer, history_dict)
+                yield sse_event("token", {"text": response["jawaban"]})
+                yield done_event("fakta", {
+                    "query": query,
+                    "jawaban": response["jawaban"],
+                    "history": response["history"],
+                    "cached": False,
+                    "sumber": "fakta",
+                    "fakta": response["fakta"]
+                })
+                return
+
+            nodes1, nodes2 = await search_from_analysis_async(index, analysis)
+        except Exception as e:
+            logger.error("❌ Error saat smart_rag_search: %s", e)
+            finish_request("chat_stream", "error")
+            yield sse_event("error", {"message": "Terjadi kesalahan saat pencarian."})
+            return
+
+        nodes = (nodes1 or []) + (nodes2 or [])
+        subqueries = subqueries_from_analysis(analysis)
+        history = [ChatMessage(role=h.get("role"), content=h.get("content")) for h in history_dict]
+        used_nodes, context_combined, history, context_stats = build_context(query, subqueries, nodes, history)
+        analytics_block = analytics_block_for(subqueries)
+        if analytics_block:
+            context_combined = analytics_block + "\n\n" + context_combined
+        yield sse_event("retrieval", {
+            "jumlah_konteks_digunakan": len(used_nodes),
+            "konteks": describe_nodes(used_nodes),
+            "konteks_stats": context_stats
+        })
+
+        if not nodes:
+            answer = "Maaf, informasi tersebut tidak tersedia dalam dokumen."
+            yield sse_event("token", {"text": answer})
+            yield done_event("kosong", {"query": query, "jawaban": answer, "history": history_dict, "cached": False})
+            return
+
+        cache_key = answer_cache.make_key(subqueries, nodes, history_dict)
+        entry = answer_cache.get(cache_key)
+        record_cache("jawaban", "hit" if entry else "miss")
+        if entry:
+            # Entri lama dari /chat bisa masih memuat blok <think>
+            answer = strip_think(entry["jawaban"])
+            yield sse_event("token", {"text": answer})
+            yield done_event("cache", {"query": query, "jawaban": answer, "history": entry["history"], "cached": True})
+            return
+
+
+        async for item in astream_answer_with_llm(query, context_combined, history):
+            if item["type"] == "token":
+                yield sse_event("token", {"text": item["text"]})
+            elif item["type"] == "error":
+                yield sse_event("error", {"message": item["message"]})
+            else:
+                new_history_dict = [{"role": msg.role, "content": msg.content} for msg in item["history"]]
+                if item["jawaban"] is not None:
+                    answer_cache.put(
+                        cache_key, item["jawaban"], new_history_dict,
+                        answer_cache.tags_for(subqueries, nodes)
+                    )
+                yield done_event("rag" if item["jawaban"] is not None else "error", {
+                    "query": query,
+                    "jawaban": item["jawaban"],
+                    "history": new_history_dict,
+                    "cached": False
+                })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def save_upload(file: UploadFile, path):
+    # Disalin per potongan tanpa memblokir event loop; file tidak pernah utuh di memori
+    with open(path, "wb") as buffer:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await run_in_threadpool(buffer.write, chunk)
+
+
 @app.post("/upload")
 async def upload_pdf(file: UploadFile = File(...)):
     file_location = f"temp/{file.filename}"
     os.makedirs("temp", exist_ok=True)
-    with open(file_location, "wb") as f:
-        shutil.copyfileobj(file.file, f)
+    await save_upload(file, file_location)
 
-    documents = extract_pdf_with_gemini(file_location)
+    extraction_stats = {}
+    documents = await run_in_threadpool(extract_pdf_with_gemini, file_location, stats=extraction_stats)
     if not documents:
         return {"error": "Gagal mengekstrak QnA dari PDF"}
 
-    index = create_vector_index(documents, vector_store, embed_model)
+    index = await run_in_threadpool(create_vector_index, documents, get_vector_store(), get_embed_model())
     if not index:
         return {"error": "Gagal membuat vector index ke Qdrant"}
+    await run_in_threadpool(index_registry.reload)
     node_summaries = []
 
     try:
-        all_nodes = index.vector_store.get_nodes()
+        # Cukup 10 node dari dokumen ini; tidak perlu memuat seluruh koleksi
+        filters = build_metadata_filters({"source": os.path.basename(file_location)})
+        sample, _ = await run_in_threadpool(get_vector_store().scroll_nodes, filters, 10)
 
-        for i, node in enumerate(all_nodes[:10], 1): 
+        for i, node in enumerate(sample, 1):
             node_summary = {
                 "nomor": i,
-                "text_snippet": node.text[:100].replace("\n", " ") + "...",
-                "metadata": node.metadata
+                "text_snippet": (node["text"] or "")[:100].replace("\n", " ") + "...",
+                "metadata": node["metadata"]
             }
             node_summaries.append(node_summary)
 
@@ -108,7 +375,8 @@ async def upload_pdf(file: UploadFile = File(...)):
         "pesan": "Berhasil upload, ekstrak, dan indexing",
         "jumlah_dokumen": len(documents),
         "jumlah_node": len(node_summaries),
-        "node_sampel": node_summaries
+        "node_sampel": node_summaries,
+        "cache_ekstraksi": extraction_stats
     }
 
 
@@ -120,32 +388,47 @@ async def search_similar_text(
     query2: Optional[str] = Query(None, description="Pertanyaan kedua (contoh: Berapa EPS tahun 2024?)"),
     bank1: Optional[str] = Query(None, description="Nama lengkap bank, contoh: PT BANK MANDIRI (PERSERO) TBK"),
     bank2: Optional[str] = Query(None, description="Nama lengkap bank, contoh: PT BANK CENTRAL ASIA TBK"),
-    tahun1: Optional[str] = Query(None, description="Tahun untuk query 1"),
-    tahun2: Optional[str] = Query(None, description="Tahun untuk query 2"),
-    top_k: int = Query(5, description="Jumlah hasil teratas untuk setiap query")
+    tahun1: Optional[str] = Query(None, description="Tahun untuk query 1 (boleh rentang, contoh: 2022-2024)"),
+    tahun2: Optional[str] = Query(None, description="Tahun untuk query 2 (boleh rentang, contoh: 2022-2024)"),
+    top_k: int = Query(5, description="Jumlah hasil teratas untuk setiap query"),
+    fakta_saja: bool = Query(False, description="Lewati similarity search bila semua query terjawab tabel fakta"),
+    timing: bool = Query(False, description="Sertakan rincian waktu per tahap di respons")
 ):
+    start_trace()
+    with_timing = timing or RESPONSE_TIMING
+    logger.debug(
+        "🔍 Pencarian: query1=%r query2=%r filter1=%s filter2=%s top_k=%d",
+        query1, query2, {"bank": bank1, "tahun": tahun1}, {"bank": bank2, "tahun": tahun2}, top_k
+    )
+
+    fact_store = get_fact_store()
+    fakta1 = fact_store.lookup(bank1, query1, tahun1) if fact_store else None
+    fakta2 = fact_store.lookup(bank2, query2, tahun2) if fact_store and query2 else None
+    record_cache("fakta", "hit", int(bool(fakta1)) + int(bool(fakta2)))
+    record_cache("fakta", "miss", int(not fakta1) + int(bool(query2) and not fakta2))
+    if fakta_saja and fakta1 and (fakta2 or not query2):
+        response_data = {
+            "query1_results": [],
+            "query2_results": [] if query2 else None,
+            "fakta1": fakta1,
+            "fakta2": fakta2,
+        }
+        timing_summary = finish_request("search", "fakta")
+        if with_timing:
+            response_data["timing"] = timing_summary
+        return response_data
 
-    print("🔍 Menerima permintaan pencarian...")
-    print(f"  ✅ Query 1: {query1}")
-    print(f"  ✅ Query 2: {query2}")
-    print(f"  ✅ Filter 1: {{'bank': {bank1}, 'tahun': {tahun1}}}")
-    print(f"  ✅ Filter 2: {{'bank': {bank2}, 'tahun': {tahun2}}}")
-    print(f"  ✅ Top K: {top_k}")
-
-    # Load index
-    print("📦 Memuat index dari vector store...")
-    index = load_index(vector_store)
+    index = index_registry.get()
     if not index:
-        print("❌ Gagal memuat index")
+        logger.error("❌ Gagal memuat index")
+        finish_request("search", "error")
         return JSONResponse(content={"error": "❌ Index belum tersedia di Qdrant. Buat index terlebih dahulu."}, status_code=404)
-    print("✅ Index berhasil dimuat")
 
     # Lakukan similarity search
     try:
-        print("🔎 Melakukan similarity search...")
         filter1 = {"bank": bank1, "tahun": tahun1}
         filter2 = {"bank": bank2, "tahun": tahun2}
-        nodes1, nodes2 = similarity_search_dual(
+        nodes1, nodes2 = await similarity_search_dual_async(
             index=index,
             query1=query1,
             query2=query2,
@@ -154,7 +437,8 @@ async def search_similar_text(
             similarity_top_k=top_k
         )
     except Exception as e:
-        print(f"❌ Error saat melakukan similarity search: {e}")
+        logger.error("❌ Error saat melakukan similarity search: %s", e)
+        finish_request("search", "error")
         return JSONResponse(content={"error": f"❌ Error saat similarity search: {str(e)}"}, status_code=500)
 
     def format_nodes(nodes):
@@ -170,17 +454,20 @@ async def search_similar_text(
     formatted_nodes1 = format_nodes(nodes1)
     formatted_nodes2 = format_nodes(nodes2) if query2 else None
 
-    print("📄 Hasil Query 1:")
-    pprint.pprint(formatted_nodes1)
-
-    if formatted_nodes2:
-        print("📄 Hasil Query 2:")
-        pprint.pprint(formatted_nodes2)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("📄 Hasil Query 1: %s", json.dumps(formatted_nodes1, ensure_ascii=False, indent=2, default=str))
+        if formatted_nodes2:
+            logger.debug("📄 Hasil Query 2: %s", json.dumps(formatted_nodes2, ensure_ascii=False, indent=2, default=str))
 
     response_data = {
         "query1_results": formatted_nodes1,
         "query2_results": formatted_nodes2,
+        "fakta1": fakta1,
+        "fakta2": fakta2,
     }
+    timing_summary = finish_request("search", "rag")
+    if with_timing:
+        response_data["timing"] = timing_summary
 
     return response_data
 
@@ -193,54 +480,152 @@ async def upload_csv(file: UploadFile = File(...)):
         # Simpan file temporer
         temp_file_path = f"temp_uploads/{file.filename}"
         os.makedirs("temp_uploads", exist_ok=True)
-
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        await save_upload(file, temp_file_path)
 
         # Proses indexing
-        index = create_vector_index_from_qa_csv(
+        stats = {}
+        index = await run_in_threadpool(
+            create_vector_index_from_qa_csv,
             csv_path=temp_file_path,
-            vector_store=vector_store,
-            embed_model=embed_model
+            vector_store=get_vector_store(),
+            embed_model=get_embed_model(),
+            stats=stats
         )
 
         if index is None:
-            return JSONResponse(status_code=500, content={"message": "Gagal membuat index"})
+            return JSONResponse(status_code=500, content={"message": "Gagal membuat index", "ringkasan": stats})
+        await run_in_threadpool(index_registry.reload)
 
-        return {"message": "✅ CSV berhasil diproses dan diindeks ke Qdrant"}
+        return {"message": "✅ CSV berhasil diproses dan diindeks ke Qdrant", "ringkasan": stats}
 
     except Exception as e:
         return JSONResponse(status_code=500, content={"message": f"❌ Error: {str(e)}"})
 
 
 @app.get("/all-nodes")
-async def get_all_nodes(limit: int = 100):
-    index = load_index(vector_store)
+async def get_all_nodes(
+    limit: int = Query(100, ge=1, description="Jumlah node per halaman (maks. ALL_NODES_MAX_PAGE)"),
+    cursor: Optional[str] = Query(None, description="Nilai next_cursor dari halaman sebelumnya"),
+    bank: Optional[str] = Query(None, description="Nama bank atau alias, contoh: BCA"),
+    tahun: Optional[str] = Query(None, description="Tahun atau rentang, contoh: 2022-2024"),
+    source: Optional[str] = Query(None, description="Nama file sumber, contoh: laporan_bca_2024.pdf"),
+    fields: Optional[str] = Query(None, description="Field dipisah koma: text, metadata, atau nama field metadata (bank, tahun, page, ...)"),
+    format: str = Query("json", pattern="^(json|ndjson)$", description="json = satu halaman, ndjson = ekspor streaming semua node"),
+    total: bool = Query(False, description="Sertakan jumlah node yang cocok dengan filter")
+):
+    index = index_registry.get()
     if not index:
         return JSONResponse(content={"error": "❌ Index belum tersedia di Qdrant."}, status_code=404)
 
     try:
-        all_nodes = index.vector_store.get_nodes()
-        total_nodes = len(all_nodes)
+        decode_cursor(cursor)
+    except ValueError as e:
+        return JSONResponse(content={"error": f"❌ {e}"}, status_code=400)
 
-        node_list = [
-            {
-                "nomor": i + 1,
-                "text": node.text,
-                "metadata": node.metadata
-            }
-            for i, node in enumerate(all_nodes[:limit])
-        ]
+    vector_store = get_vector_store()
+    filters = build_metadata_filters({"bank": bank, "tahun": tahun, "source": source})
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
 
-        return {
-            "total_node_dalam_index": total_nodes,
+    if format == "ndjson":
+        # Generator sinkron dijalankan StreamingResponse di threadpool; hanya satu
+        # halaman yang ada di memori pada satu waktu
+        def export():
+            for records in iter_node_pages(vector_store, filters, ALL_NODES_EXPORT_PAGE, field_list, cursor):
+                yield "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records)
+
+        return StreamingResponse(export(), media_type="application/x-ndjson")
+
+    try:
+        node_list, next_cursor = await run_in_threadpool(
+            vector_store.scroll_nodes, filters, min(limit, ALL_NODES_MAX_PAGE), cursor, field_list
+        )
+        response = {
             "jumlah_node_ditampilkan": len(node_list),
+            "next_cursor": next_cursor,
             "data": node_list
         }
+        if total:
+            response["total_node_dalam_index"] = await run_in_threadpool(vector_store.count_nodes, filters)
+        return response
 
     except Exception as e:
         return JSONResponse(content={"error": f"Gagal mengambil node: {str(e)}"}, status_code=500)
 
+@app.post("/jobs/upload")
+async def submit_upload_job(file: UploadFile = File(...)):
+    file_location = f"temp/{file.filename}"
+    os.makedirs("temp", exist_ok=True)
+    await save_upload(file, file_location)
+
+    job = job_manager.submit("pdf", file_location)
+    return JSONResponse(status_code=202, content={"job_id": job["id"], "status": job["status"]})
+
+
+@app.post("/jobs/upload_csv")
+async def submit_upload_csv_job(file: UploadFile = File(...)):
+    temp_file_path = f"temp_uploads/{file.filename}"
+    os.makedirs("temp_uploads", exist_ok=True)
+    await save_upload(file, temp_file_path)
+
+    job = job_manager.submit("csv", temp_file_path)
+    return JSONResponse(status_code=202, content={"job_id": job["id"], "status": job["status"]})
+
+
+@app.get("/jobs")
+async def list_jobs():
+    return {"data": job_manager.list_jobs()}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if not job:
+        return JSONResponse(content={"error": "❌ Job tidak ditemukan."}, status_code=404)
+    return job
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    extraction_cache = get_extraction_cache()
+    return {
+        "embedding": get_embed_model().metrics(),
+        "jawaban": answer_cache.stats(),
+        "ekstraksi": extraction_cache.stats() if extraction_cache else None,
+    }
+
+
+@app.post("/analytics")
+async def analytics(payload: AnalyticsRequest = Body(...)):
+    cube = await run_in_threadpool(get_fact_cube)
+    if cube is None or not cube.metrics:
+        return JSONResponse(content={"error": "❌ Tabel fakta masih kosong. Silakan upload dokumen terlebih dahulu."}, status_code=404)
+
+    ratios = [tuple(pair) for pair in payload.rasio or [] if len(pair) == 2]
+    return cube.analyze(payload.bank, payload.metrik, payload.tahun, ratios)
+
+
+@app.get("/facts/stats")
+async def facts_stats():
+    fact_store = get_fact_store()
+    return fact_store.stats() if fact_store else {"jumlah_fakta": 0, "jumlah_kunci": 0}
+
+
+@app.get("/index/status")
+async def index_status():
+    status = index_registry.status()
+    vector_store = get_vector_store()
+    if hasattr(vector_store, "status"):
+        status["vector_backend"] = vector_store.status()
+    status["filter_kanonik"] = canonical_filters_enabled()
+    lexical = get_lexical_index()
+    status["indeks_leksikal"] = lexical.stats() if lexical is not None else None
+    status["provider"] = provider_status()
+    return status
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Laporan Keuangan API. Use /upload/ to upload PDF files."}
\ No newline at end of file
@@ -0,0 +1,241 @@
+import threading
+
+import numpy as np
+
+from services.banks import canonicalize_bank, display_name
+from services.facts import get_fact_store, metric_key, resolve_metric, format_indonesian_number
+
+# Skala satuan agar fakta dengan satuan berbeda ("jutaan Rupiah" vs "miliar") bisa dibandingkan
+_UNIT_SCALE = {
+    "rupiah": 1.0,
+    "ribu": 1e3, "ribuan rupiah": 1e3,
+    "juta": 1e6, "jutaan rupiah": 1e6, "juta rupiah": 1e6,
+    "miliar": 1e9, "milyar": 1e9, "miliaran rupiah": 1e9, "miliar rupiah": 1e9,
+    "triliun": 1e12, "triliunan rupiah": 1e12, "triliun rupiah": 1e12,
+}
+
+
+def _scale(unit):
+    return _UNIT_SCALE.get((unit or "").strip().lower())
+
+
+def _clean(value, digits=4):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+def _to_lists(values, digits=4):
+    # Pembulatan dan konversi sekali untuk seluruh array; NaN/inf tetap NaN
+    return np.round(np.where(np.isfinite(values), values, np.nan), digits).tolist()
+
+
+def _series(values, labels):
+    return {label: (None if v != v else v) for label, v in zip(labels, values)}
+
+
+# Kubus nilai fakta [bank, metrik, tahun] (NaN = tidak ada) sehingga pertumbuhan,
+# selisih, rasio dan deret multi-tahun untuk banyak bank dihitung sekaligus.
+class FactCube:
+    def __init__(self, facts):
+        self.banks = sorted({f["bank"] for f in facts})
+        self.metrics = sorted({f["metric"] for f in facts})
+        self.years = sorted({int(f["tahun"]) for f in facts})
+        self._bank_index = {b: i for i, b in enumerate(self.banks)}
+        self._metric_index = {m: i for i, m in enumerate(self.metrics)}
+        self._year_index = {y: i for i, y in enumerate(self.years)}
+
+        # Satuan tampilan per metrik = satuan yang paling sering muncul
+        unit_counts = {}
+        for f in facts:
+            counts = unit_counts.setdefault(f["metric"], {})
+            counts[f["unit"] or ""] = counts.get(f["unit"] or "", 0) + 1
+        self.units = {m: max(counts, key=counts.get) for m, counts in unit_counts.items()}
+
+        shape = (len(self.banks), len(self.metrics), len(self.years))
+        self.values = np.full(shape, np.nan)
+        seen = np.zeros(shape, dtype=bool)
+        for f in facts:
+            value = self._convert(f["value"], f["unit"], self.units[f["metric"]])
+            if value is None:
+                continue
+            cell = (self._bank_index[f["bank"]], self._metric_index[f["metric"]], self._year_index[int(f["tahun"])])
+            # Dua nilai berbeda di sel yang sama dianggap ambigu
+            if seen[cell] and not np.isclose(self.values[cell], value):
+                self.values[cell] = np.nan
+                continue
+            if not seen[cell]:
+                self.values[cell] = value
+                seen[cell] = True
+
+    @staticmethod
+    def _convert(value, unit, target_unit):
+        if (unit or "") == (target_unit or ""):
+            return value
+        source, target = _scale(unit), _scale(target_unit)
+        if source is None or target is None:
+            return None
+        return value * source / target
+
+    def resolve_metric(self, metric):
+        if metric in self._metric_index:
+            return metric
+        return resolve_metric(metric_key(metric) or metric, self._metric_index)
+
+    def analyze(self, banks, metrics, years=None, ratios=()):
+        bank_keys, metric_keys, missing = [], [], []
+        for bank in banks:
+            canonical = canonicalize_bank(bank)
+            if canonical in self._bank_index and canonical not in bank_keys:
+                bank_keys.append(canonical)
+            elif canonical not in self._bank_index:
+                missing.append(bank)
+        for metric in list(metrics) + [m for pair in ratios for m in pair]:
+            resolved = self.resolve_metric(metric)
+            if resolved is None:
+                missing.append(metric)
+            elif resolved not in metric_keys:
+                metric_keys.append(resolved)
+
+        year_keys = sorted({int(y) for y in years if int(y) in self._year_index}) if years else list(self.years)
+        if not bank_keys or not metric_keys or not year_keys:
+            return {"bank": [], "metrik": [], "tahun": [], "data": {}, "tidak_ditemukan": missing}
+
+        b = [self._bank_index[k] for k in bank_keys]
+        m = [self._metric_index[k] for k in metric_keys]
+        y = [self._year_index[k] for k in year_keys]
+        sub = self.values[np.ix_(b, m, y)]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            prev, curr = sub[..., :-1], sub[..., 1:]
+            diff = curr - prev
+            growth = np.where(prev != 0, diff / np.abs(prev), np.nan)
+
+            periods = year_keys[-1] - year_keys[0]
+            first, last = sub[..., 0], sub[..., -1]
+            cagr = np.where((first > 0) & (last > 0) & (periods > 0), (last / first) ** (1 / max(periods, 1)) - 1, np.nan)
+
+            # Perbandingan antar bank terhadap bank pertama sebagai acuan
+            vs_ref_diff = sub - sub[:1]
+            vs_ref_ratio = np.where(sub[:1] != 0, sub / sub[:1], np.nan)
+
+            ratio_values = {}
+            for numerator, denominator in ratios:
+                num, den = self.resolve_metric(numerator), self.resolve_metric(denominator)
+                if num is None or den is None:
+                    continue
+                n, d = sub[:, metric_keys.index(num), :], sub[:, metric_keys.index(den), :]
+                ratio_values[f"{num} / {den}"] = np.where(d != 0, n / d, np.nan)
+
+        labels = [str(yr) for yr in year_keys]
+        sub_l, diff_l, growth_l = _to_lists(sub), _to_lists(diff), _to_lists(growth)
+        vs_ref_diff_l, vs_ref_ratio_l = _to_lists(vs_ref_diff), _to_lists(vs_ref_ratio)
+        ratio_l = {name: _to_lists(values) for name, values in ratio_values.items()}
+        data = {}
+        for bi, bank in enumerate(bank_keys):
+            per_metric = {}
+            for mi, metric in enumerate(metric_keys):
+                per_metric[metric] = {
+                    "satuan": self.units.get(metric),
+                    "nilai": _series(sub_l[bi][mi], labels),
+                    "selisih_tahunan": _series(diff_l[bi][mi], labels[1:]),
+                    "pertumbuhan": _series(growth_l[bi][mi], labels[1:]),
+                    "cagr": _clean(cagr[bi, mi]),
+                }
+                if bi > 0:
+                    per_metric[metric]["selisih_vs_acuan"] = _series(vs_ref_diff_l[bi][mi], labels)
+                    per_metric[metric]["rasio_vs_acuan"] = _series(vs_ref_ratio_l[bi][mi], labels)
+            data[bank] = {
+                "metrik": per_metric,
+                "rasio": {name: _series(values[bi], labels) for name, values in ratio_l.items()},
+            }
+
+        return {
+            "bank": bank_keys,
+            "bank_acuan": bank_keys[0],
+            "metrik": metric_keys,
+            "tahun": year_keys,
+            "data": data,
+            "tidak_ditemukan": missing,
+        }
+
+
+def _percent(value):
+    return f"{format_indonesian_number(round(value * 100, 2))}%"
+
+
+def format_analytics_block(result):
+    lines = []
+    reference = result.get("bank_acuan")
+    for bank, entry in result["data"].items():
+        for metric, item in entry["metrik"].items():
+            values = [f"{yr} = {format_indonesian_number(v)}" for yr, v in item["nilai"].items() if v is not None]
+            if not values:
+                continue
+            unit = f" ({item['satuan']})" if item["satuan"] else ""
+            lines.append(f"{metric.capitalize()} {display_name(bank)}: {'; '.join(values)}{unit}")
+            for prev, (yr, g) in zip(result["tahun"], item["pertumbuhan"].items()):
+                if g is not None:
+                    lines.append(
+                        f"  Pertumbuhan {prev}–{yr}: {_percent(g)} "
+                        f"(selisih {format_indonesian_number(item['selisih_tahunan'][yr])})"
+                    )
+            if item["cagr"] is not None and len(values) > 2:
+                lines.append(f"  CAGR {result['tahun'][0]}–{result['tahun'][-1]}: {_percent(item['cagr'])}")
+            for yr, d in (item.get("selisih_vs_acuan") or {}).items():
+                ratio = item["rasio_vs_acuan"][yr]
+                if d is not None:
+                    lines.append(
+                        f"  Tahun {yr} dibanding {display_name(reference)}: selisih {format_indonesian_number(d)}"
+                        + (f", rasio {format_indonesian_number(round(ratio, 2))}x" if ratio is not None else "")
+                    )
+        for name, series in entry["rasio"].items():
+            values = [f"{yr} = {format_indonesian_number(round(v, 4))}" for yr, v in series.items() if v is not None]
+            if values:
+                lines.append(f"Rasio {name} {display_name(bank)}: {'; '.join(values)}")
+    if not lines:
+        return None
+    return "=== Perhitungan Otomatis (tabel fakta) ===\n" + "\n".join(lines)
+
+
+_cube = None
+_cube_version = None
+_cube_lock = threading.Lock()
+
+
+def get_fact_cube():
+    # Kubus dibangun ulang hanya bila isi tabel fakta berubah
+    global _cube, _cube_version
+    store = get_fact_store()
+    if store is None:
+        return None
+    with _cube_lock:
+        if _cube is None or _cube_version != store.version:
+            _cube = FactCube(store.all_facts())
+            _cube_version = store.version
+    return _cube
+
+
+def analytics_block_for(subqueries):
+    # Perhitungan untuk pertanyaan perbandingan: minimal dua sel bank-tahun
+    if not subqueries or len(subqueries) < 2:
+        return None
+    cube = get_fact_cube()
+    if cube is None or not cube.metrics:
+        return None
+
+    banks, years, metrics = [], [], []
+    for query, filter_dict in subqueries:
+        filter_dict = filter_dict or {}
+        bank = canonicalize_bank(filter_dict.get("bank"))
+        tahun = str(filter_dict.get("tahun") or "")
+        metric = metric_key(query)
+        if bank and bank not in banks:
+            banks.append(bank)
+        if tahun.isdigit() and int(tahun) not in years:
+            years.append(int(tahun))
+        if metric and metric not in metrics:
+            metrics.append(metric)
+    if not banks or not years or not metrics:
+        return None
+
+    result = cube.analyze(banks, metrics, years)
+    return format_analytics_block(result) if result["data"] else None
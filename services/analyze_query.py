@@ -1,8 +1,13 @@
 import json
 import re
+import logging
 from llama_index.core.llms import ChatMessage
-from services.model_init import llm 
-from services.searcher import similarity_search_dual
+from services.model_init import get_llm
+from services.searcher import similarity_search_dual, similarity_search_multi_async
+from services.query_rules import analyze_query_with_rules, QUERY_RULES_MIN_CONFIDENCE
+from services.telemetry import stage
+
+logger = logging.getLogger(__name__)
 
 def normalize_metadata_filter(filter_dict):
     if not filter_dict:
@@ -12,20 +17,23 @@ def normalize_metadata_filter(filter_dict):
         for key, value in filter_dict.items()
     }
 
-def analyze_query_with_llm(query_user: str):
-    prompt = f"""
+def build_analysis_prompt(query_user: str):
+    return f"""
     Kamu adalah asisten cerdas yang menganalisis pertanyaan dari user untuk kebutuhan pencarian laporan keuangan bank.
 
     Tugasmu:
     1. Tentukan apakah pertanyaan ini membutuhkan 1 query atau perbandingan (2 query).
     2. Jika 1 query: keluarkan satu query, dan metadata filter (bank, tahun, jenis laporan jika ada).
     3. Jika 2 query: ekstrak dua pertanyaan dengan perbedaan tahun (atau bank), dan filter metadata masing-masing.
+    4. Jika perbandingan melibatkan lebih dari dua bank atau tahun (mis. "BCA, Mandiri dan BRI tahun 2022–2024"),
+       isi "num_queries" dengan jumlahnya dan tuliskan semua pertanyaan di daftar "queries",
+       masing-masing berbentuk {{"query": "...", "filter": {{"bank": "...", "tahun": "..."}}}}.
 
     Contoh output format JSON:
     {{
       "num_queries": 2,
       "query1": "Berapa EPS Bank BCA tahun 2023?",
-      "query2": "Berapa EPS Bank BCA tahun 2024?", 
+      "query2": "Berapa EPS Bank BCA tahun 2024?",
       "filter1": {{"bank": "PT BANK CENTRAL ASIA TBK", "tahun": "2023"}},
       "filter2": {{"bank": "PT BANK CENTRAL ASIA TBK", "tahun": "2024"}}
     }}
@@ -35,41 +43,98 @@ def analyze_query_with_llm(query_user: str):
     "{query_user}"
     """
 
+def parse_analysis_response(response_text: str):
+    match = re.search(r"\{.*\}", response_text, re.DOTALL)
+    if not match:
+        raise ValueError("Tidak ditemukan blok JSON dalam respons.")
+
+    json_block = match.group(0)
+    result = json.loads(json_block)
+
+    if "filter1" in result:
+        result["filter1"] = normalize_metadata_filter(result["filter1"])
+    if "filter2" in result:
+        result["filter2"] = normalize_metadata_filter(result["filter2"])
+    for item in result.get("queries") or []:
+        item["filter"] = normalize_metadata_filter(item.get("filter"))
+
+    return result
+
+def subqueries_from_analysis(analysis):
+    # Format lama: query1/filter1, query2/filter2. Format baru: daftar "queries".
+    if analysis.get("queries"):
+        return [(item.get("query"), item.get("filter") or None) for item in analysis["queries"]]
+
+    subqueries = [(analysis.get("query1"), analysis.get("filter1"))]
+    if analysis.get("num_queries") == 2:
+        subqueries.append((analysis.get("query2"), analysis.get("filter2")))
+    return subqueries
+
+def analyze_query_with_llm(query_user: str):
+    prompt = build_analysis_prompt(query_user)
+    response_text = ""
+
     try:
-        response = llm.chat(messages=[ChatMessage(role="user", content=prompt)])
+        with stage("analisis_llm"):
+            response = get_llm().chat(messages=[ChatMessage(role="user", content=prompt)])
         response_text = response.message.content.strip()
+        return parse_analysis_response(response_text)
 
-        match = re.search(r"\{.*\}", response_text, re.DOTALL)
-        if not match:
-            raise ValueError("Tidak ditemukan blok JSON dalam respons.")
-
-        json_block = match.group(0)
-        result = json.loads(json_block)
+    except Exception as e:
+        logger.error("❌ Gagal parsing output LLM: %s", e)
+        logger.debug("📄 Response LLM:\n%s", response_text)
+        return None
 
-        if "filter1" in result:
-            result["filter1"] = normalize_metadata_filter(result["filter1"])
-        if "filter2" in result:
-            result["filter2"] = normalize_metadata_filter(result["filter2"])
+async def analyze_query_with_llm_async(query_user: str):
+    prompt = build_analysis_prompt(query_user)
+    response_text = ""
 
-        return result
+    try:
+        with stage("analisis_llm"):
+            response = await get_llm().achat(messages=[ChatMessage(role="user", content=prompt)])
+        response_text = response.message.content.strip()
+        return parse_analysis_response(response_text)
 
     except Exception as e:
-        print(f"❌ Gagal parsing output LLM: {e}")
-        print("📄 Response LLM:\n", response_text)
+        logger.error("❌ Gagal parsing output LLM: %s", e)
+        logger.debug("📄 Response LLM:\n%s", response_text)
         return None
 
-def smart_rag_search(index, user_query, similarity_top_k=3):
-    analysis = analyze_query_with_llm(user_query)
-    print("🔍 Analisis query:", json.dumps(analysis, indent=2))
+def _confident_rules_analysis(query_user: str):
+    with stage("analisis_aturan"):
+        analysis = analyze_query_with_rules(query_user)
+    if analysis["confidence"] >= QUERY_RULES_MIN_CONFIDENCE:
+        return analysis
+    logger.info("🤔 Analisis aturan kurang yakin (%s), memakai LLM", analysis["confidence"])
+    return None
+
+def analyze_query(query_user: str):
+    # Jalur cepat berbasis aturan; LLM hanya dipakai jika aturan ragu
+    return _confident_rules_analysis(query_user) or analyze_query_with_llm(query_user)
+
+async def analyze_query_async(query_user: str):
+    return _confident_rules_analysis(query_user) or await analyze_query_with_llm_async(query_user)
+
+def early_message_from_analysis(analysis):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🔍 Analisis query: %s", json.dumps(analysis, indent=2))
 
     if not analysis:
-        print("❌ Gagal menganalisis query.")
-        return [], [], "Gagal menganalisis pertanyaan."
+        logger.warning("❌ Gagal menganalisis query.")
+        return "Gagal menganalisis pertanyaan."
 
     # Jika sapaan atau bukan pertanyaan data
     if analysis.get("num_queries", 0) == 0:
         message = analysis.get("message", "Silakan ajukan pertanyaan seputar laporan keuangan.")
-        print("💬 Jawaban langsung dari LLM:", message)
+        logger.debug("💬 Jawaban langsung (%s): %s", analysis.get("source", "llm"), message)
+        return message
+
+    return None
+
+def smart_rag_search(index, user_query, similarity_top_k=3):
+    analysis = analyze_query(user_query)
+    message = early_message_from_analysis(analysis)
+    if message:
         return [], [], message
 
     if analysis["num_queries"] == 2:
@@ -89,4 +154,25 @@ def smart_rag_search(index, user_query, similarity_top_k=3):
             filter1=analysis.get("filter1"),
             similarity_top_k=similarity_top_k
         )
-        return nodes1, [], None
\ No newline at end of file
+        return nodes1, [], None
+
+async def search_from_analysis_async(index, analysis, similarity_top_k=3):
+    subqueries = subqueries_from_analysis(analysis)
+    groups = await similarity_search_multi_async(
+        index=index,
+        queries=[q for q, _ in subqueries],
+        filters=[f for _, f in subqueries],
+        similarity_top_k=similarity_top_k
+    )
+    # nodes2 menampung hasil semua sub-query setelah yang pertama
+    nodes2 = [node for group in groups[1:] for node in group]
+    return groups[0], nodes2
+
+async def smart_rag_search_async(index, user_query, similarity_top_k=3):
+    analysis = await analyze_query_async(user_query)
+    message = early_message_from_analysis(analysis)
+    if message:
+        return [], [], message
+
+    nodes1, nodes2 = await search_from_analysis_async(index, analysis, similarity_top_k)
+    return nodes1, nodes2, None
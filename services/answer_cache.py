@@ -0,0 +1,118 @@
+import os
+import logging
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", (text or "")).strip().casefold()
+
+
+def _tag(bank, tahun):
+    return (_normalize(bank), str(tahun or "").strip())
+
+
+# Cache jawaban /chat. Kunci = sub-query ternormalisasi + filter + sidik jari id
+# node hasil retrieval (+ history), jadi jawaban hanya dipakai ulang jika konteks
+# yang dikirim ke LLM memang sama.
+class AnswerCache:
+    def __init__(self, ttl_seconds=ANSWER_CACHE_TTL_SECONDS, max_entries=ANSWER_CACHE_SIZE):
+        self._ttl = ttl_seconds
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidated = 0
+
+    @staticmethod
+    def make_key(subqueries, nodes, history=None):
+        payload = {
+            "queries": [
+                [_normalize(query), sorted((k, _normalize(str(v))) for k, v in (filters or {}).items())]
+                for query, filters in subqueries
+            ],
+            "nodes": sorted(n.node.node_id for n in nodes),
+            "history": [[h.get("role"), _normalize(h.get("content"))] for h in (history or [])],
+        }
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def tags_for(subqueries, nodes):
+        tags = set()
+        for _, filters in subqueries:
+            filters = filters or {}
+            if filters.get("bank") or filters.get("tahun"):
+                tags.add(_tag(filters.get("bank"), filters.get("tahun")))
+        for n in nodes:
+            tags.add(_tag(n.node.metadata.get("bank"), n.node.metadata.get("tahun")))
+        return tags
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry["stored_at"] > self._ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, key, answer, history, tags):
+        with self._lock:
+            self._entries[key] = {
+                "jawaban": answer,
+                "history": history,
+                "tags": tags,
+                "stored_at": time.monotonic(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, pairs):
+        # Hapus entri yang menyentuh bank/tahun yang baru saja di-ingest ulang.
+        # Tag dengan bank atau tahun kosong dianggap cocok dengan apa saja.
+        targets = {_tag(bank, tahun) for bank, tahun in pairs}
+        if not targets:
+            return 0
+
+        def matches(tag):
+            return any(
+                (not tag[0] or not bank or tag[0] == bank) and (not tag[1] or not tahun or tag[1] == tahun)
+                for bank, tahun in targets
+            )
+
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if any(matches(t) for t in entry["tags"])]
+            for key in stale:
+                del self._entries[key]
+            self._invalidated += len(stale)
+        if stale:
+            logger.info("🧹 [ANSWER CACHE] %s jawaban dibuang karena data diperbarui", len(stale))
+        return len(stale)
+
+    def stats(self):
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hit": self._hits,
+                "miss": self._misses,
+                "hit_rate": self._hits / total if total else 0.0,
+                "invalidated": self._invalidated,
+            }
+
+
+answer_cache = AnswerCache()
@@ -0,0 +1,114 @@
+import re
+
+# Nama kanonik (sama dengan metadata "bank" hasil ekstraksi) -> nama tampilan, id singkat
+# (kode emiten, dipakai sebagai payload "bank_id" di vector store) dan alias.
+BANKS = {
+    "PT BANK CENTRAL ASIA TBK": {
+        "display": "PT Bank Central Asia Tbk",
+        "id": "BBCA",
+        "aliases": ["bank central asia", "central asia", "bca", "bbca"],
+    },
+    "PT BANK MANDIRI (PERSERO) TBK": {
+        "display": "PT Bank Mandiri (Persero) Tbk",
+        "id": "BMRI",
+        "aliases": ["bank mandiri", "mandiri", "bmri"],
+    },
+    "PT BANK RAKYAT INDONESIA (PERSERO) TBK": {
+        "display": "PT Bank Rakyat Indonesia (Persero) Tbk",
+        "id": "BBRI",
+        "aliases": ["bank rakyat indonesia", "rakyat indonesia", "bri", "bbri"],
+    },
+    "PT BANK NEGARA INDONESIA (PERSERO) TBK": {
+        "display": "PT Bank Negara Indonesia (Persero) Tbk",
+        "id": "BBNI",
+        "aliases": ["bank negara indonesia", "negara indonesia", "bni", "bbni"],
+    },
+    "PT BANK TABUNGAN NEGARA (PERSERO) TBK": {
+        "display": "PT Bank Tabungan Negara (Persero) Tbk",
+        "id": "BBTN",
+        "aliases": ["bank tabungan negara", "tabungan negara", "btn", "bbtn"],
+    },
+    "PT BANK SYARIAH INDONESIA TBK": {
+        "display": "PT Bank Syariah Indonesia Tbk",
+        "id": "BRIS",
+        "aliases": ["bank syariah indonesia", "syariah indonesia", "bsi", "bris"],
+    },
+    "PT BANK CIMB NIAGA TBK": {
+        "display": "PT Bank CIMB Niaga Tbk",
+        "id": "BNGA",
+        "aliases": ["cimb niaga", "cimb", "bnga"],
+    },
+    "PT BANK DANAMON INDONESIA TBK": {
+        "display": "PT Bank Danamon Indonesia Tbk",
+        "id": "BDMN",
+        "aliases": ["bank danamon", "danamon", "bdmn"],
+    },
+    "PT BANK PERMATA TBK": {
+        "display": "PT Bank Permata Tbk",
+        "id": "BNLI",
+        "aliases": ["bank permata", "permata", "bnli"],
+    },
+    "PT BANK OCBC NISP TBK": {
+        "display": "PT Bank OCBC NISP Tbk",
+        "id": "NISP",
+        "aliases": ["ocbc nisp", "ocbc", "nisp"],
+    },
+    "PT BANK PAN INDONESIA TBK": {
+        "display": "PT Bank Pan Indonesia Tbk",
+        "id": "PNBN",
+        "aliases": ["bank pan indonesia", "pan indonesia", "panin", "pnbn"],
+    },
+}
+
+# Alias terpanjang dicoba lebih dulu agar "cimb niaga" tidak terpotong jadi "cimb"
+_ALIASES = sorted(
+    ((alias, canonical) for canonical, info in BANKS.items() for alias in info["aliases"]),
+    key=lambda item: len(item[0]),
+    reverse=True,
+)
+# Sebutan lengkap ikut ditangkap: "PT Bank BCA Tbk", "Bank Mandiri (Persero)"
+_ALIAS_PATTERN = re.compile(
+    r"(?:\bpt\.?\s+)?(?:\bbank\s+)?\b("
+    + "|".join(re.escape(alias) for alias, _ in _ALIASES)
+    + r")\b(?:\s*\(persero\))?(?:\s+tbk\b\.?)?",
+    re.IGNORECASE,
+)
+_ALIAS_TO_CANONICAL = {alias: canonical for alias, canonical in _ALIASES}
+
+
+def find_banks(text):
+    # Semua bank yang disebut, sesuai urutan kemunculan, tanpa duplikat
+    found = []
+    for match in _ALIAS_PATTERN.finditer(text or ""):
+        canonical = _ALIAS_TO_CANONICAL[match.group(1).lower()]
+        if canonical not in found:
+            found.append(canonical)
+    return found
+
+
+def bank_mentions(text):
+    return [match.span() for match in _ALIAS_PATTERN.finditer(text or "")]
+
+
+def canonicalize_bank(text):
+    if not text:
+        return None
+    if text.strip().upper() in BANKS:
+        return text.strip().upper()
+    banks = find_banks(text)
+    return banks[0] if banks else None
+
+
+def display_name(canonical):
+    info = BANKS.get(canonical)
+    return info["display"] if info else canonical
+
+
+def bank_id(text):
+    # Id stabil untuk filter; bank di luar daftar memakai nama huruf besar apa adanya
+    if not text or not str(text).strip():
+        return None
+    canonical = canonicalize_bank(str(text))
+    if canonical:
+        return BANKS[canonical]["id"]
+    return str(text).strip().upper()
@@ -0,0 +1,209 @@
+import os
+import re
+import logging
+from typing import List
+
+from llama_index.core.llms import ChatMessage
+
+from services.embedding_cache import normalize_text, QUERY
+from services.telemetry import stage, record_tokens
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "800"))
+# Dua chunk dengan kemiripan shingle di atas ambang ini dianggap duplikat
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8"))
+# Bobot skor retriever vs. kecocokan kata dengan pertanyaan saat rerank
+CONTEXT_RERANK_LEXICAL_WEIGHT = float(os.getenv("CONTEXT_RERANK_LEXICAL_WEIGHT", "0.3"))
+
+CONTEXT_SEPARATOR = "\n\n"
+_CONTEXT_MARKER = "=== Konteks Dokumen ==="
+_WORD = re.compile(r"\w+", re.UNICODE)
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+_tokenizer = None
+
+
+def count_tokens(text):
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            from llama_index.core.utils import get_tokenizer
+            _tokenizer = get_tokenizer()
+        except Exception:
+            # Perkiraan kasar bila tiktoken tidak tersedia
+            _tokenizer = lambda t: [None] * (len(t) // 4 + 1)
+    return len(_tokenizer(text or ""))
+
+
+def _words(text):
+    return _WORD.findall(normalize_text(text, QUERY))
+
+
+def _shingles(words, size=3):
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _similarity(a, b):
+    # Containment: chunk pendek yang seluruhnya termuat di chunk lain tetap terdeteksi
+    if not a or not b:
+        return 0.0
+    return len(a & b) / min(len(a), len(b))
+
+
+def _node_group(node_with_score):
+    metadata = node_with_score.node.metadata or {}
+    return metadata.get("bank"), str(metadata.get("tahun") or "")
+
+
+def rerank_nodes(query_texts, nodes):
+    # Skor retriever dinormalisasi lalu digabung dengan porsi kata pertanyaan
+    # yang muncul di chunk; murah dan tidak butuh model tambahan.
+    terms = set()
+    for text in query_texts:
+        terms.update(_words(text))
+
+    scores = [n.score or 0.0 for n in nodes]
+    low, high = (min(scores), max(scores)) if scores else (0.0, 0.0)
+    spread = (high - low) or 1.0
+
+    ranked = []
+    for n, score in zip(nodes, scores):
+        words = set(_words(n.node.get_content()))
+        lexical = len(terms & words) / len(terms) if terms else 0.0
+        combined = (1 - CONTEXT_RERANK_LEXICAL_WEIGHT) * (score - low) / spread + CONTEXT_RERANK_LEXICAL_WEIGHT * lexical
+        ranked.append((combined, n))
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    return [n for _, n in ranked]
+
+
+def _strip_seen_sentences(text, seen_sentences):
+    # Overlap antar chunk bertetangga (chunk_overlap) berbentuk kalimat yang berulang
+    kept = []
+    for sentence in _SENTENCE.split(text):
+        key = " ".join(_words(sentence))
+        if len(key) > 20 and key in seen_sentences:
+            continue
+        kept.append(sentence)
+        if key:
+            seen_sentences.add(key)
+    return " ".join(s.strip() for s in kept if s.strip())
+
+
+def select_context(query_texts, nodes, token_budget=CONTEXT_TOKEN_BUDGET):
+    ordered = rerank_nodes(query_texts, nodes)
+
+    # Node terbaik tiap pasangan (bank, tahun) didahulukan agar pertanyaan
+    # perbandingan tidak kehilangan salah satu sisinya saat budget sempit.
+    firsts, rest, groups = [], [], set()
+    for n in ordered:
+        group = _node_group(n)
+        (rest if group in groups else firsts).append(n)
+        groups.add(group)
+
+    selected, texts = [], []
+    kept_shingles, seen_sentences = [], set()
+    duplicates = trimmed = 0
+    used_tokens = 0
+    for n in firsts + rest:
+        content = n.node.get_content()
+        shingles = _shingles(_words(content))
+        if any(_similarity(shingles, other) >= CONTEXT_DEDUP_THRESHOLD for other in kept_shingles):
+            duplicates += 1
+            continue
+
+        text = _strip_seen_sentences(content, seen_sentences)
+        if not text:
+            duplicates += 1
+            continue
+
+        tokens = count_tokens(text)
+        if used_tokens + tokens > token_budget and selected:
+            trimmed += 1
+            continue
+
+        selected.append(n)
+        texts.append(text)
+        kept_shingles.append(shingles)
+        used_tokens += tokens
+
+    return selected, CONTEXT_SEPARATOR.join(texts), {"duplikat_dibuang": duplicates, "dipotong_budget": trimmed}
+
+
+def _compress_message(message):
+    # Pesan user lama membawa seluruh konteks dokumen; cukup pertanyaannya saja
+    content = message.content or ""
+    if message.role == "user" and _CONTEXT_MARKER in content:
+        content = content.split("\n\n", 1)[0]
+    return ChatMessage(role=message.role, content=content)
+
+
+def trim_history(history: List[ChatMessage], token_budget=HISTORY_TOKEN_BUDGET):
+    compressed = [_compress_message(m) for m in history]
+    total = sum(count_tokens(m.content) for m in compressed)
+    # Bila tidak muat, seperempat budget disisihkan untuk ringkasan pesan lama
+    recent_budget = token_budget if total <= token_budget else int(token_budget * 0.75)
+
+    kept, used = [], 0
+    for message in reversed(compressed):
+        tokens = count_tokens(message.content)
+        if used + tokens > recent_budget:
+            break
+        kept.append(message)
+        used += tokens
+    kept.reverse()
+
+    # History harus diawali pesan user, bukan jawaban assistant yang terpotong
+    while kept and kept[0].role == "assistant":
+        used -= count_tokens(kept.pop(0).content)
+
+    # Pesan yang tidak muat diringkas menjadi daftar pertanyaan terakhir sebelumnya
+    dropped = compressed[:len(compressed) - len(kept)]
+    questions = [m.content.replace("Pertanyaan:", "").strip() for m in dropped if m.role == "user"]
+    prefix = "Ringkasan percakapan sebelumnya, pengguna pernah bertanya: "
+    while questions:
+        summary = ChatMessage(role="system", content=prefix + "; ".join(questions))
+        if used + count_tokens(summary.content) <= token_budget:
+            kept.insert(0, summary)
+            break
+        questions.pop(0)
+    return kept
+
+
+def build_context(query, subqueries, nodes, history: List[ChatMessage] = None,
+                  context_budget=CONTEXT_TOKEN_BUDGET, history_budget=HISTORY_TOKEN_BUDGET):
+    with stage("konteks"):
+        selected, context, trimmed_history, stats = _build_context(
+            query, subqueries, nodes, history or [], context_budget, history_budget
+        )
+    record_tokens("konteks", "konteks", stats["token_konteks_dipakai"])
+    record_tokens("konteks", "history", stats["token_history_dipakai"])
+    logger.debug("✂️ Konteks: %s", stats)
+    return selected, context, trimmed_history, stats
+
+
+def _build_context(query, subqueries, nodes, history, context_budget, history_budget):
+    query_texts = [query] + [q for q, _ in subqueries]
+
+    raw_context_tokens = count_tokens(CONTEXT_SEPARATOR.join(n.node.get_content() for n in nodes))
+    raw_history_tokens = sum(count_tokens(m.content) for m in history)
+
+    selected, context, counts = select_context(query_texts, nodes, context_budget)
+    trimmed_history = trim_history(history, history_budget)
+
+    context_tokens = count_tokens(context)
+    history_tokens = sum(count_tokens(m.content) for m in trimmed_history)
+    stats = {
+        "node_awal": len(nodes),
+        "node_dipakai": len(selected),
+        **counts,
+        "token_konteks_awal": raw_context_tokens,
+        "token_konteks_dipakai": context_tokens,
+        "token_history_awal": raw_history_tokens,
+        "token_history_dipakai": history_tokens,
+        "token_dihemat": (raw_context_tokens - context_tokens) + (raw_history_tokens - history_tokens),
+    }
+    return selected, context, trimmed_history, stats
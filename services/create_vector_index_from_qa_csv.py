@@ -1,70 +1,258 @@
+import os
+import re
 import csv
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime, timezone
 from llama_index.core.schema import TextNode
-from llama_index.core import StorageContext, VectorStoreIndex, load_index_from_storage
+from services.banks import canonicalize_bank
+from services.node_sync import deterministic_node_id, existing_ids_for_sources, delete_node_ids, filter_payload
+from services.ingest_pipeline import IngestPipeline, batched
+from services.embedding_archive import get_embedding_archive
+from services.answer_cache import answer_cache
+from services.facts import get_fact_store, fact_from_qna
+from services.lexical_index import get_lexical_index
+from services import storage
 
+logger = logging.getLogger(__name__)
 
-def create_vector_index_from_qa_csv(csv_path, vector_store, embed_model, persist_dir="storage"):
+# Jumlah baris per checkpoint: node, fakta dan indeks BM25 untuk baris-baris ini
+# sudah tersimpan sebelum posisinya dicatat, sehingga load yang gagal bisa dilanjutkan
+CSV_CHECKPOINT_ROWS = int(os.getenv("CSV_CHECKPOINT_ROWS", "5000"))
+# Kosong = checkpoint dimatikan (load yang gagal diulang dari baris pertama)
+CSV_CHECKPOINT_DIR = os.getenv("CSV_CHECKPOINT_DIR", "storage/csv_checkpoints")
+
+REQUIRED_COLUMNS = ("Pertanyaan", "Jawaban")
+# Sama dengan nilai pengganti di services/extractor.py
+UNKNOWN_BANK = "BANK TIDAK DIKETAHUI"
+UNKNOWN_YEAR = "0000"
+_YEAR = re.compile(r"(?<!\d)((?:19|20)\d{2})(?!\d)")
+_QUESTION_YEAR = re.compile(r"tahun\s+((?:19|20)\d{2})", re.IGNORECASE)
+
+
+def normalize_row(row):
+    # Bank ke nama kanonik, Tahun ke 4 digit ("2024.0", "FY2024" -> "2024").
+    # Baris tanpa jawaban tidak punya teks untuk diindeks: None
+    pertanyaan = (row.get("Pertanyaan") or "").strip()
+    jawaban = (row.get("Jawaban") or "").strip()
+    if not jawaban:
+        return None
+
+    raw_bank = " ".join((row.get("Bank") or "").split())
+    if raw_bank:
+        bank = canonicalize_bank(raw_bank) or raw_bank.upper()
+    else:
+        bank = canonicalize_bank(pertanyaan) or UNKNOWN_BANK
+    year = _YEAR.search(row.get("Tahun") or "") or _QUESTION_YEAR.search(pertanyaan)
+    tahun = year.group(1) if year else UNKNOWN_YEAR
+    return pertanyaan, jawaban, bank, tahun
+
+
+def build_qa_node(source, pertanyaan, jawaban, bank, tahun):
+    metadata = {
+        "pertanyaan": pertanyaan,
+        "bank": bank,
+        "tahun": tahun,
+        "source": source,
+    }
+    node_id = deterministic_node_id(source, None, "\n".join([pertanyaan, jawaban, bank, tahun]))
+    payload = filter_payload(metadata)
+    metadata.update(payload)
+    # Pertanyaan (bentuk yang paling mirip query pengguna), bank dan tahun ikut
+    # teks embedding lewat MetadataMode.EMBED; source dan field filter tidak
+    return TextNode(
+        id_=node_id, text=jawaban, metadata=metadata,
+        excluded_embed_metadata_keys=["source", *payload],
+        excluded_llm_metadata_keys=list(payload),
+    )
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Posisi baris terakhir yang sudah tersimpan untuk satu file CSV. Kuncinya isi
+# file (sha256), jadi upload ulang file yang sama setelah gagal ikut melanjutkan,
+# sedangkan file yang isinya berubah mulai dari awal.
+class CsvCheckpoint:
+    def __init__(self, csv_path, source, directory=CSV_CHECKPOINT_DIR):
+        self.source = source
+        self.rows_done = 0
+        self.stats = {}
+        self.path = None
+        if not directory:
+            return
+
+        self.path = os.path.join(directory, f"{file_sha256(csv_path)}.json")
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("source") == source:
+                self.rows_done = int(state["baris_selesai"])
+                self.stats = state.get("stats") or {}
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("⚠️ Checkpoint %s rusak, mulai dari awal: %s", self.path, e)
+
+    def save(self, rows_done, stats):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Tulis ke file sementara lalu rename agar checkpoint tidak pernah setengah jadi
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "source": self.source,
+                "baris_selesai": rows_done,
+                "stats": stats,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self.rows_done = rows_done
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# CSV dibaca baris demi baris dan diproses per CSV_CHECKPOINT_ROWS baris: hanya
+# baris yang belum ada di vector store yang diembed dan diupsert lewat
+# IngestPipeline, lalu fakta, indeks BM25 dan checkpoint diperbarui. Memori
+# sebanding dengan satu potongan baris (plus set id node), bukan seluruh file.
+def create_vector_index_from_qa_csv(csv_path, vector_store, embed_model, progress_callback=None, stats=None):
+    stats = {} if stats is None else stats
     try:
-        print(f"📂 Membaca data dari file CSV: {csv_path}")
+        logger.info("📂 Membaca data dari file CSV: %s", csv_path)
+        source = os.path.basename(csv_path)
+        checkpoint = CsvCheckpoint(csv_path, source)
+
+        stats.update({"baris_dibaca": 0, "baris_ditolak": 0, "node_baru": 0, "node_tidak_berubah": 0, "fakta": 0})
+        stats.update(checkpoint.stats)
+        if checkpoint.rows_done:
+            logger.info("⏩ Melanjutkan %s dari baris ke-%s (checkpoint)", source, checkpoint.rows_done + 1)
+
+        existing = existing_ids_for_sources(vector_store, {source})
+        logger.info("🧮 %s node sudah ada di vector store untuk source ini", len(existing))
+
+        fact_store = get_fact_store()
+        if fact_store and not checkpoint.rows_done:
+            fact_store.delete_source(source)
+        lexical = get_lexical_index()
+        archive = get_embedding_archive()
+        # Setiap batch yang sudah diupsert ikut masuk arsip embedding
+        pipeline = IngestPipeline(
+            vector_store, embed_model,
+            on_batch=archive.append if archive else None,
+            progress_callback=progress_callback
+        )
 
-        all_nodes = []
+        seen = set()
+        pairs = set()
+        row_number = 0
+        rows_this_run = 0
+        start = time.perf_counter()
 
-        with open(csv_path, mode='r', encoding='utf-8') as file:
+        with open(csv_path, mode="r", newline="", encoding="utf-8-sig") as file:
             reader = csv.DictReader(file)
-            for row in reader:
-                pertanyaan = row.get("Pertanyaan", "").strip()
-                jawaban = row.get("Jawaban", "").strip()
-                bank = row.get("Bank", "").strip()
-                tahun = row.get("Tahun", "").strip()
+            missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+            if missing:
+                raise ValueError(f"Kolom wajib tidak ada di CSV: {', '.join(missing)}")
 
-                text = jawaban
+            for rows in batched(reader, CSV_CHECKPOINT_ROWS):
+                nodes = []
+                facts = []
+                for row in rows:
+                    row_number += 1
+                    # Baris sebelum checkpoint sudah tersimpan; cukup dicatat id-nya
+                    # agar tidak dianggap usang di akhir
+                    replay = row_number <= checkpoint.rows_done
+                    normalized = normalize_row(row)
+                    if normalized is None:
+                        if not replay:
+                            stats["baris_ditolak"] += 1
+                        continue
+                    node = build_qa_node(source, *normalized)
+                    if node.id_ in seen:
+                        continue
+                    seen.add(node.id_)
+                    pairs.add((node.metadata["bank"], node.metadata["tahun"]))
+                    if not replay:
+                        nodes.append(node)
+                        facts.append(fact_from_qna(*normalized, source))
 
-                metadata = {
-                    "pertanyaan": pertanyaan,
-                    "bank": bank,
-                    "tahun": tahun,
-                }
+                if row_number <= checkpoint.rows_done:
+                    continue
 
-                node = TextNode(text=text, metadata=metadata)
-                all_nodes.append(node)
+                new_nodes = [node for node in nodes if node.id_ not in existing]
+                stats["node_tidak_berubah"] += len(nodes) - len(new_nodes)
+                if new_nodes:
+                    upserted = pipeline.upserted
+                    pipeline.run(new_nodes)
+                    stats["node_baru"] += pipeline.upserted - upserted
+                if lexical is not None:
+                    # Tanpa embedding, jadi semua baris diindeks ulang (upsert per id)
+                    lexical.add(nodes)
+                if fact_store:
+                    stats["fakta"] += fact_store.add(facts, reload=False)
 
-        print(f"📚 Total Q&A yang dimuat: {len(all_nodes)}")
+                rows_this_run += row_number - max(checkpoint.rows_done, row_number - len(rows))
+                stats["baris_dibaca"] = row_number
+                elapsed = time.perf_counter() - start
+                stats["baris_per_detik"] = round(rows_this_run / elapsed, 1) if elapsed else None
+                checkpoint.save(row_number, stats)
+                logger.info("📈 %s baris diproses (%s baris/detik)", row_number, stats["baris_per_detik"])
+                if progress_callback:
+                    progress_callback("baris_csv", row_number, None)
 
-        storage_context = StorageContext.from_defaults(
-            vector_store=vector_store,
-            persist_dir=persist_dir
-        )
+        stale_ids = existing - seen
+        delete_node_ids(vector_store, stale_ids)
+        if archive:
+            archive.delete(stale_ids)
+        if lexical is not None:
+            lexical.delete(stale_ids)
+        if fact_store:
+            fact_store.reload()
+        if stats["node_baru"] or stale_ids:
+            answer_cache.invalidate(pairs)
 
-        index = VectorStoreIndex(
-            nodes=all_nodes,
-            storage_context=storage_context,
-            embed_model=embed_model,
-        )
+        index = storage.load_or_create_index(vector_store, embed_model)
+        checkpoint.clear()
 
-        index.storage_context.persist()
+        elapsed = time.perf_counter() - start
+        stats["node_usang"] = len(stale_ids)
+        stats["detik"] = round(elapsed, 2)
+        stats["baris_per_detik"] = round(rows_this_run / elapsed, 1) if elapsed else None
+        if progress_callback:
+            progress_callback("chunk_diembed", pipeline.embedded, pipeline.embedded)
+            progress_callback("point_diupsert", pipeline.upserted, pipeline.upserted)
+            progress_callback("baris_csv", row_number, row_number)
 
-        print("✅ Index berhasil dibuat dan disimpan ke Qdrant + local storage")
+        logger.info(
+            "✅ %s baris (%s ditolak): %s node baru, %s tidak berubah, %s usang dalam %.1f detik (%s baris/detik)",
+            stats["baris_dibaca"], stats["baris_ditolak"], stats["node_baru"], stats["node_tidak_berubah"],
+            stats["node_usang"], elapsed, stats["baris_per_detik"]
+        )
         return index
 
     except Exception as e:
-        print(f"❌ Gagal membuat index dari CSV: {e}")
+        logger.error("❌ Gagal membuat index dari CSV: %s", e)
         return None
 
 
-def load_index(vector_store, embed_model, persist_dir="storage"):
+def load_index(vector_store, embed_model):
     try:
-        print("🔄 Memuat index dari storage...")
-        storage_context = StorageContext.from_defaults(
-            vector_store=vector_store,
-            persist_dir=persist_dir
-        )
-        index = load_index_from_storage(
-            storage_context=storage_context,
-            embed_model=embed_model
-        )
-        print("✅ Index berhasil dimuat dari Qdrant dan storage")
+        logger.info("🔄 Memuat index dari storage...")
+        index = storage.load_index(vector_store, embed_model)
+        logger.info("✅ Index berhasil dimuat dari Qdrant dan storage")
         return index
 
     except Exception as e:
-        print(f"❌ Gagal memuat index: {e}")
+        logger.error("❌ Gagal memuat index: %s", e)
         return None
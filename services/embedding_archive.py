@@ -0,0 +1,186 @@
+import os
+import logging
+import json
+import threading
+
+import numpy as np
+from llama_index.core.schema import TextNode
+
+logger = logging.getLogger(__name__)
+
+# Kosong = arsip dimatikan. Isi dengan direktori (mis. "archive/embeddings") untuk
+# menyimpan setiap embedding hasil ingest tanpa perlu mengembed ulang nanti.
+EMBEDDING_ARCHIVE_DIR = os.getenv("EMBEDDING_ARCHIVE_DIR", "")
+
+VECTORS_FILE = "vectors.f32"
+META_FILE = "meta.jsonl"
+HEADER_FILE = "header.json"
+
+
+# Arsip append-only: matriks float32 mentah (bisa dibuka zero-copy dengan
+# np.memmap) ditambah sidecar JSONL berisi id, teks, metadata dan nomor baris.
+# Penghapusan dicatat sebagai tombstone; entri terakhir untuk sebuah id yang berlaku.
+class EmbeddingArchive:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._vectors_path = os.path.join(directory, VECTORS_FILE)
+        self._meta_path = os.path.join(directory, META_FILE)
+        self._header_path = os.path.join(directory, HEADER_FILE)
+
+        self.dim = None
+        if os.path.exists(self._header_path):
+            with open(self._header_path, encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        self._rows = self._count_rows()
+
+    def _count_rows(self):
+        if not self.dim or not os.path.exists(self._vectors_path):
+            return 0
+        return os.path.getsize(self._vectors_path) // (self.dim * 4)
+
+    def _write_header(self, dim):
+        self.dim = dim
+        with open(self._header_path, "w", encoding="utf-8") as f:
+            json.dump({"dim": dim, "dtype": "float32", "vectors": VECTORS_FILE, "meta": META_FILE}, f)
+
+    def append(self, nodes):
+        nodes = [node for node in nodes if node.embedding is not None]
+        if not nodes:
+            return 0
+        matrix = np.asarray([node.embedding for node in nodes], dtype=np.float32)
+
+        with self._lock:
+            if self.dim is None:
+                self._write_header(matrix.shape[1])
+            if matrix.shape[1] != self.dim:
+                raise ValueError(f"Dimensi embedding {matrix.shape[1]} tidak cocok dengan arsip ({self.dim})")
+
+            # Vektor ditulis lebih dulu: baris tanpa metadata diabaikan saat dibaca
+            with open(self._vectors_path, "ab") as f:
+                f.write(matrix.tobytes())
+            with open(self._meta_path, "a", encoding="utf-8") as f:
+                for offset, node in enumerate(nodes):
+                    f.write(json.dumps({
+                        "id": node.id_,
+                        "row": self._rows + offset,
+                        "text": node.text,
+                        "metadata": node.metadata,
+                    }, ensure_ascii=False) + "\n")
+            self._rows += len(nodes)
+        return len(nodes)
+
+    def delete(self, node_ids):
+        if not node_ids:
+            return
+        with self._lock, open(self._meta_path, "a", encoding="utf-8") as f:
+            for node_id in node_ids:
+                f.write(json.dumps({"id": node_id, "deleted": True}) + "\n")
+
+    def vectors(self):
+        # Tanpa salinan: halaman file dimuat OS hanya saat baris dibaca
+        if not self.dim or not self._count_rows():
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(self._count_rows(), self.dim))
+
+    def records(self):
+        live = {}
+        if not os.path.exists(self._meta_path):
+            return []
+        total_rows = self._count_rows()
+        with open(self._meta_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # baris terakhir yang terpotong saat proses mati
+                if record.get("deleted"):
+                    live.pop(record["id"], None)
+                elif record["row"] < total_rows:
+                    live[record["id"]] = record
+        return sorted(live.values(), key=lambda r: r["row"])
+
+    def iter_nodes(self, batch_size=256):
+        vectors = self.vectors()
+        records = self.records()
+        for start in range(0, len(records), batch_size):
+            chunk = records[start:start + batch_size]
+            rows = vectors[[r["row"] for r in chunk]]
+            yield [
+                TextNode(id_=r["id"], text=r["text"], metadata=r["metadata"], embedding=row.tolist())
+                for r, row in zip(chunk, rows)
+            ]
+
+    def compact(self):
+        # Tulis ulang hanya baris yang masih hidup (setelah banyak upload ulang/hapus)
+        with self._lock:
+            records = self.records()
+            vectors = self.vectors()
+            tmp_vectors = self._vectors_path + ".tmp"
+            tmp_meta = self._meta_path + ".tmp"
+            with open(tmp_vectors, "wb") as vf, open(tmp_meta, "w", encoding="utf-8") as mf:
+                for row, record in enumerate(records):
+                    vf.write(np.asarray(vectors[record["row"]], dtype=np.float32).tobytes())
+                    mf.write(json.dumps({**record, "row": row}, ensure_ascii=False) + "\n")
+            del vectors
+            os.replace(tmp_vectors, self._vectors_path)
+            os.replace(tmp_meta, self._meta_path)
+            self._rows = len(records)
+        return len(records)
+
+    def stats(self):
+        return {
+            "direktori": self.directory,
+            "dimensi": self.dim,
+            "baris_vektor": self._count_rows(),
+            "node_hidup": len(self.records()),
+            "ukuran_mb": round(os.path.getsize(self._vectors_path) / 1e6, 2) if os.path.exists(self._vectors_path) else 0.0,
+        }
+
+
+def reseed_vector_store(archive, vector_store, batch_size=256):
+    # Isi ulang vector store dari arsip tanpa memanggil model embedding
+    total = 0
+    for nodes in archive.iter_nodes(batch_size):
+        vector_store.add(nodes)
+        total += len(nodes)
+        logger.info("📥 %s node dimuat ulang dari arsip", total)
+    return total
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_embedding_archive():
+    global _archive
+    if not EMBEDDING_ARCHIVE_DIR:
+        return None
+    with _archive_lock:
+        if _archive is None:
+            _archive = EmbeddingArchive(EMBEDDING_ARCHIVE_DIR)
+    return _archive
+
+
+if __name__ == "__main__":
+    import argparse
+    from services.telemetry import configure_logging
+
+    configure_logging()
+
+    parser = argparse.ArgumentParser(description="Kelola arsip embedding hasil ingest")
+    parser.add_argument("command", choices=["stats", "compact", "reseed"])
+    parser.add_argument("--dir", default=EMBEDDING_ARCHIVE_DIR or "archive/embeddings")
+    args = parser.parse_args()
+
+    archive = EmbeddingArchive(args.dir)
+    if args.command == "stats":
+        print(json.dumps(archive.stats(), indent=2))
+    elif args.command == "compact":
+        print(f"✅ {archive.compact()} node tersisa setelah kompaksi")
+    else:
+        from services.model_init import get_vector_store
+        print(f"✅ {reseed_vector_store(archive, get_vector_store())} node dimuat ke vector store")
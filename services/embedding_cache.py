@@ -0,0 +1,227 @@
+import os
+import re
+import sqlite3
+import hashlib
+import asyncio
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, List
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from services.telemetry import record_cache
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "cache/embeddings.sqlite3")
+EMBEDDING_CACHE_QUERY_SIZE = int(os.getenv("EMBEDDING_CACHE_QUERY_SIZE", "2048"))
+EMBEDDING_CACHE_DOCUMENT_SIZE = int(os.getenv("EMBEDDING_CACHE_DOCUMENT_SIZE", "20000"))
+
+QUERY = "query"
+DOCUMENT = "document"
+
+
+def normalize_text(text, kind):
+    text = unicodedata.normalize("NFKC", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    # Pertanyaan dashboard sering hanya berbeda huruf besar/kecil
+    if kind == QUERY:
+        text = text.casefold()
+    return text
+
+
+class LRUCache:
+    def __init__(self, capacity):
+        self._capacity = capacity
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self._capacity:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class EmbeddingDiskStore:
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", list(keys)
+            ).fetchall()
+        return {key: np.frombuffer(blob, dtype=np.float32).tolist() for key, blob in rows}
+
+    def put_many(self, items):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items]
+            )
+            self._conn.commit()
+
+
+# Pembungkus embed_model: LRU di memori di depan penyimpanan SQLite, dengan
+# ruang kunci dan kapasitas terpisah untuk embedding query dan dokumen.
+class CachedEmbedding(BaseEmbedding):
+    _inner: Any = PrivateAttr()
+    _memory: dict = PrivateAttr()
+    _disk: Any = PrivateAttr()
+    _metrics: dict = PrivateAttr()
+    _metrics_lock: Any = PrivateAttr()
+
+    def __init__(
+        self,
+        inner: BaseEmbedding,
+        store_path: str = EMBEDDING_CACHE_PATH,
+        query_capacity: int = EMBEDDING_CACHE_QUERY_SIZE,
+        document_capacity: int = EMBEDDING_CACHE_DOCUMENT_SIZE,
+        **kwargs: Any,
+    ):
+        super().__init__(
+            model_name=inner.model_name,
+            embed_batch_size=inner.embed_batch_size,
+            **kwargs,
+        )
+        self._inner = inner
+        self._memory = {QUERY: LRUCache(query_capacity), DOCUMENT: LRUCache(document_capacity)}
+        self._disk = EmbeddingDiskStore(store_path) if store_path else None
+        self._metrics = {
+            kind: {"memory_hit": 0, "disk_hit": 0, "miss": 0}
+            for kind in (QUERY, DOCUMENT)
+        }
+        self._metrics_lock = threading.Lock()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def inner(self):
+        return self._inner
+
+    def _key(self, text, kind):
+        normalized = normalize_text(text, kind)
+        return hashlib.sha256(f"{self.model_name}|{kind}|{normalized}".encode("utf-8")).hexdigest()
+
+    def _count(self, kind, field, amount):
+        if amount:
+            with self._metrics_lock:
+                self._metrics[kind][field] += amount
+            record_cache(f"embedding_{kind}", field, amount)
+
+    def _lookup(self, texts, kind):
+        keys = [self._key(text, kind) for text in texts]
+        results = [self._memory[kind].get(key) for key in keys]
+        self._count(kind, "memory_hit", sum(r is not None for r in results))
+
+        pending = [i for i, r in enumerate(results) if r is None]
+        if pending and self._disk is not None:
+            found = self._disk.get_many({keys[i] for i in pending})
+            for i in pending:
+                vector = found.get(keys[i])
+                if vector is not None:
+                    results[i] = vector
+                    self._memory[kind].put(keys[i], vector)
+            self._count(kind, "disk_hit", sum(keys[i] in found for i in pending))
+
+        missing = [i for i, r in enumerate(results) if r is None]
+        self._count(kind, "miss", len(missing))
+        return keys, results, missing
+
+    def _unique_missing(self, texts, keys, missing):
+        # Teks identik dalam satu batch cukup diembed sekali
+        first_index = {}
+        for i in missing:
+            first_index.setdefault(keys[i], i)
+        return list(first_index), [texts[i] for i in first_index.values()]
+
+    def _store(self, kind, keys, results, missing, by_key):
+        for i in missing:
+            results[i] = by_key[keys[i]]
+        for key, vector in by_key.items():
+            self._memory[kind].put(key, vector)
+        if by_key and self._disk is not None:
+            self._disk.put_many(by_key.items())
+        return results
+
+    def _embed_cached(self, texts, kind, compute):
+        keys, results, missing = self._lookup(texts, kind)
+        if missing:
+            unique_keys, unique_texts = self._unique_missing(texts, keys, missing)
+            self._store(kind, keys, results, missing, dict(zip(unique_keys, compute(unique_texts))))
+        return results
+
+    async def _aembed_cached(self, texts, kind, acompute):
+        keys, results, missing = self._lookup(texts, kind)
+        if missing:
+            unique_keys, unique_texts = self._unique_missing(texts, keys, missing)
+            self._store(kind, keys, results, missing, dict(zip(unique_keys, await acompute(unique_texts))))
+        return results
+
+    def _inner_query_batch(self, queries):
+        if hasattr(self._inner, "_embed"):
+            return self._inner._embed(queries, input_type="query")
+        return [self._inner.get_query_embedding(q) for q in queries]
+
+    async def _ainner_query_batch(self, queries):
+        if hasattr(self._inner, "_aembed"):
+            return await self._inner._aembed(queries, input_type="query")
+        return await asyncio.gather(*(self._inner.aget_query_embedding(q) for q in queries))
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embed_cached([query], QUERY, self._inner_query_batch)[0]
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return (await self._aembed_cached([query], QUERY, self._ainner_query_batch))[0]
+
+    def get_query_embedding_batch(self, queries: List[str]) -> List[List[float]]:
+        return self._embed_cached(queries, QUERY, self._inner_query_batch)
+
+    async def aget_query_embedding_batch(self, queries: List[str]) -> List[List[float]]:
+        return await self._aembed_cached(queries, QUERY, self._ainner_query_batch)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_cached(texts, DOCUMENT, self._inner._get_text_embeddings)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return await self._aembed_cached(texts, DOCUMENT, self._inner._aget_text_embeddings)
+
+    def metrics(self):
+        with self._metrics_lock:
+            snapshot = {kind: dict(values) for kind, values in self._metrics.items()}
+        for kind, values in snapshot.items():
+            total = values["memory_hit"] + values["disk_hit"] + values["miss"]
+            values["hit_rate"] = (values["memory_hit"] + values["disk_hit"]) / total if total else 0.0
+            values["memory_entries"] = len(self._memory[kind])
+        return snapshot
@@ -0,0 +1,92 @@
+import os
+import logging
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_CACHE_PATH = os.getenv("EXTRACTION_CACHE_PATH", "cache/extraction.sqlite3")
+EXTRACTION_CACHE_MAX_MB = float(os.getenv("EXTRACTION_CACHE_MAX_MB", "512"))
+
+
+def page_cache_key(pdf_bytes, prompt_version):
+    return f"{hashlib.sha256(pdf_bytes).hexdigest()}:{prompt_version}"
+
+
+# Cache persisten hasil Q&A per halaman. Kunci = hash PDF satu halaman + versi
+# prompt; entri paling lama tidak diakses dibuang saat ukuran melebihi batas.
+class ExtractionCache:
+    def __init__(self, path=EXTRACTION_CACHE_PATH, max_bytes=int(EXTRACTION_CACHE_MAX_MB * 1024 * 1024)):
+        self._path = path
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " key TEXT PRIMARY KEY,"
+            " qna TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access)")
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT qna FROM pages WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE pages SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return [tuple(block) for block in json.loads(row[0])]
+
+    def put(self, key, qna_blocks):
+        payload = json.dumps([list(block) for block in qna_blocks], ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (key, qna, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload.encode("utf-8")), time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self._max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM pages ORDER BY last_access").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self._max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM pages WHERE key = ?", evicted)
+        logger.info("🧹 [CACHE] %s halaman lama dibuang dari cache ekstraksi", len(evicted))
+
+    def stats(self):
+        with self._lock:
+            count, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return {"jumlah_halaman": count, "ukuran_bytes": size, "batas_bytes": self._max_bytes}
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    global _default_cache
+    if not EXTRACTION_CACHE_PATH:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ExtractionCache()
+        return _default_cache
@@ -1,12 +1,53 @@
 import os
+import io
 import base64
 import csv
 import re
+import time
+import random
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from PyPDF2 import PdfReader, PdfWriter
-from services.model_init import gemini_client
-from tempfile import NamedTemporaryFile
+from services.model_init import get_gemini_client
+from services.extraction_cache import get_extraction_cache, page_cache_key
+from services.banks import canonicalize_bank
+from services.facts import get_fact_store, fact_from_qna
+from services.telemetry import stage, record_cache
 from llama_index.core.schema import Document
 
+logger = logging.getLogger(__name__)
+
+EXTRACT_MAX_WORKERS = int(os.getenv("EXTRACT_MAX_WORKERS", "4"))
+# Batas request Gemini per menit untuk seluruh worker (0 = tanpa batas)
+EXTRACT_RATE_LIMIT_PER_MINUTE = float(os.getenv("EXTRACT_RATE_LIMIT_PER_MINUTE", "60"))
+EXTRACT_MAX_RETRIES = int(os.getenv("EXTRACT_MAX_RETRIES", "3"))
+EXTRACT_BACKOFF_SECONDS = float(os.getenv("EXTRACT_BACKOFF_SECONDS", "2"))
+EXTRACT_DEBUG_DUMP = os.getenv("EXTRACT_DEBUG_DUMP", "0") == "1"
+
+GEMINI_MODEL = "gemini-2.0-flash"
+
+EXTRACTION_PROMPT = """
+        Anda adalah asisten cerdas yang membantu mengekstrak data dari laporan keuangan perusahaan.
+
+        Tugas Anda:
+        1. Baca seluruh isi halaman ini dengan cermat
+        2. Ekstrak setiap informasi penting dalam bentuk pasangan pertanyaan dan jawaban (Q&A)
+        3. Gunakan satu fakta untuk satu Q&A. Jangan menggabungkan beberapa informasi jadi satu jawaban
+        4. Jika ada angka, istilah, entitas, atau nilai spesifik (seperti pendapatan, laba, beban, rasio keuangan), buat satu pertanyaan terpisah untuk masing-masing
+        5. Setiap pertanyaan wajib mencantumkan nama lengkap bank dan tahun laporan di dalam teksnya
+
+        Format Wajib:
+        Q: [pertanyaan dalam Bahasa Indonesia]
+        A: [jawaban lengkap dan jelas berdasarkan isi halaman]
+
+        Jangan menyisipkan opini, ringkasan, atau interpretasi tambahan. Ekstraksi harus lengkap dan akurat sesuai isi halaman.
+        """.strip()
+
+# Berubah otomatis jika prompt atau model diganti, sehingga cache lama tidak terpakai
+PROMPT_VERSION = hashlib.sha256(f"{GEMINI_MODEL}\n{EXTRACTION_PROMPT}".encode("utf-8")).hexdigest()[:16]
+
 def extract_bank_and_year_from_question(question: str):
     bank_match = re.search(
         r"((?:PT\.?\s*)?BANK[\w\s().,&'-]*)\s*(?:pada|tahun|[.,?]|$)", 
@@ -17,13 +58,7 @@ def extract_bank_and_year_from_question(question: str):
     tahun = tahun_match.group(1) if tahun_match else "0000"
     
     if bank_match:
-        bank_text = bank_match.group(1).lower()
-        if "mandiri" in bank_text:
-            bank = "PT BANK MANDIRI (PERSERO) TBK"
-        elif "bca" in bank_text or "central asia" in bank_text:
-            bank = "PT BANK CENTRAL ASIA TBK"
-        else:
-            bank = bank_match.group(1).upper().strip()
+        bank = canonicalize_bank(bank_match.group(1)) or bank_match.group(1).upper().strip()
     else:
         bank = "BANK TIDAK DIKETAHUI"
     
@@ -31,77 +66,151 @@ def extract_bank_and_year_from_question(question: str):
 
 
 
-def extract_pdf_with_gemini(pdf_path, output_path="output_qna.csv"):
-    reader = PdfReader(pdf_path)
-    all_qna = []
-    documents = []
+class RateLimiter:
+    # Menjaga jarak minimum antar request ke Gemini, dibagi oleh semua worker
+    def __init__(self, per_minute):
+        self._interval = 60.0 / per_minute if per_minute and per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_at = 0.0
 
-    for i, page in enumerate(reader.pages):
-        print(f"🔍 Memproses halaman {i + 1}...")
+    def wait(self):
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_at)
+            self._next_at = start_at + self._interval
+        if start_at > now:
+            time.sleep(start_at - now)
 
-        # Simpan halaman sebagai file PDF sementara
+
+def split_pdf_pages(pdf_path):
+    # Pecah PDF menjadi PDF satu halaman langsung di memori
+    reader = PdfReader(pdf_path)
+    pages = []
+    for page in reader.pages:
         writer = PdfWriter()
         writer.add_page(page)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        pages.append(buffer.getvalue())
+    return pages
+
+
+def parse_qna_blocks(response_text):
+    return re.findall(r"Q:\s*(.*?)\nA:\s*(.*?)(?=\nQ:|\Z)", response_text, re.DOTALL)
+
+
+def extract_page_with_gemini(pdf_bytes, page_number, client, rate_limiter, max_retries=EXTRACT_MAX_RETRIES):
+    pdf_base64 = base64.b64encode(pdf_bytes).decode("utf-8")
+    contents = [
+        {
+            "parts": [
+                {"text": EXTRACTION_PROMPT},
+                {
+                    "inline_data": {
+                        "mime_type": "application/pdf",
+                        "data": pdf_base64
+                    }
+                }
+            ]
+        }
+    ]
 
-        with NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-            writer.write(temp_pdf)
-            temp_pdf_path = temp_pdf.name
-
-        with open(temp_pdf_path, "rb") as f:
-            pdf_bytes = f.read()
-        os.remove(temp_pdf_path)
+    for attempt in range(max_retries + 1):
+        rate_limiter.wait()
+        try:
+            with stage("ekstraksi_halaman"):
+                response = client.models.generate_content(
+                    model=GEMINI_MODEL,
+                    contents=contents
+                )
+            return response.text.strip()
+        except Exception as e:
+            if attempt == max_retries:
+                logger.error("❌ Gagal mendapatkan respons Gemini di halaman %d: %s", page_number, e)
+                return None
+            delay = EXTRACT_BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random())
+            logger.warning("🔁 Halaman %d gagal (percobaan %d), ulang dalam %.1f detik: %s", page_number, attempt + 1, delay, e)
+            time.sleep(delay)
+
+
+def extract_pdf_with_gemini(
+    pdf_path,
+    output_path="output_qna.csv",
+    max_workers=None,
+    rate_limit_per_minute=None,
+    client=None,
+    progress_callback=None,
+    use_cache=True,
+    stats=None
+):
+    client = client or get_gemini_client()
+    max_workers = max_workers or EXTRACT_MAX_WORKERS
+    if rate_limit_per_minute is None:
+        rate_limit_per_minute = EXTRACT_RATE_LIMIT_PER_MINUTE
+    rate_limiter = RateLimiter(rate_limit_per_minute)
+    cache = get_extraction_cache() if use_cache else None
+
+    pages = split_pdf_pages(pdf_path)
+    page_blocks = [None] * len(pages)
+    cache_keys = [page_cache_key(page_bytes, PROMPT_VERSION) for page_bytes in pages]
+
+    # Halaman yang hash-nya sudah dikenal tidak perlu dikirim ke Gemini
+    misses = []
+    for i, key in enumerate(cache_keys):
+        cached = cache.get(key) if cache else None
+        if cached is None:
+            misses.append(i)
+        else:
+            page_blocks[i] = cached
+
+    cache_hits = len(pages) - len(misses)
+    if cache:
+        record_cache("ekstraksi", "hit", cache_hits)
+        record_cache("ekstraksi", "miss", len(misses))
+    logger.info("🔍 Memproses %d halaman (%d dari cache) dengan %d worker...", len(pages), cache_hits, max_workers)
+    if progress_callback and cache_hits:
+        progress_callback("halaman_diekstrak", cache_hits, len(pages))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(extract_page_with_gemini, pages[i], i + 1, client, rate_limiter): i
+            for i in misses
+        }
+        for done, future in enumerate(as_completed(futures), cache_hits + 1):
+            i = futures[future]
+            response_text = future.result()
+            logger.debug("✅ Halaman %d selesai", i + 1)
+            if progress_callback:
+                progress_callback("halaman_diekstrak", done, len(pages))
+            if response_text is None:
+                continue
 
-        pdf_base64 = base64.b64encode(pdf_bytes).decode("utf-8")
+            if EXTRACT_DEBUG_DUMP:
+                with open(f"debug_page_{i+1}.txt", "w", encoding="utf-8") as f:
+                    f.write(response_text)
 
-        prompt_text = """
-        Anda adalah asisten cerdas yang membantu mengekstrak data dari laporan keuangan perusahaan.
+            page_blocks[i] = parse_qna_blocks(response_text)
+            if cache:
+                cache.put(cache_keys[i], page_blocks[i])
 
-        Tugas Anda:
-        1. Baca seluruh isi halaman ini dengan cermat
-        2. Ekstrak setiap informasi penting dalam bentuk pasangan pertanyaan dan jawaban (Q&A)
-        3. Gunakan satu fakta untuk satu Q&A. Jangan menggabungkan beberapa informasi jadi satu jawaban
-        4. Jika ada angka, istilah, entitas, atau nilai spesifik (seperti pendapatan, laba, beban, rasio keuangan), buat satu pertanyaan terpisah untuk masing-masing
-        5. Setiap pertanyaan wajib mencantumkan nama lengkap bank dan tahun laporan di dalam teksnya
+    if stats is not None:
+        stats["cache_hit"] = cache_hits
+        stats["cache_miss"] = len(misses)
+    logger.info("📊 Cache ekstraksi: %d hit, %d miss", cache_hits, len(misses))
 
-        Format Wajib:
-        Q: [pertanyaan dalam Bahasa Indonesia]
-        A: [jawaban lengkap dan jelas berdasarkan isi halaman]
-
-        Jangan menyisipkan opini, ringkasan, atau interpretasi tambahan. Ekstraksi harus lengkap dan akurat sesuai isi halaman.
-        """.strip()
-
-        contents = [
-            {
-                "parts": [
-                    {"text": prompt_text},
-                    {
-                        "inline_data": {
-                            "mime_type": "application/pdf",
-                            "data": pdf_base64
-                        }
-                    }
-                ]
-            }
-        ]
+    all_qna = []
+    documents = []
+    facts = []
 
-        try:
-            response = gemini_client.models.generate_content(
-                model="gemini-2.0-flash",
-                contents=contents
-            )
-            response_text = response.text.strip()
-        except Exception as e:
-            print(f"❌ Gagal mendapatkan respons Gemini di halaman {i+1}: {e}")
+    # Susun kembali hasil sesuai urutan halaman
+    for i, qna_blocks in enumerate(page_blocks):
+        if qna_blocks is None:
             continue
 
-        with open(f"debug_page_{i+1}.txt", "w", encoding="utf-8") as f:
-            f.write(response_text)
-
-        
-        qna_blocks = re.findall(r"Q:\s*(.*?)\nA:\s*(.*?)(?=\nQ:|\Z)", response_text, re.DOTALL)
-
         if not qna_blocks:
-            print(f"Tidak ditemukan Q&A yang valid di halaman {i+1}")
+            logger.info("Tidak ditemukan Q&A yang valid di halaman %d", i + 1)
             continue
 
         for q, a in qna_blocks:
@@ -111,6 +220,7 @@ def extract_pdf_with_gemini(pdf_path, output_path="output_qna.csv"):
                 bank, tahun = extract_bank_and_year_from_question(q)
 
                 all_qna.append([q, a, bank, tahun, "Laporan Tidak Diketahui"])
+                facts.append(fact_from_qna(q, a, bank, tahun, os.path.basename(pdf_path), i + 1))
 
                 documents.append(Document(
                     text=f"Q: {q}\nA: {a}",
@@ -123,7 +233,7 @@ def extract_pdf_with_gemini(pdf_path, output_path="output_qna.csv"):
                     }
                 ))
             except Exception as parse_err:
-                print(f" Gagal parsing QnA di halaman {i + 1}: {parse_err}")
+                logger.warning("Gagal parsing QnA di halaman %d: %s", i + 1, parse_err)
                 continue
 
     with open(output_path, "w", encoding="utf-8", newline="") as csvfile:
@@ -131,7 +241,11 @@ def extract_pdf_with_gemini(pdf_path, output_path="output_qna.csv"):
         writer.writerow(["Pertanyaan", "Jawaban", "Bank", "Tahun", "Jenis Laporan"])
         writer.writerows(all_qna)
 
-    print(f"✅ Semua Q&A disimpan di: {output_path}")
-    print(f"📦 Total dokumen yang dihasilkan: {len(documents)}")
+    logger.info("✅ Semua Q&A disimpan di: %s", output_path)
+
+    fact_store = get_fact_store()
+    if fact_store:
+        fact_store.replace_source(os.path.basename(pdf_path), facts)
+    logger.info("📦 Total dokumen yang dihasilkan: %d", len(documents))
 
     return documents
@@ -0,0 +1,312 @@
+import os
+import logging
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+
+from services.banks import bank_id, canonicalize_bank, display_name
+from services.query_rules import extract_metric
+
+logger = logging.getLogger(__name__)
+
+FACTS_DB_PATH = os.getenv("FACTS_DB_PATH", "storage/facts.sqlite3")
+
+# Kata pengisi khas pertanyaan hasil ekstraksi Gemini yang tidak mengubah arti metrik
+_METRIC_FILLER = {
+    "jumlah", "total", "nilai", "besar", "besarnya", "sebesar", "dilaporkan", "tercatat", "oleh",
+    "dimiliki", "diperoleh", "dibukukan", "per", "tanggal", "desember", "31", "akhir", "posisi",
+    "laporan", "keuangan", "konsolidasian", "sesuai", "berdasarkan", "dalam", "rupiah", "jutaan", "juta",
+}
+# Pertanyaan penjelasan tetap dijawab LLM walaupun angkanya ada di tabel fakta
+_EXPLANATORY = re.compile(
+    r"\b(mengapa|kenapa|jelaskan|bagaimana|analisis|analisa|penyebab|faktor|alasan|pengaruh|dampak|strategi)\b",
+    re.IGNORECASE,
+)
+_YEAR_ONLY = re.compile(r"^(19|20)\d{2}$")
+_NUMBER = re.compile(
+    r"(?P<open>\(\s*)?(?P<sign>[-−–]\s*)?(?:Rp\.?\s*)?"
+    r"(?P<number>\d{1,3}(?:\.\d{3})+(?:,\d+)?|\d+(?:,\d+)?)"
+    r"(?P<close>\s*\))?"
+)
+_UNIT_AFTER = re.compile(
+    r"^\s*(?P<unit>%|persen|triliun|miliar|milyar|juta|ribu|kali|x\b)|^\s*\(\s*dalam\s+(?P<paren>[^)]+)\)",
+    re.IGNORECASE,
+)
+# Tanggal di jawaban ("31 Desember 2024", "31/12/2023") bukan nilai metrik
+_DATE = re.compile(
+    r"\b\d{1,2}\s+(?:januari|februari|maret|april|mei|juni|juli|agustus|september|oktober|november|desember"
+    r"|jan|feb|mar|apr|jun|jul|agu|agt|sep|okt|nov|des)\b|\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b",
+    re.IGNORECASE,
+)
+# Kata yang mendahului nilai utama: "adalah 1.234", "sebesar Rp 5", "menjadi 54.851"
+_VALUE_CUE = re.compile(
+    r"\b(?:adalah|sebesar|menjadi|senilai|mencapai|sejumlah|yaitu|yakni|tercatat)\s*[:=]?\s*$", re.IGNORECASE
+)
+
+
+def metric_key(text):
+    words = extract_metric(text).split()
+    return " ".join(w for w in words if w not in _METRIC_FILLER)
+
+
+def _number_candidates(text):
+    dates = [m.span() for m in _DATE.finditer(text)]
+    for match in _NUMBER.finditer(text):
+        raw = match.group("number")
+        start, end = match.span("number")
+        if _YEAR_ONLY.match(raw) or any(s <= start and end <= e for s, e in dates):
+            continue
+        value = float(raw.replace(".", "").replace(",", "."))
+        negative = bool(match.group("sign")) or bool(match.group("open") and match.group("close"))
+        if negative:
+            value = -value
+
+        unit = ""
+        unit_match = _UNIT_AFTER.match(text[match.end():])
+        if unit_match:
+            unit = (unit_match.group("unit") or unit_match.group("paren")).strip()
+        elif "Rp" in match.group(0):
+            unit = "Rupiah"
+        if unit.lower() == "persen":
+            unit = "%"
+        cued = bool(_VALUE_CUE.search(text[:match.start()]))
+        yield value, unit, cued
+
+
+def parse_indonesian_number(text):
+    # "93.991.349 (dalam jutaan Rupiah)" -> (93991349.0, "jutaan Rupiah"); "(1.234)" -> -1234.
+    # Tahun dan tanggal dilewati. Bila ada beberapa angka, dipersempit ke angka setelah
+    # "adalah/sebesar/menjadi", lalu ke angka bersatuan; bila tetap lebih dari satu,
+    # jawabannya ambigu dan tidak disimpan sebagai fakta: (None, None).
+    candidates = list(_number_candidates(text or ""))
+    for prefer in (lambda c: c[2], lambda c: c[1]):
+        if len(candidates) > 1:
+            candidates = [c for c in candidates if prefer(c)] or candidates
+    if len(candidates) != 1:
+        return None, None
+    value, unit, _ = candidates[0]
+    return value, unit
+
+
+def format_indonesian_number(value):
+    negative = value < 0
+    value = abs(value)
+    if value == int(value):
+        text = f"{int(value):,}".replace(",", ".")
+    else:
+        whole, fraction = f"{value:,.2f}".split(".")
+        text = whole.replace(",", ".") + "," + fraction
+    return f"-{text}" if negative else text
+
+
+def resolve_metric(metric, available):
+    # Kunci persis, atau metrik dengan kata paling sedikit yang memuat semua kata
+    # pertanyaan; bila ada beberapa kandidat setara hasilnya dianggap ambigu.
+    available = set(available)
+    if metric in available:
+        return metric
+    wanted = set(metric.split())
+    best, best_extra = [], None
+    for candidate in available:
+        words = candidate.split()
+        if not wanted <= set(words):
+            continue
+        extra = len(words) - len(wanted)
+        if best_extra is None or extra < best_extra:
+            best, best_extra = [candidate], extra
+        elif extra == best_extra:
+            best.append(candidate)
+    return best[0] if len(best) == 1 else None
+
+
+def fact_from_qna(pertanyaan, jawaban, bank, tahun, source=None, page=None):
+    bank = canonicalize_bank(bank) or canonicalize_bank(pertanyaan)
+    if not bank or not str(tahun or "").isdigit() or tahun == "0000":
+        return None
+    value, unit = parse_indonesian_number(jawaban)
+    metric = metric_key(pertanyaan)
+    if value is None or not metric:
+        return None
+    return {
+        "bank": bank,
+        "tahun": int(tahun),
+        "metric": metric,
+        "value": value,
+        "unit": unit,
+        "pertanyaan": pertanyaan,
+        "jawaban": jawaban,
+        "source": source,
+        "page": page,
+    }
+
+
+# Tabel fakta numerik (bank, tahun, metrik, nilai, satuan) hasil ekstraksi.
+# SQLite menjadi sumber persisten; salinan di memori diindeks per bank_id lalu
+# metrik, sehingga lookup tidak menyentuh disk dan hanya memindai metrik satu bank.
+class FactStore:
+    COLUMNS = ("bank", "tahun", "metric", "value", "unit", "pertanyaan", "jawaban", "source", "page")
+
+    def __init__(self, path=FACTS_DB_PATH):
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS facts ("
+            " bank TEXT NOT NULL,"
+            " tahun INTEGER NOT NULL,"
+            " metric TEXT NOT NULL,"
+            " value REAL NOT NULL,"
+            " unit TEXT,"
+            " pertanyaan TEXT,"
+            " jawaban TEXT,"
+            " source TEXT,"
+            " page INTEGER)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS facts_lookup ON facts (bank, metric, tahun)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS facts_source ON facts (source)")
+        self._conn.commit()
+        self._index = {}
+        self.version = 0
+        self._load()
+
+    def _load(self):
+        index = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+        rows = self._conn.execute(f"SELECT {', '.join(self.COLUMNS)} FROM facts").fetchall()
+        for row in rows:
+            fact = dict(zip(self.COLUMNS, row))
+            index[bank_id(fact["bank"])][fact["metric"]][fact["tahun"]].append(fact)
+        self._index = index
+        self.version += 1
+
+    def all_facts(self):
+        index = self._index
+        return [
+            fact
+            for by_metric in index.values() for by_year in by_metric.values()
+            for facts in by_year.values() for fact in facts
+        ]
+
+    def _insert(self, facts):
+        self._conn.executemany(
+            f"INSERT INTO facts ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+            [tuple(f[c] for c in self.COLUMNS) for f in facts]
+        )
+
+    def replace_source(self, source, facts):
+        # Upload ulang file yang sama mengganti seluruh fakta dari file tersebut
+        facts = [f for f in facts if f]
+        with self._lock:
+            self._conn.execute("DELETE FROM facts WHERE source = ?", (source,))
+            self._insert(facts)
+            self._conn.commit()
+            self._load()
+        logger.info("🔢 %s fakta numerik disimpan dari %s", len(facts), source)
+        return len(facts)
+
+    def delete_source(self, source):
+        with self._lock:
+            self._conn.execute("DELETE FROM facts WHERE source = ?", (source,))
+            self._conn.commit()
+            self._load()
+
+    def add(self, facts, reload=True):
+        # Ingest bertahap (CSV besar) menambah fakta per batch dan baru memuat
+        # ulang indeks di memori sekali di akhir (reload=False)
+        facts = [f for f in facts if f]
+        with self._lock:
+            self._insert(facts)
+            self._conn.commit()
+            if reload:
+                self._load()
+        return len(facts)
+
+    def reload(self):
+        with self._lock:
+            self._load()
+
+    def _candidates(self, bank, metric):
+        by_metric = self._index.get(bank_id(bank))
+        if not by_metric:
+            return None
+        resolved = resolve_metric(metric, by_metric)
+        return by_metric.get(resolved) if resolved else None
+
+    def lookup(self, bank, metric, tahun):
+        bank = canonicalize_bank(bank)
+        metric = metric_key(metric)
+        if not bank or not metric or not str(tahun or "").isdigit():
+            return None
+        by_year = self._candidates(bank, metric)
+        facts = by_year.get(int(tahun)) if by_year else None
+        if not facts:
+            return None
+        # Nilai berbeda untuk kunci yang sama (mis. bank vs konsolidasian) dianggap ambigu
+        if len({(f["value"], f["unit"]) for f in facts}) > 1:
+            return None
+        return facts[0]
+
+    def stats(self):
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM facts").fetchone()[0]
+        return {"jumlah_fakta": count, "jumlah_kunci": sum(len(by_metric) for by_metric in self._index.values())}
+
+
+def _describe(fact):
+    value = format_indonesian_number(fact["value"])
+    unit = fact["unit"] or ""
+    # Satuan dari "(dalam jutaan Rupiah)" ditampilkan kembali dalam bentuk aslinya
+    suffix = unit if unit == "%" else f" (dalam {unit})" if " " in unit else f" {unit}".rstrip()
+    return f"{fact['metric'].capitalize()} {display_name(fact['bank'])} tahun {fact['tahun']}: {value}{suffix}"
+
+
+def _compare(first, second):
+    change = second["value"] - first["value"]
+    direction = "naik" if change > 0 else "turun" if change < 0 else "tidak berubah"
+    text = f"{direction} {format_indonesian_number(abs(change))}" if change else direction
+    if change and first["value"]:
+        text += f" ({format_indonesian_number(round(change / abs(first['value']) * 100, 2))}%)"
+    return text
+
+
+def answer_from_facts(store, query, subqueries):
+    # Hanya pertanyaan angka yang semua sub-query-nya terjawab tabel fakta
+    if store is None or not subqueries or _EXPLANATORY.search(query or ""):
+        return None
+
+    facts = []
+    for subquery, filter_dict in subqueries:
+        filter_dict = filter_dict or {}
+        fact = store.lookup(filter_dict.get("bank"), subquery, filter_dict.get("tahun"))
+        if fact is None:
+            return None
+        facts.append(fact)
+
+    lines = [_describe(f) for f in facts]
+    if len(facts) == 2 and facts[0]["unit"] == facts[1]["unit"]:
+        first, second = sorted(facts, key=lambda f: (f["tahun"], f["bank"]))
+        if first["bank"] == second["bank"] and first["tahun"] != second["tahun"]:
+            lines.append(f"Dibanding tahun {first['tahun']}, nilai tahun {second['tahun']} {_compare(first, second)}.")
+        elif first["tahun"] == second["tahun"]:
+            lines.append(
+                f"Selisih {display_name(second['bank'])} terhadap {display_name(first['bank'])}: "
+                f"{_compare(first, second)}."
+            )
+    return {"jawaban": "\n".join(lines), "fakta": facts}
+
+
+_fact_store = None
+_fact_store_lock = threading.Lock()
+
+
+def get_fact_store():
+    global _fact_store
+    if not FACTS_DB_PATH:
+        return None
+    with _fact_store_lock:
+        if _fact_store is None:
+            _fact_store = FactStore(FACTS_DB_PATH)
+    return _fact_store
@@ -1,17 +1,19 @@
-
+import time
+import logging
 from llama_index.core.llms import ChatMessage
-from services.model_init import llm
+from services.model_init import get_llm
+from services.context_builder import count_tokens
+from services.telemetry import stage, observe_stage, record_tokens
 from typing import List, Optional
 
+logger = logging.getLogger(__name__)
 
-def generate_answer_with_llm(
+
+def build_answer_messages(
     query: str,
     contexts: str,
-    history: List[ChatMessage] = None  # menerima history pesan
-) -> (str, List[ChatMessage]):
-
-    if history is None:
-        history = []
+    history: List[ChatMessage]
+) -> (List[ChatMessage], ChatMessage):
 
     system_message = ChatMessage(
         role="system",
@@ -36,15 +38,143 @@ def generate_answer_with_llm(
 
     messages = [system_message] + history + [user_message]
 
-    print("📄 Mengirim pesan ke LLM dengan history:")
-    for msg in messages:
-        print(f"Role: {msg.role}")
-        print(f"Content:\n{msg.content}\n{'-'*40}")
+    # Prompt lengkap hanya diformat bila level DEBUG aktif
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("📄 Mengirim pesan ke LLM dengan history:\n%s", "\n".join(
+            f"Role: {msg.role}\nContent:\n{msg.content}\n{'-'*40}" for msg in messages
+        ))
+    record_tokens("generasi", "prompt", sum(count_tokens(msg.content) for msg in messages))
+
+    return messages, user_message
+
+
+def generate_answer_with_llm(
+    query: str,
+    contexts: str,
+    history: List[ChatMessage] = None  # menerima history pesan
+) -> (str, List[ChatMessage]):
+
+    if history is None:
+        history = []
+
+    messages, user_message = build_answer_messages(query, contexts, history)
+
+    try:
+        with stage("generasi"):
+            response = get_llm().chat(messages)
+        answer = strip_think(response.message.content)
+        record_tokens("generasi", "jawaban", count_tokens(answer))
+        new_history = history + [user_message, ChatMessage(role="assistant", content=answer)]
+        return answer, new_history
+    except Exception as e:
+        logger.error("❌ Error: %s", e)
+        return f"❌ Gagal menghasilkan jawaban dari LLM: {str(e)}", history
+
+
+async def generate_answer_with_llm_async(
+    query: str,
+    contexts: str,
+    history: List[ChatMessage] = None
+) -> (str, List[ChatMessage]):
+
+    if history is None:
+        history = []
+
+    messages, user_message = build_answer_messages(query, contexts, history)
 
     try:
-        response = llm.chat(messages)
-        new_history = history + [user_message, response.message]
-        return response.message.content.strip(), new_history
+        with stage("generasi"):
+            response = await get_llm().achat(messages)
+        answer = strip_think(response.message.content)
+        record_tokens("generasi", "jawaban", count_tokens(answer))
+        new_history = history + [user_message, ChatMessage(role="assistant", content=answer)]
+        return answer, new_history
     except Exception as e:
-        print("❌ Error:", e)
+        logger.error("❌ Error: %s", e)
         return f"❌ Gagal menghasilkan jawaban dari LLM: {str(e)}", history
+
+
+class ThinkStripper:
+    # Membuang blok <think>...</think> dari aliran token. Potongan yang mungkin
+    # merupakan awal tag ditahan dulu sampai jelas tag atau bukan.
+    OPEN = "<think>"
+    CLOSE = "</think>"
+
+    def __init__(self):
+        self._buffer = ""
+        self._inside = False
+
+    def feed(self, text: str) -> str:
+        self._buffer += text
+        visible = []
+        while self._buffer:
+            tag = self.CLOSE if self._inside else self.OPEN
+            pos = self._buffer.find(tag)
+            if pos >= 0:
+                if not self._inside:
+                    visible.append(self._buffer[:pos])
+                self._buffer = self._buffer[pos + len(tag):]
+                self._inside = not self._inside
+                continue
+
+            keep = 0
+            for size in range(min(len(tag) - 1, len(self._buffer)), 0, -1):
+                if tag.startswith(self._buffer[-size:]):
+                    keep = size
+                    break
+            if not self._inside:
+                visible.append(self._buffer[:len(self._buffer) - keep])
+            self._buffer = self._buffer[len(self._buffer) - keep:] if keep else ""
+            break
+        return "".join(visible)
+
+    def flush(self) -> str:
+        rest, self._buffer = ("" if self._inside else self._buffer), ""
+        return rest
+
+
+def strip_think(text: str) -> str:
+    # Versi non-streaming: jawaban /chat (dan yang masuk cache jawaban) sama
+    # bersihnya dengan yang dikirim /chat/stream
+    stripper = ThinkStripper()
+    return (stripper.feed(text or "") + stripper.flush()).strip()
+
+
+async def astream_answer_with_llm(
+    query: str,
+    contexts: str,
+    history: List[ChatMessage] = None
+):
+    if history is None:
+        history = []
+
+    messages, user_message = build_answer_messages(query, contexts, history)
+    stripper = ThinkStripper()
+    parts = []
+
+    start = time.perf_counter()
+    try:
+        with stage("generasi"):
+            stream = await get_llm().astream_chat(messages)
+            async for chunk in stream:
+                text = stripper.feed(chunk.delta or "")
+                # Spasi/baris kosong setelah </think> tidak perlu dikirim duluan
+                if text and (parts or text.strip()):
+                    if not parts:
+                        observe_stage("generasi_token_pertama", time.perf_counter() - start)
+                    parts.append(text)
+                    yield {"type": "token", "text": text if len(parts) > 1 else text.lstrip()}
+        tail = stripper.flush()
+        if tail:
+            parts.append(tail)
+            yield {"type": "token", "text": tail}
+    except Exception as e:
+        logger.error("❌ Error: %s", e)
+        yield {"type": "error", "message": f"❌ Gagal menghasilkan jawaban dari LLM: {str(e)}"}
+        yield {"type": "done", "jawaban": None, "history": history}
+        return
+
+    answer = "".join(parts).strip()
+    record_tokens("generasi", "jawaban", count_tokens(answer))
+    new_history = history + [user_message, ChatMessage(role="assistant", content=answer)]
+    yield {"type": "done", "jawaban": answer, "history": new_history}
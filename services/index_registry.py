@@ -0,0 +1,79 @@
+import os
+import threading
+import logging
+import time
+from datetime import datetime, timezone
+
+from services.indexer import load_index
+
+logger = logging.getLogger(__name__)
+
+# Jeda sebelum get() mencoba memuat ulang index setelah gagal (mis. storage masih
+# kosong), agar request tidak memuat vector store satu per satu setiap kali
+INDEX_RETRY_SECONDS = float(os.getenv("INDEX_RETRY_SECONDS", "30"))
+
+
+# Index dimuat sekali lalu dibagikan read-only ke semua endpoint. reload()
+# membangun index baru secara penuh sebelum menukar handle dengan satu
+# assignment, jadi pembaca tidak pernah melihat index setengah jadi.
+# vector_store_provider dipanggil saat reload sehingga vector store (dan client
+# Qdrant di belakangnya) baru dibuat ketika index pertama kali dibutuhkan.
+class IndexRegistry:
+    def __init__(self, vector_store_provider, loader=load_index, retry_seconds=INDEX_RETRY_SECONDS):
+        self._vector_store_provider = vector_store_provider
+        self._loader = loader
+        self._retry_seconds = retry_seconds
+        self._reload_lock = threading.Lock()
+        self._failed_at = None
+        self._index = None
+        self._generation = 0
+        self._loaded_at = None
+        self._load_seconds = None
+
+    def get(self):
+        index = self._index
+        if index is not None:
+            return index
+        # Belum pernah berhasil dimuat (mis. storage masih kosong saat startup).
+        # Dicoba lagi paling sering sekali per retry_seconds, dan request lain
+        # tidak ikut menunggu selama percobaan itu berjalan
+        failed_at = self._failed_at
+        if failed_at is not None and time.monotonic() - failed_at < self._retry_seconds:
+            return None
+        if not self._reload_lock.acquire(blocking=False):
+            return self._index
+        try:
+            return self._reload_locked()
+        finally:
+            self._reload_lock.release()
+
+    def reload(self):
+        # Dipanggil setelah upload/ingest: selalu mencoba, tanpa jeda retry
+        with self._reload_lock:
+            return self._reload_locked()
+
+    def _reload_locked(self):
+        start = time.perf_counter()
+        index = self._loader(self._vector_store_provider())
+        elapsed = time.perf_counter() - start
+
+        if index is None:
+            self._failed_at = time.monotonic()
+            logger.warning("⚠️ [REGISTRY] Reload gagal, handle lama tetap dipakai")
+            return self._index
+
+        self._failed_at = None
+        self._loaded_at = datetime.now(timezone.utc).isoformat()
+        self._load_seconds = elapsed
+        self._generation += 1
+        self._index = index
+        logger.info("✅ [REGISTRY] Index generasi %s aktif (%.3f detik)", self._generation, elapsed)
+        return index
+
+    def status(self):
+        return {
+            "tersedia": self._index is not None,
+            "generation": self._generation,
+            "loaded_at": self._loaded_at,
+            "load_seconds": self._load_seconds,
+        }
@@ -1,93 +1,128 @@
-import os
-import csv
+import logging
 from llama_index.core.node_parser import SentenceSplitter
-from llama_index.core import VectorStoreIndex, StorageContext, load_index_from_storage
-from services.model_init import embed_model
+from llama_index.core import VectorStoreIndex
+from services.model_init import get_embed_model
+from services.node_sync import deterministic_node_id, existing_ids_for_sources, delete_node_ids, filter_payload
+from services.ingest_pipeline import IngestPipeline
+from services.embedding_archive import get_embedding_archive
+from services.lexical_index import get_lexical_index
+from services.vector_backends import LocalVectorStore
+from services.answer_cache import answer_cache
+from services import storage
 
-def create_vector_index(documents, vector_store, embed_model, persist_dir="storage"):
+logger = logging.getLogger(__name__)
+
+
+def iter_chunks(documents, node_parser):
+    # Chunk dibuat per dokumen saat dibutuhkan pipeline, bukan sekaligus di awal
+    for i, doc in enumerate(documents):
+        logger.debug("📄 Dokumen ke-%s: panjang teks = %s", i+1, len(doc.text))
+        logger.debug("📌 Cuplikan teks: %r", doc.text[:100])
+        logger.debug("📄 [1.%s] Memproses dokumen ke-%s dengan metadata: %s", i+1, i+1, doc.metadata)
+        nodes = node_parser.get_nodes_from_documents([doc])
+        logger.debug("└─ Jumlah potongan dari dokumen ini: %s", len(nodes))
+
+        for node in nodes:
+            node.metadata.update(doc.metadata)
+            # Ditambahkan setelah chunking agar ukuran chunk (dan id node) tidak berubah;
+            # field filter tidak ikut teks embedding/prompt
+            payload = filter_payload(node.metadata)
+            node.metadata.update(payload)
+            node.excluded_embed_metadata_keys += [k for k in payload if k not in node.excluded_embed_metadata_keys]
+            node.excluded_llm_metadata_keys += [k for k in payload if k not in node.excluded_llm_metadata_keys]
+            # Id ditentukan oleh source, halaman dan isi chunk agar upload ulang idempoten
+            node.id_ = deterministic_node_id(
+                node.metadata.get("source", ""), node.metadata.get("page"), node.text
+            )
+            if not node.text.strip():
+                logger.warning("⚠️  [Kosong] Node dengan teks kosong ditemukan!")
+            yield node
+
+
+def create_vector_index(documents, vector_store, embed_model, progress_callback=None):
     try:
-        print("=" * 50)
-        print(f"🔄 [1] Mulai proses chunking dari {len(documents)} dokumen...")
-        
-        all_nodes = []
+        logger.info("🔄 [1] Mulai proses chunking dari %s dokumen...", len(documents))
         node_parser = SentenceSplitter(chunk_size=200, chunk_overlap=50, include_metadata=True)
 
-        for i, doc in enumerate(documents):
-            print(f"📄 Dokumen ke-{i+1}: panjang teks = {len(doc.text)}")
-            print(f"📌 Cuplikan teks: {repr(doc.text[:100])}")
-            print(f"📄 [1.{i+1}] Memproses dokumen ke-{i+1} dengan metadata: {doc.metadata}")
-            nodes = node_parser.get_nodes_from_documents([doc])
-            print(f"   └─ Jumlah potongan dari dokumen ini: {len(nodes)}")
-
-            for node in nodes:
-                node.metadata.update(doc.metadata)
-                if not node.text.strip():
-                    print("⚠️  [Kosong] Node dengan teks kosong ditemukan!")
-
-            all_nodes.extend(nodes)
-
-        print(f"📚 [2] Total potongan (chunk) yang dihasilkan: {len(all_nodes)}")
-
-        texts = [node.text for node in all_nodes]
-        empty_texts = [i for i, t in enumerate(texts) if not t.strip()]
-        if empty_texts:
-            print(f"⚠️ [3] Ditemukan {len(empty_texts)} teks kosong pada indeks: {empty_texts}")
-        
-        print(f"🔠 [4] Menghasilkan embedding untuk {len(texts)} teks...")
-        embeddings = embed_model.get_text_embedding_batch(texts)
-        print("✅ [5] Embedding selesai")
-
-        output_csv = "chunked_with_embedding.csv"
-        print(f"💾 [6] Menyimpan hasil chunk dan embedding ke {output_csv}...")
-        with open(output_csv, mode="w", newline="", encoding="utf-8") as file:
-            writer = csv.writer(file)
-            writer.writerow(["chunk_id", "char_length", "text", "embedding", "bank", "tahun", "jenis_laporan"])
-            for i, (node, emb) in enumerate(zip(all_nodes, embeddings)):
-                embedding_str = "[" + ",".join([f"{x:.6f}" for x in emb]) + "]"
-                writer.writerow([
-                    i + 1,
-                    len(node.text),
-                    node.text,
-                    embedding_str,
-                    node.metadata.get("bank", ""),
-                    node.metadata.get("tahun", ""),
-                    node.metadata.get("jenis_laporan", "")
-                ])
-        print("✅ [7] CSV selesai ditulis")
-
-        print(f"📦 [8] Menyimpan index ke direktori: {persist_dir}")
-        os.makedirs(persist_dir, exist_ok=True)
-        storage_context = StorageContext.from_defaults(vector_store=vector_store)
-        index = VectorStoreIndex(
-            nodes=all_nodes,
-            storage_context=storage_context,
-            embed_model=embed_model,
+        sources = {doc.metadata.get("source") for doc in documents}
+        existing = existing_ids_for_sources(vector_store, sources)
+        logger.info("🧮 [2] %s node sudah ada di vector store untuk source ini", len(existing))
+
+        seen = set()
+        pairs = set()
+        unchanged = 0
+        lexical = get_lexical_index()
+        # Node lama yang belum ada di indeks BM25 (mis. diupload sebelum indeks ini ada)
+        lexical_missing = []
+
+        def new_chunks():
+            nonlocal unchanged
+            for node in iter_chunks(documents, node_parser):
+                if node.id_ in seen:
+                    continue
+                seen.add(node.id_)
+                pairs.add((node.metadata.get("bank"), node.metadata.get("tahun")))
+                if node.id_ in existing:
+                    unchanged += 1
+                    if lexical is not None and node.id_ not in lexical:
+                        lexical_missing.append(node)
+                    continue
+                yield node
+
+        archive = get_embedding_archive()
+        if archive:
+            logger.info("🔠 [3] Embedding + upsert bertahap, arsip embedding ke %s...", archive.directory)
+        else:
+            logger.info("🔠 [3] Embedding + upsert bertahap...")
+        # Setiap batch yang sudah diupsert ikut masuk arsip embedding dan indeks BM25
+        sinks = [sink for sink in (archive.append if archive else None, lexical.add if lexical else None) if sink]
+
+        def on_batch(batch):
+            for sink in sinks:
+                sink(batch)
+
+        pipeline = IngestPipeline(
+            vector_store, embed_model,
+            on_batch=on_batch if sinks else None,
+            progress_callback=progress_callback
         )
-        index.storage_context.persist()
-        print("✅ [9] Vector index berhasil dibuat dan disimpan ke Qdrant")
-        print("=" * 50)
+        upserted = pipeline.run(new_chunks())
+        if lexical_missing:
+            lexical.add(lexical_missing)
+
+        stale_ids = existing - seen
+        logger.info("✅ [4] %s chunk baru diembed dan diupsert, %s tidak berubah, %s usang", upserted, unchanged, len(stale_ids))
+        delete_node_ids(vector_store, stale_ids)
+        if archive:
+            archive.delete(stale_ids)
+        if lexical is not None:
+            lexical.delete(stale_ids)
+        if upserted or stale_ids:
+            answer_cache.invalidate(pairs)
+
+        logger.info("📦 [5] Mendaftarkan index di %s", storage.STORAGE_DB_PATH)
+        index = storage.load_or_create_index(vector_store, embed_model)
+        if progress_callback:
+            progress_callback("chunk_diembed", pipeline.embedded, pipeline.embedded)
+            progress_callback("point_diupsert", upserted, upserted)
+        logger.info("✅ [6] Vector index berhasil dibuat dan disimpan ke Qdrant")
 
         return index
 
     except Exception as e:
-        print("=" * 50)
-        print(f"❌ [ERROR] Gagal membuat vector index: {e}")
-        print("=" * 50)
+        logger.error("❌ [ERROR] Gagal membuat vector index: %s", e)
         return None
 
 def load_index(vector_store):
     try:
-        print("🔄 [LOAD] Memuat index dari storage...")
-        storage_context = StorageContext.from_defaults(
-            vector_store=vector_store,
-            persist_dir="storage"
-        )
-        index = load_index_from_storage(
-            storage_context=storage_context,
-            embed_model=embed_model
-        )
-        print("✅ [LOAD] Index berhasil dimuat")
+        logger.info("🔄 [LOAD] Memuat index dari storage...")
+        index = storage.load_index(vector_store, get_embed_model())
+        logger.info("✅ [LOAD] Index berhasil dimuat")
         return index
     except Exception as e:
-        print(f"❌ [LOAD ERROR] Error loading index: {e}")
+        # Backend lokal yang sudah berisi node tidak butuh metadata index di storage/
+        if isinstance(vector_store, LocalVectorStore) and len(vector_store):
+            logger.info("✅ [LOAD] Index dibangun langsung dari backend lokal (%s node)", len(vector_store))
+            return VectorStoreIndex.from_vector_store(vector_store, embed_model=get_embed_model())
+        logger.error("❌ [LOAD ERROR] Error loading index: %s", e)
         return None
@@ -0,0 +1,152 @@
+import os
+import queue
+import threading
+
+from llama_index.core.schema import MetadataMode
+
+from services.telemetry import stage
+
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "128"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "2"))
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "2"))
+# Jumlah batch maksimum yang boleh menunggu di tiap antrean; menahan puncak memori
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "4"))
+
+_STOP = object()
+
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# chunk -> embed -> upsert sebagai pipeline dengan antrean terbatas. Chunk
+# dihasilkan generator di thread pemanggil; batch embedding dan upsert ke vector
+# store berjalan paralel di worker masing-masing. Bila antrean penuh, tahap
+# sebelumnya ikut menunggu, sehingga hanya beberapa batch embedding yang ada di
+# memori pada satu waktu berapa pun ukuran dokumennya.
+class IngestPipeline:
+    def __init__(
+        self,
+        vector_store,
+        embed_model,
+        batch_size=EMBED_BATCH_SIZE,
+        embed_workers=EMBED_CONCURRENCY,
+        upsert_workers=UPSERT_CONCURRENCY,
+        queue_size=INGEST_QUEUE_SIZE,
+        on_batch=None,
+        progress_callback=None,
+    ):
+        self._vector_store = vector_store
+        self._embed_model = embed_model
+        self._batch_size = batch_size
+        self._embed_workers = max(1, embed_workers)
+        self._upsert_workers = max(1, upsert_workers)
+        self._embed_queue = queue.Queue(maxsize=queue_size)
+        self._upsert_queue = queue.Queue(maxsize=queue_size)
+        self._on_batch = on_batch
+        self._progress_callback = progress_callback
+
+        self._lock = threading.Lock()
+        self._collection_lock = threading.Lock()
+        self._collection_ready = False
+        self._error = None
+        self.embedded = 0
+        self.upserted = 0
+
+    def _fail(self, error):
+        with self._lock:
+            if self._error is None:
+                self._error = error
+
+    def _report(self, key, done):
+        if self._progress_callback:
+            self._progress_callback(key, done, None)
+
+    def _embed_worker(self):
+        while True:
+            batch = self._embed_queue.get()
+            if batch is _STOP:
+                return
+            if self._error is not None:
+                continue  # kosongkan antrean setelah gagal
+            try:
+                with stage("embedding_batch"):
+                    # Sama seperti embed_nodes llama-index: teks + metadata yang tidak dikecualikan
+                    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in batch]
+                    embeddings = self._embed_model.get_text_embedding_batch(texts)
+                for node, embedding in zip(batch, embeddings):
+                    node.embedding = embedding
+                with self._lock:
+                    self.embedded += len(batch)
+                    embedded = self.embedded
+                self._report("chunk_diembed", embedded)
+                self._upsert_queue.put(batch)
+            except Exception as e:
+                self._fail(e)
+
+    def _upsert(self, batch):
+        # Batch pertama sendirian agar koleksi tidak dibuat dua kali secara bersamaan
+        if not self._collection_ready:
+            with self._collection_lock:
+                if not self._collection_ready:
+                    self._vector_store.add(batch)
+                    self._collection_ready = True
+                    return
+        self._vector_store.add(batch)
+
+    def _upsert_worker(self):
+        while True:
+            batch = self._upsert_queue.get()
+            if batch is _STOP:
+                return
+            if self._error is not None:
+                continue
+            try:
+                with stage("upsert_batch"):
+                    self._upsert(batch)
+                if self._on_batch:
+                    with self._lock:
+                        self._on_batch(batch)
+                with self._lock:
+                    self.upserted += len(batch)
+                    upserted = self.upserted
+                self._report("point_diupsert", upserted)
+                # Vektor tidak diperlukan lagi setelah tersimpan di vector store
+                for node in batch:
+                    node.embedding = None
+            except Exception as e:
+                self._fail(e)
+
+    def run(self, nodes):
+        embedders = [threading.Thread(target=self._embed_worker, daemon=True) for _ in range(self._embed_workers)]
+        upserters = [threading.Thread(target=self._upsert_worker, daemon=True) for _ in range(self._upsert_workers)]
+        for thread in embedders + upserters:
+            thread.start()
+
+        try:
+            for batch in batched(nodes, self._batch_size):
+                if self._error is not None:
+                    break
+                self._embed_queue.put(batch)
+        except Exception as e:
+            self._fail(e)
+        finally:
+            for _ in embedders:
+                self._embed_queue.put(_STOP)
+            for thread in embedders:
+                thread.join()
+            for _ in upserters:
+                self._upsert_queue.put(_STOP)
+            for thread in upserters:
+                thread.join()
+
+        if self._error is not None:
+            raise self._error
+        return self.upserted
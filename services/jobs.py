@@ -0,0 +1,238 @@
+import os
+import logging
+import json
+import copy
+import uuid
+import threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+from llama_index.core.schema import Document
+
+from services.extractor import extract_pdf_with_gemini
+from services.indexer import create_vector_index
+from services.create_vector_index_from_qa_csv import create_vector_index_from_qa_csv
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = os.getenv("JOBS_DIR", "jobs")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+# Nilai nice untuk thread ingest agar kalah prioritas dari trafik /chat
+INGEST_NICE = int(os.getenv("INGEST_NICE", "10"))
+# Job yang sudah selesai/gagal dibuang (dari memori dan jobs/) bila lebih tua dari
+# JOB_RETENTION_HOURS atau melebihi MAX_FINISHED_JOBS (yang terlama lebih dulu)
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "168"))
+MAX_FINISHED_JOBS = int(os.getenv("MAX_FINISHED_JOBS", "200"))
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+STAGE_EXTRACT = "ekstraksi"
+STAGE_INDEX = "indexing"
+STAGE_DONE = "selesai"
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _lower_thread_priority():
+    # Di Linux, setpriority dengan TID hanya berlaku untuk thread ini
+    # (dan thread yang dibuatnya, mis. worker ekstraksi halaman).
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), INGEST_NICE)
+    except (AttributeError, OSError, PermissionError) as e:
+        logger.warning("⚠️ [JOB] Tidak bisa menurunkan prioritas thread ingest: %s", e)
+
+
+class JobManager:
+    # vector store dan model embedding diberikan sebagai fungsi provider
+    # (services/model_init.py) agar baru dibuat saat job pertama berjalan
+    def __init__(
+        self, vector_store_provider, embed_model_provider, jobs_dir=JOBS_DIR, max_workers=INGEST_WORKERS, on_complete=None,
+        retention_hours=JOB_RETENTION_HOURS, max_finished=MAX_FINISHED_JOBS
+    ):
+        self._vector_store_provider = vector_store_provider
+        self._embed_model_provider = embed_model_provider
+        self._jobs_dir = jobs_dir
+        self._retention_hours = retention_hours
+        self._max_finished = max_finished
+        self._on_complete = on_complete
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="ingest",
+            initializer=_lower_thread_priority
+        )
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def _job_path(self, job_id):
+        return os.path.join(self._jobs_dir, f"{job_id}.json")
+
+    def _documents_path(self, job_id):
+        return os.path.join(self._jobs_dir, f"{job_id}.documents.jsonl")
+
+    def _save(self, job):
+        # Tulis ke file sementara lalu rename agar file job tidak pernah setengah jadi
+        path = self._job_path(job["id"])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            job["updated_at"] = _now()
+            self._save(job)
+            return copy.deepcopy(job)
+
+    def _prune(self):
+        # Hanya job selesai/gagal; job yang masih antre/berjalan tidak pernah dibuang
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=self._retention_hours)).isoformat()
+        with self._lock:
+            finished = sorted(
+                (j for j in self._jobs.values() if j["status"] in (STATUS_DONE, STATUS_FAILED)),
+                key=lambda j: j["updated_at"], reverse=True
+            )
+            expired = [j for i, j in enumerate(finished) if i >= self._max_finished or j["updated_at"] < cutoff]
+            for job in expired:
+                del self._jobs[job["id"]]
+        for job in expired:
+            for path in (self._job_path(job["id"]), self._documents_path(job["id"])):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        if expired:
+            logger.info("🧹 [JOB] %s job lama dibuang", len(expired))
+        return len(expired)
+
+    def _progress_callback(self, job_id):
+        def report(key, done, total):
+            with self._lock:
+                job = self._jobs[job_id]
+                job["progress"][key] = done
+                job["progress"][f"total_{key}"] = total
+                job["updated_at"] = _now()
+                self._save(job)
+        return report
+
+    def submit(self, kind, file_path):
+        job_id = uuid.uuid4().hex
+        job = {
+            "id": job_id,
+            "jenis": kind,
+            "file_path": file_path,
+            "status": STATUS_QUEUED,
+            "stage": STAGE_EXTRACT if kind == "pdf" else STAGE_INDEX,
+            "progress": {},
+            "hasil": None,
+            "error": None,
+            "created_at": _now(),
+            "updated_at": _now(),
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._save(job)
+        self._executor.submit(self._run, job_id)
+        return copy.deepcopy(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+    def list_jobs(self):
+        with self._lock:
+            return sorted((copy.deepcopy(j) for j in self._jobs.values()), key=lambda j: j["created_at"], reverse=True)
+
+    def resume_pending(self):
+        # Muat ulang job dari disk; yang terputus karena restart dijalankan lagi
+        resumed = 0
+        for name in sorted(os.listdir(self._jobs_dir)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self._jobs_dir, name), encoding="utf-8") as f:
+                    job = json.load(f)
+            except Exception as e:
+                logger.warning("⚠️ [JOB] File job %s rusak, dilewati: %s", name, e)
+                continue
+
+            with self._lock:
+                if job["id"] in self._jobs:
+                    continue
+                self._jobs[job["id"]] = job
+
+            if job["status"] in (STATUS_QUEUED, STATUS_RUNNING):
+                self._update(job["id"], status=STATUS_QUEUED)
+                self._executor.submit(self._run, job["id"])
+                resumed += 1
+
+        if resumed:
+            logger.info("🔁 [JOB] Melanjutkan %s job yang terputus", resumed)
+        self._prune()
+        return resumed
+
+    def _run(self, job_id):
+        job = self._update(job_id, status=STATUS_RUNNING, error=None)
+        progress = self._progress_callback(job_id)
+
+        try:
+            if job["jenis"] == "pdf":
+                documents = self._extract_stage(job, progress)
+                if not documents:
+                    raise RuntimeError("Gagal mengekstrak QnA dari PDF")
+
+                self._update(job_id, stage=STAGE_INDEX)
+                index = create_vector_index(
+                    documents, self._vector_store_provider(), self._embed_model_provider(), progress_callback=progress
+                )
+                hasil = {"jumlah_dokumen": len(documents)}
+            else:
+                # Job yang terputus melanjutkan dari checkpoint CSV terakhir
+                hasil = {}
+                index = create_vector_index_from_qa_csv(
+                    csv_path=job["file_path"],
+                    vector_store=self._vector_store_provider(),
+                    embed_model=self._embed_model_provider(),
+                    progress_callback=progress,
+                    stats=hasil
+                )
+
+            if index is None:
+                raise RuntimeError("Gagal membuat vector index ke Qdrant")
+
+            self._update(job_id, status=STATUS_DONE, stage=STAGE_DONE, hasil=hasil)
+            logger.info("✅ [JOB] %s selesai", job_id)
+
+            if self._on_complete:
+                self._on_complete()
+
+        except Exception as e:
+            logger.error("❌ [JOB] %s gagal: %s", job_id, e)
+            self._update(job_id, status=STATUS_FAILED, error=str(e))
+
+        self._prune()
+
+    def _extract_stage(self, job, progress):
+        documents_path = self._documents_path(job["id"])
+
+        # Ekstraksi sudah selesai sebelum restart: pakai hasil yang tersimpan
+        if job["stage"] != STAGE_EXTRACT and os.path.exists(documents_path):
+            with open(documents_path, encoding="utf-8") as f:
+                return [Document.from_dict(json.loads(line)) for line in f]
+
+        stats = {}
+        documents = extract_pdf_with_gemini(job["file_path"], progress_callback=progress, stats=stats)
+        for key, value in stats.items():
+            progress(key, value, stats["cache_hit"] + stats["cache_miss"])
+        with open(documents_path, "w", encoding="utf-8") as f:
+            for doc in documents:
+                f.write(json.dumps(doc.to_dict(), ensure_ascii=False) + "\n")
+        return documents
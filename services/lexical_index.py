@@ -0,0 +1,248 @@
+import os
+import re
+import json
+import math
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from services.node_sync import filter_payload
+from services.vector_backends import metadata_matches, iter_node_pages
+
+# Kosong = indeks leksikal dimatikan (retrieval kembali murni dense)
+LEXICAL_DB_PATH = os.getenv("LEXICAL_DB_PATH", "storage/lexical.sqlite3")
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+_STOPWORDS = {
+    "yang", "dan", "di", "ke", "dari", "pada", "untuk", "dengan", "dalam", "atau", "serta", "adalah",
+    "ini", "itu", "oleh", "sebagai", "juga", "telah", "akan", "tersebut", "berapa", "berapakah",
+    "apa", "apakah", "bagaimana", "jelaskan", "sebutkan", "tahun", "q", "a", "pt", "tbk", "persero",
+}
+# Partikel/akhiran yang tidak mengubah makna istilah ("labanya" -> "laba")
+_SUFFIXES = ("nya", "kah", "pun")
+# Singkatan umum di laporan keuangan bank; kueri singkatan juga mencari bentuk panjangnya
+_SYNONYMS = {
+    "eps": "laba per saham",
+    "dpk": "dana pihak ketiga",
+    "nim": "marjin bunga bersih",
+    "npl": "kredit bermasalah",
+    "car": "rasio kecukupan modal",
+    "roa": "imbal hasil aset",
+    "roe": "imbal hasil ekuitas",
+    "ldr": "rasio kredit terhadap dana pihak ketiga",
+    "bopo": "beban operasional pendapatan operasional",
+    "ckpn": "cadangan kerugian penurunan nilai",
+}
+
+
+def _normalize_token(token):
+    if token[0].isdigit():
+        # "1.234.567" dan "1234567" dianggap sama; koma desimal dipertahankan
+        return token.replace(".", "")
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            return token[: -len(suffix)]
+    return token
+
+
+def tokenize(text):
+    return [
+        _normalize_token(token)
+        for token in _TOKEN.findall((text or "").lower())
+        if token not in _STOPWORDS
+    ]
+
+
+def query_terms(text):
+    terms = tokenize(text)
+    for term in list(terms):
+        if term in _SYNONYMS:
+            terms.extend(tokenize(_SYNONYMS[term]))
+    return terms
+
+
+def lexical_text(text, metadata):
+    # Indeks Q&A CSV menyimpan pertanyaan di metadata; istilahnya ikut dicari
+    question = metadata.get("pertanyaan") or ""
+    return f"{question}\n{text}" if question else text
+
+
+# Indeks terbalik BM25 untuk istilah persis ("EPS", "beban bunga") yang sering
+# terlewat oleh pencarian dense. SQLite menyimpan teks dan metadata node;
+# posting list disusun ulang di memori saat start, dan diperbarui bertahap
+# setiap kali batch node diupsert ke vector store.
+class BM25Index:
+    def __init__(self, path=LEXICAL_DB_PATH, k1=BM25_K1, b=BM25_B):
+        self.k1, self.b = k1, b
+        self._lock = threading.RLock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lexical_docs ("
+            " node_id TEXT PRIMARY KEY,"
+            " source TEXT,"
+            " text TEXT NOT NULL,"
+            " metadata TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS lexical_source ON lexical_docs (source)")
+        self._conn.commit()
+
+        self._postings = defaultdict(dict)
+        self._docs = {}
+        self._total_length = 0
+        self._load()
+
+    def _load(self):
+        rows = self._conn.execute("SELECT node_id, text, metadata FROM lexical_docs").fetchall()
+        for node_id, text, metadata in rows:
+            self._index_doc(node_id, text, json.loads(metadata))
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, node_id):
+        return node_id in self._docs
+
+    def _index_doc(self, node_id, text, metadata):
+        counts = Counter(tokenize(lexical_text(text, metadata)))
+        for term, tf in counts.items():
+            self._postings[term][node_id] = tf
+        length = sum(counts.values())
+        self._docs[node_id] = (text, metadata, length, tuple(counts))
+        self._total_length += length
+
+    def _unindex_doc(self, node_id):
+        entry = self._docs.pop(node_id, None)
+        if entry is None:
+            return
+        _, _, length, terms = entry
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(node_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= length
+
+    def add(self, nodes):
+        rows = []
+        with self._lock:
+            for node in nodes:
+                metadata = {**filter_payload(node.metadata), **node.metadata}
+                self._unindex_doc(node.node_id)
+                self._index_doc(node.node_id, node.text, metadata)
+                rows.append((node.node_id, metadata.get("source"), node.text, json.dumps(metadata, ensure_ascii=False)))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO lexical_docs (node_id, source, text, metadata) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def delete(self, node_ids):
+        node_ids = list(node_ids or [])
+        if not node_ids:
+            return
+        with self._lock:
+            for node_id in node_ids:
+                self._unindex_doc(node_id)
+            self._conn.executemany("DELETE FROM lexical_docs WHERE node_id = ?", [(i,) for i in node_ids])
+            self._conn.commit()
+
+    def search(self, query, filters=None, top_k=10):
+        terms = Counter(query_terms(query))
+        with self._lock:
+            total = len(self._docs)
+            if not total or not terms:
+                return []
+            average_length = self._total_length / total
+
+            scores = defaultdict(float)
+            for term, query_tf in terms.items():
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for node_id, tf in postings.items():
+                    length = self._docs[node_id][2]
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[node_id] += query_tf * idf * tf * (self.k1 + 1) / norm
+
+            results = []
+            for node_id, score in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+                text, metadata, _, _ = self._docs[node_id]
+                if not metadata_matches(metadata, filters):
+                    continue
+                node = TextNode(id_=node_id, text=text, metadata=dict(metadata))
+                results.append(NodeWithScore(node=node, score=score))
+                if len(results) >= top_k:
+                    break
+            return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                "jumlah_dokumen": len(self._docs),
+                "jumlah_istilah": len(self._postings),
+                "rata_rata_panjang": round(self._total_length / len(self._docs), 1) if self._docs else 0.0,
+            }
+
+
+def rebuild_from_vector_store(lexical, vector_store, batch_size=1000):
+    # Untuk koleksi yang sudah terisi sebelum indeks leksikal ada
+    total = 0
+    for records in iter_node_pages(vector_store, page_size=batch_size, fields=["text", "metadata"]):
+        total += lexical.add([TextNode(id_=r["id"], text=r["text"] or "", metadata=r["metadata"]) for r in records])
+    return total
+
+
+_lexical_index = None
+_lexical_lock = threading.Lock()
+
+
+def get_lexical_index():
+    global _lexical_index
+    if not LEXICAL_DB_PATH:
+        return None
+    with _lexical_lock:
+        if _lexical_index is None:
+            _lexical_index = BM25Index(LEXICAL_DB_PATH)
+    return _lexical_index
+
+
+if __name__ == "__main__":
+    import argparse
+    from services.telemetry import configure_logging
+
+    configure_logging()
+
+    parser = argparse.ArgumentParser(description="Kelola indeks leksikal BM25")
+    parser.add_argument("command", choices=["stats", "rebuild", "search"])
+    parser.add_argument("--query", default="")
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    lexical = get_lexical_index()
+    if lexical is None:
+        raise SystemExit("LEXICAL_DB_PATH kosong: indeks leksikal dimatikan")
+    if args.command == "stats":
+        print(json.dumps(lexical.stats(), indent=2))
+    elif args.command == "rebuild":
+        from services.embedding_archive import get_embedding_archive
+
+        archive = get_embedding_archive()
+        if archive is not None:
+            total = sum(lexical.add(nodes) for nodes in archive.iter_nodes())
+        else:
+            from services.model_init import get_vector_store
+            total = rebuild_from_vector_store(lexical, get_vector_store())
+        print(f"✅ {total} node dimasukkan ke indeks leksikal")
+    else:
+        for n in lexical.search(args.query, top_k=args.top_k):
+            print(f"{n.score:.3f}  {n.node.metadata.get('bank')} {n.node.metadata.get('tahun')}  {n.node.text[:100]!r}")
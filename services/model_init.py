@@ -1,14 +1,13 @@
-import torch
 import os
+import time
+import logging
+import threading
 from dotenv import load_dotenv
 
-from llama_index.llms.groq import Groq
-from google import genai
-# from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llama_index.vector_stores.qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
-from llama_index.embeddings.voyageai import VoyageEmbedding
+from services.telemetry import observe_stage
+
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 VOYAGE_API = os.getenv("VOYAGE_API_KEY")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
@@ -17,32 +16,135 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 QDRANT_URL = os.getenv("QDRANT_URL")
-# EMBED_MODEL = os.getenv("EMBED_MODEL", "intfloat/multilingual-e5-small")
 COLLECTION_NAME = os.getenv("COLLECTION_NAME", "default-collection")
 
+# "stub" = provider lokal dari services/stubs.py: tanpa jaringan dan tanpa kredensial
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq")
+EMBED_PROVIDER = os.getenv("EMBED_PROVIDER", "voyage")
+EXTRACTOR_PROVIDER = os.getenv("EXTRACTOR_PROVIDER", "gemini")
+
+
+# Setiap client dibuat saat pertama kali dipakai, bukan saat modul diimpor.
+# Import SDK (Groq, Voyage, Gemini, qdrant_client) ada di dalam factory agar
+# startup dan modul yang hanya butuh sebagian provider tidak ikut menanggungnya.
+def _build_llm():
+    if LLM_PROVIDER == "stub":
+        from services.stubs import StubLLM
+        return StubLLM()
+    from llama_index.llms.groq import Groq
+    return Groq(model="deepseek-r1-distill-llama-70b", api_key=GROQ_API_KEY)
+
+
+def _build_embed_model():
+    from services.embedding_cache import CachedEmbedding
+
+    if EMBED_PROVIDER == "stub":
+        from services.stubs import HashEmbedding
+        inner = HashEmbedding()
+    else:
+        from llama_index.embeddings.voyageai import VoyageEmbedding
+        inner = VoyageEmbedding(voyage_api_key=VOYAGE_API, model_name="voyage-3-large")
+    # Semua pemakai (indexer, indexer CSV, retriever) lewat cache embedding
+    return CachedEmbedding(inner)
+
+
+def _build_qdrant_client():
+    from qdrant_client import QdrantClient
+    return QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY, timeout=1000.0)
+
+
+def _build_aqdrant_client():
+    # Client async dipakai jalur request (/chat, /search) agar tidak memblokir event loop
+    from qdrant_client import AsyncQdrantClient
+    return AsyncQdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY, timeout=1000.0)
+
+
+def _build_vector_store():
+    from services.vector_backends import VECTOR_BACKEND, create_vector_backend
+
+    # Qdrant dengan fallback lokal saat Qdrant tidak bisa dihubungi (VECTOR_BACKEND=local: tanpa Qdrant)
+    if VECTOR_BACKEND == "local":
+        return create_vector_backend(collection_name=COLLECTION_NAME)
+    return create_vector_backend(get_qdrant_client(), get_aqdrant_client(), COLLECTION_NAME)
+
+
+def _build_gemini_client():
+    if EXTRACTOR_PROVIDER == "stub":
+        from services.stubs import StubGeminiClient
+        return StubGeminiClient(latency=0.0)
+    from google import genai
+    return genai.Client(api_key=GEMINI_API_KEY)
+
+
+_FACTORIES = {
+    "llm": _build_llm,
+    "embed_model": _build_embed_model,
+    "qdrant_client": _build_qdrant_client,
+    "aqdrant_client": _build_aqdrant_client,
+    "vector_store": _build_vector_store,
+    "gemini_client": _build_gemini_client,
+}
+
+_providers = {}
+# RLock: factory vector_store memanggil get_provider untuk client Qdrant
+_providers_lock = threading.RLock()
+
+
+def get_provider(name):
+    provider = _providers.get(name)
+    if provider is not None:
+        return provider
+    with _providers_lock:
+        provider = _providers.get(name)
+        if provider is None:
+            start = time.perf_counter()
+            provider = _FACTORIES[name]()
+            elapsed = time.perf_counter() - start
+            _providers[name] = provider
+            observe_stage(f"init_{name}", elapsed)
+            logger.info("✅ Provider %s siap (%.2f detik)", name, elapsed)
+    return provider
+
+
+def set_provider(name, provider):
+    # Ganti provider (mis. stub di benchmark); berlaku untuk pemanggilan get_* berikutnya
+    if name not in _FACTORIES:
+        raise KeyError(f"Provider tidak dikenal: {name}")
+    with _providers_lock:
+        _providers[name] = provider
+
+
+def provider_status():
+    return {name: name in _providers for name in _FACTORIES}
+
+
+def get_llm():
+    return get_provider("llm")
+
+
+def get_embed_model():
+    return get_provider("embed_model")
+
+
+def get_qdrant_client():
+    return get_provider("qdrant_client")
+
+
+def get_aqdrant_client():
+    return get_provider("aqdrant_client")
 
-llm = Groq(model="deepseek-r1-distill-llama-70b", api_key=GROQ_API_KEY)
-embed_model = VoyageEmbedding(
-    voyage_api_key=VOYAGE_API,
-    model_name="voyage-3-large",
-)
 
-# embed_model = HuggingFaceEmbedding(
-#     model_name=EMBED_MODEL,
-#     device="cuda" if torch.cuda.is_available() else "cpu"
-# )
+def get_vector_store():
+    return get_provider("vector_store")
 
-qdrant_client = QdrantClient(
-    url=QDRANT_URL,
-    api_key=QDRANT_API_KEY,
-    timeout=1000.0 
-)
 
+def get_gemini_client():
+    return get_provider("gemini_client")
 
-vector_store = QdrantVectorStore(
-    client=qdrant_client,
-    collection_name=COLLECTION_NAME
-)
-gemini_client = genai.Client(api_key=GEMINI_API_KEY)
 
-print("✅ Model initialized")
+def __getattr__(name):
+    # Kompatibilitas: `from services.model_init import vector_store` tetap bisa,
+    # tetapi langsung membuat provider tersebut
+    if name in _FACTORIES:
+        return get_provider(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,49 @@
+import uuid
+import hashlib
+
+from services.banks import bank_id
+
+# Namespace tetap agar id node yang sama selalu dihasilkan di setiap upload
+NODE_ID_NAMESPACE = uuid.UUID("6f1c3a52-9a0e-4f43-b7de-2b8a0f6c1e55")
+
+
+def deterministic_node_id(source, page, text):
+    content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return str(uuid.uuid5(NODE_ID_NAMESPACE, f"{source}|{page if page is not None else ''}|{content_hash}"))
+
+
+def parse_year(value):
+    text = str(value or "").strip()
+    return int(text) if text.isdigit() else None
+
+
+def filter_payload(metadata):
+    # Field turunan untuk filter terindeks: id bank kanonik (keyword) dan tahun
+    # sebagai integer agar rentang tahun bisa difilter dengan range
+    payload = {}
+    if "bank" in metadata:
+        # Selalu diisi (boleh kosong) agar point yang sudah dimigrasi bisa dikenali
+        payload["bank_id"] = bank_id(metadata["bank"]) or ""
+    year = parse_year(metadata.get("tahun"))
+    if year is not None:
+        payload["tahun_int"] = year
+    return payload
+
+
+def existing_node_ids(vector_store, source):
+    # Setiap backend (Qdrant maupun lokal) menyediakan node_ids_where
+    return vector_store.node_ids_where("source", source)
+
+
+def delete_node_ids(vector_store, node_ids):
+    if node_ids:
+        vector_store.delete_nodes(node_ids=list(node_ids))
+
+
+def existing_ids_for_sources(vector_store, sources):
+    existing = set()
+    for source in sources:
+        if source:
+            existing |= existing_node_ids(vector_store, source)
+    return existing
+
@@ -0,0 +1,85 @@
+import json
+
+from llama_index.vector_stores.qdrant import QdrantVectorStore
+from qdrant_client.http.models import Filter, FieldCondition, MatchValue, PayloadSelectorExclude
+
+from services.vector_backends import cursor_offset, encode_cursor, project_node
+
+SCROLL_PAGE_SIZE = 1000
+NODE_CONTENT_KEY = "_node_content"
+# Field payload buatan llama-index yang bukan metadata dokumen
+INTERNAL_PAYLOAD_KEYS = {NODE_CONTENT_KEY, "_node_type", "doc_id", "document_id", "ref_doc_id"}
+
+
+# Selain antarmuka vector store llama-index, setiap backend menyediakan
+# node_ids_where(key, value) untuk diff upsert inkremental (services/node_sync.py),
+# serta scroll_nodes/count_nodes untuk menelusuri isi koleksi per halaman.
+class QdrantBackend(QdrantVectorStore):
+    @classmethod
+    def class_name(cls) -> str:
+        return "QdrantBackend"
+
+    def node_ids_where(self, key, value):
+        client = self.client
+        if not client.collection_exists(self.collection_name):
+            return set()
+
+        ids = set()
+        offset = None
+        scroll_filter = Filter(must=[FieldCondition(key=key, match=MatchValue(value=value))])
+        while True:
+            points, offset = client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=scroll_filter,
+                limit=SCROLL_PAGE_SIZE,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False
+            )
+            ids.update(str(point.id) for point in points)
+            if offset is None:
+                return ids
+
+    def _query_filter(self, filters):
+        if filters is None or not filters.filters:
+            return None
+        return self._build_subfilter(filters)
+
+    def scroll_nodes(self, filters=None, limit=100, cursor=None, fields=None):
+        offset = cursor_offset(cursor, "qdrant")
+        client = self.client
+        if not client.collection_exists(self.collection_name):
+            return [], None
+
+        # Teks hanya ada di _node_content (JSON seluruh node); tanpa "text" cukup
+        # ambil field metadata yang diminta dari payload datar
+        need_text = fields is None or "text" in fields
+        if need_text:
+            with_payload = True
+        elif "metadata" in fields:
+            with_payload = PayloadSelectorExclude(exclude=[NODE_CONTENT_KEY])
+        else:
+            with_payload = list(fields) or False
+
+        points, next_offset = client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=self._query_filter(filters),
+            limit=limit,
+            offset=offset,
+            with_payload=with_payload,
+            with_vectors=False,
+        )
+        records = []
+        for point in points:
+            payload = point.payload or {}
+            text = None
+            if need_text:
+                text = json.loads(payload.get(NODE_CONTENT_KEY) or "{}").get("text")
+            metadata = {k: v for k, v in payload.items() if k not in INTERNAL_PAYLOAD_KEYS}
+            records.append(project_node(str(point.id), text, metadata, fields))
+        return records, encode_cursor("qdrant", next_offset) if next_offset is not None else None
+
+    def count_nodes(self, filters=None):
+        if not self.client.collection_exists(self.collection_name):
+            return 0
+        return self.client.count(self.collection_name, count_filter=self._query_filter(filters), exact=True).count
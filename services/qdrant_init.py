@@ -1,9 +1,13 @@
-
 import os
+import logging
 from dotenv import load_dotenv
 
-from llama_index.vector_stores.qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient
+from qdrant_client.http import models as rest
+
+from services.node_sync import filter_payload
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
@@ -11,15 +15,163 @@ QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 QDRANT_URL = os.getenv("QDRANT_URL")
 
 COLLECTION_NAME = os.getenv("COLLECTION_NAME", "default-collection")
+# Dimensi voyage-3-large; hanya dipakai saat koleksi dibuat oleh alat ini
+EMBED_DIM = int(os.getenv("EMBED_DIM", "1024"))
+MIGRATION_BATCH_SIZE = int(os.getenv("QDRANT_MIGRATION_BATCH_SIZE", "512"))
+
+# Field payload yang dipakai filter retriever. Tanpa index, Qdrant memeriksa
+# payload setiap kandidat; dengan index, filter diselesaikan sebelum pencarian HNSW.
+PAYLOAD_INDEXES = [
+    {"field_name": "bank_id", "field_schema": rest.PayloadSchemaType.KEYWORD},
+    {"field_name": "tahun_int", "field_schema": rest.PayloadSchemaType.INTEGER},
+    {"field_name": "jenis_laporan", "field_schema": rest.PayloadSchemaType.KEYWORD},
+    {"field_name": "source", "field_schema": rest.PayloadSchemaType.KEYWORD},
+    # Field lama tetap diindeks untuk koleksi yang belum dimigrasi
+    {"field_name": "bank", "field_schema": rest.PayloadSchemaType.KEYWORD},
+    {"field_name": "tahun", "field_schema": rest.PayloadSchemaType.KEYWORD},
+]
+
+
+def qdrant_target(vector_store):
+    # (client, nama koleksi) untuk vector store berbasis Qdrant, None untuk backend lokal
+    client = getattr(vector_store, "client", None)
+    if client is None or not hasattr(client, "create_payload_index"):
+        return None
+    return client, vector_store.collection_name
+
+
+def ensure_collection(client, collection_name, dim=EMBED_DIM):
+    if client.collection_exists(collection_name):
+        return False
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=rest.VectorParams(size=dim, distance=rest.Distance.COSINE),
+    )
+    logger.info("🆕 Koleksi %s dibuat (dimensi %s)", collection_name, dim)
+    return True
+
+
+def ensure_payload_indexes(client, collection_name):
+    # Idempoten: index yang sudah ada dengan tipe sama dilewati
+    if not client.collection_exists(collection_name):
+        return []
+    schema = client.get_collection(collection_name).payload_schema or {}
+    created = []
+    for payload_index in PAYLOAD_INDEXES:
+        field_name = payload_index["field_name"]
+        if field_name in schema:
+            continue
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=payload_index["field_schema"],
+        )
+        created.append(field_name)
+    if created:
+        logger.info("🗂️ Payload index dibuat di %s: %s", collection_name, ', '.join(created))
+    return created
+
+
+def _unmigrated_filter():
+    # Point yang punya "bank" tetapi belum punya "bank_id"
+    return rest.Filter(
+        must=[rest.IsEmptyCondition(is_empty=rest.PayloadField(key="bank_id"))],
+        must_not=[rest.IsEmptyCondition(is_empty=rest.PayloadField(key="bank"))],
+    )
+
+
+def pending_migration_count(client, collection_name):
+    if not client.collection_exists(collection_name):
+        return 0
+    return client.count(collection_name, count_filter=_unmigrated_filter(), exact=True).count
+
+
+def backfill_payload(client, collection_name, batch_size=MIGRATION_BATCH_SIZE):
+    # Isi bank_id/tahun_int untuk point lama tanpa mengembed ulang. Point dengan
+    # payload turunan yang sama dikelompokkan agar satu set_payload per kelompok.
+    if not client.collection_exists(collection_name):
+        return 0
+    updated = 0
+    while True:
+        points, _ = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=_unmigrated_filter(),
+            limit=batch_size,
+            with_payload=["bank", "tahun"],
+            with_vectors=False,
+        )
+        if not points:
+            return updated
+
+        groups = {}
+        for point in points:
+            payload = filter_payload(point.payload or {})
+            key = tuple(sorted(payload.items()))
+            groups.setdefault(key, []).append(point.id)
+        for key, ids in groups.items():
+            client.set_payload(collection_name=collection_name, payload=dict(key), points=ids)
+        updated += len(points)
+        logger.info("🔁 %s point dimigrasi", updated)
+
+
+def ensure_schema(vector_store):
+    # Dipanggil setelah ingest: koleksi baru dibuat llama-index saat upsert pertama
+    target = qdrant_target(vector_store)
+    if target is None:
+        return []
+    try:
+        return ensure_payload_indexes(*target)
+    except Exception as e:
+        logger.warning("⚠️ Gagal memastikan payload index Qdrant: %s", e)
+        return []
+
+
+def canonical_filters_ready(vector_store):
+    # Backend lokal menurunkan bank_id/tahun_int sendiri; Qdrant harus sudah dimigrasi
+    target = qdrant_target(vector_store)
+    if target is None:
+        return True
+    try:
+        pending = pending_migration_count(*target)
+    except Exception as e:
+        logger.warning("⚠️ Tidak bisa memeriksa status migrasi payload Qdrant: %s", e)
+        return False
+    if pending:
+        logger.warning(
+            "⚠️ %s point belum punya bank_id/tahun_int; filter memakai field lama. "
+            "Jalankan: python -m services.qdrant_init migrate", pending
+        )
+    return pending == 0
+
 
+if __name__ == "__main__":
+    import argparse
+    import json
+    from services.telemetry import configure_logging
 
+    configure_logging()
 
-qdrant_client = QdrantClient(
-    url=QDRANT_URL,
-    api_key=QDRANT_API_KEY,
-)
+    parser = argparse.ArgumentParser(description="Bootstrap dan migrasi skema payload koleksi Qdrant")
+    parser.add_argument("command", choices=["bootstrap", "migrate", "status"])
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--dim", type=int, default=EMBED_DIM)
+    args = parser.parse_args()
 
-vector_store = QdrantVectorStore(
-    client=qdrant_client,
-    collection_name=COLLECTION_NAME
-)
\ No newline at end of file
+    client = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY, timeout=1000.0)
+    if args.command == "status":
+        exists = client.collection_exists(args.collection)
+        info = client.get_collection(args.collection) if exists else None
+        print(json.dumps({
+            "koleksi": args.collection,
+            "ada": exists,
+            "jumlah_point": info.points_count if info else 0,
+            "payload_index": sorted((info.payload_schema or {}).keys()) if info else [],
+            "belum_dimigrasi": pending_migration_count(client, args.collection),
+        }, indent=2))
+    else:
+        # bootstrap: koleksi + index; migrate: sama, lalu isi payload turunan point lama
+        ensure_collection(client, args.collection, args.dim)
+        ensure_payload_indexes(client, args.collection)
+        if args.command == "migrate":
+            print(f"✅ {backfill_payload(client, args.collection)} point dimigrasi")
+        print(f"✅ Koleksi {args.collection} siap")
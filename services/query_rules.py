@@ -0,0 +1,163 @@
+import os
+import re
+from itertools import product
+
+from services.banks import find_banks, bank_mentions, display_name
+
+# Di bawah ambang ini hasil aturan dianggap ragu dan analisis diserahkan ke LLM
+QUERY_RULES_MIN_CONFIDENCE = float(os.getenv("QUERY_RULES_MIN_CONFIDENCE", "0.75"))
+MAX_SUBQUERIES = int(os.getenv("QUERY_RULES_MAX_SUBQUERIES", "12"))
+
+GREETING_MESSAGE = (
+    "Halo! Silakan ajukan pertanyaan seputar laporan keuangan bank, "
+    "misalnya: Berapa laba bersih BCA tahun 2024?"
+)
+
+_GREETING = re.compile(
+    r"^\s*(halo|hallo|helo|hai|hi|hello|hey|pagi|siang|sore|malam|selamat\s+(pagi|siang|sore|malam|datang)|"
+    r"assalamu'?alaikum|terima\s*kasih|makasih|thanks|thank\s+you|apa\s+kabar|ok|oke|sip|test|tes)\b",
+    re.IGNORECASE,
+)
+_YEAR = re.compile(r"\b(19[5-9]\d|20\d{2})\b")
+_YEAR_RANGE = re.compile(
+    r"\b(19[5-9]\d|20\d{2})\s*(?:-|–|—|s\.?\s*d\.?|sampai(?:\s+dengan)?|hingga|ke)\s*(?:tahun\s+)?(19[5-9]\d|20\d{2})\b",
+    re.IGNORECASE,
+)
+_COMPARISON = re.compile(
+    r"\b(bandingkan|perbandingan|dibandingkan|dibanding|banding|vs\.?|versus|selisih|perbedaan|beda)\b",
+    re.IGNORECASE,
+)
+# "penurunan nilai" adalah nama akun (cadangan kerugian penurunan nilai), bukan tren
+_GROWTH = re.compile(
+    r"\b(pertumbuhan|tumbuh|naik|kenaikan|turun|penurunan(?!\s+nilai)|perubahan|yoy|year on year)\b",
+    re.IGNORECASE,
+)
+# Pertanyaan penjelasan/definisi ("Jelaskan mengapa ...", "Apa itu NPL?") tidak bisa
+# dipecah menjadi pencarian angka per bank/tahun; selalu diserahkan ke LLM
+_EXPLANATORY = re.compile(
+    r"\b(jelaskan|mengapa|kenapa|bagaimana|gimana|siapa|apa\s+(?:itu|yang\s+dimaksud)|apakah\s+itu)\b",
+    re.IGNORECASE,
+)
+# Kata tanya pembuka yang dipertahankan di query hasil tulis ulang
+_QUESTION_WORD = re.compile(r"\b(berapakah|berapa|apakah|apa|sebutkan|tampilkan|tunjukkan)\b", re.IGNORECASE)
+_FINANCIAL_TERMS = re.compile(
+    r"\b(laba|rugi|pendapatan|penghasilan|beban|biaya|aset|aktiva|liabilitas|kewajiban|ekuitas|modal|"
+    r"eps|per saham|kredit|pinjaman|dana pihak ketiga|dpk|giro|tabungan|deposito|bunga|nim|roa|roe|ldr|"
+    r"npl|car|bopo|dividen|pajak|kas|investasi|provisi|komisi|cadangan|kerugian|penyisihan|margin|rasio|"
+    r"utang|obligasi|saham|arus kas|syariah|operasional|neraca|surat berharga|penempatan|imbalan)\b",
+    re.IGNORECASE,
+)
+_STOPWORDS = {
+    "berapa", "berapakah", "apa", "apakah", "bagaimana", "gimana", "tolong", "coba", "jelaskan",
+    "mengapa", "kenapa", "siapa",
+    "sebutkan", "tampilkan", "tunjukkan", "informasi", "info", "mengenai", "tentang",
+    "bandingkan", "bandingin", "compare", "perbandingan", "dibandingkan", "dibanding", "banding", "vs", "versus", "antara",
+    "selisih", "perbedaan", "beda",
+    "dengan", "dan", "serta", "atau", "tahun", "thn", "pada", "di", "untuk", "dari", "sampai",
+    "hingga", "ke", "yang", "periode", "selama", "sd", "s", "d", "milik", "punya", "adalah", "itu",
+    "ini", "saja", "masing", "masing-masing", "bank", "pt", "tbk", "persero",
+}
+
+
+def _parse_years(text):
+    years = []
+    for start, end in _YEAR_RANGE.findall(text):
+        start, end = int(start), int(end)
+        if start <= end and end - start <= 10:
+            years.extend(str(y) for y in range(start, end + 1))
+    years.extend(_YEAR.findall(text))
+
+    ordered = []
+    for year in years:
+        if year not in ordered:
+            ordered.append(year)
+    return sorted(ordered)
+
+
+def extract_metric(text):
+    # Buang sebutan bank, tahun, kata tanya, dan kata sambung; sisanya topik metrik
+    for start, end in reversed(bank_mentions(text)):
+        text = text[:start] + " " + text[end:]
+    text = _YEAR_RANGE.sub(" ", text)
+    text = _YEAR.sub(" ", text)
+    text = _GROWTH.sub(" ", text)
+    words = re.findall(r"[a-zA-Z0-9]+(?:-[a-zA-Z0-9]+)*", text.lower())
+    return " ".join(w for w in words if w not in _STOPWORDS)
+
+
+def _question_word(text):
+    # Kata tanya milik pengguna; pernyataan tanpa kata tanya ("Total aset BRI 2024")
+    # adalah permintaan angka sehingga ditulis sebagai "Berapa ..."
+    match = _QUESTION_WORD.search(text)
+    return match.group(1).capitalize() if match else "Berapa"
+
+
+def _build_query(metric, bank, year, question_word="Berapa"):
+    parts = [f"{question_word} {metric}"]
+    if bank:
+        parts.append(display_name(bank))
+    if year:
+        parts.append(f"tahun {year}")
+    return " ".join(parts) + "?"
+
+
+def analyze_query_with_rules(query_user: str):
+    text = (query_user or "").strip()
+    banks = find_banks(text)
+    years = _parse_years(text)
+    has_financial_term = bool(_FINANCIAL_TERMS.search(text))
+
+    if _GREETING.search(text) and not banks and not years and not has_financial_term:
+        return {"num_queries": 0, "message": GREETING_MESSAGE, "confidence": 0.95, "source": "rules"}
+
+    metric = extract_metric(text)
+    if not metric:
+        return {"num_queries": 0, "confidence": 0.0, "source": "rules"}
+
+    is_comparison = bool(_COMPARISON.search(text))
+    is_growth = bool(_GROWTH.search(text))
+
+    # "Pertumbuhan laba BCA 2024" berarti dibandingkan dengan tahun sebelumnya
+    if is_growth and len(years) == 1:
+        years = [str(int(years[0]) - 1), years[0]]
+
+    question_word = _question_word(text)
+    combinations = list(product(banks or [None], years or [None]))
+    subqueries = [
+        (_build_query(metric, bank, year, question_word), {k: v for k, v in (("bank", bank), ("tahun", year)) if v})
+        for bank, year in combinations
+    ]
+
+    confidence = 0.5
+    if has_financial_term:
+        confidence += 0.25
+    if banks:
+        confidence += 0.15
+    if years:
+        confidence += 0.1
+    # Ada kata "bank" yang tidak cocok dengan alias mana pun: kemungkinan bank yang tidak dikenal
+    stripped = text
+    for start, end in reversed(bank_mentions(text)):
+        stripped = stripped[:start] + " " + stripped[end:]
+    if re.search(r"\bbank\b", stripped, re.IGNORECASE):
+        confidence -= 0.4
+    if (is_comparison or is_growth) and len(subqueries) < 2:
+        confidence -= 0.3
+    if len(subqueries) > MAX_SUBQUERIES:
+        confidence = 0.2
+    if _EXPLANATORY.search(text):
+        confidence = min(confidence, QUERY_RULES_MIN_CONFIDENCE - 0.25)
+
+    result = {
+        "num_queries": len(subqueries),
+        "query1": subqueries[0][0],
+        "filter1": subqueries[0][1],
+        "confidence": round(max(0.0, min(confidence, 1.0)), 2),
+        "source": "rules",
+    }
+    if len(subqueries) >= 2:
+        result["query2"] = subqueries[1][0]
+        result["filter2"] = subqueries[1][1]
+    if len(subqueries) > 2:
+        result["queries"] = [{"query": q, "filter": f} for q, f in subqueries]
+    return result
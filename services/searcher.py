@@ -1,14 +1,163 @@
+import os
+import re
+import asyncio
+import logging
+from datetime import date
 from llama_index.core.retrievers import VectorIndexRetriever
+from llama_index.core.schema import QueryBundle, NodeWithScore
 from llama_index.core.vector_stores.types import MetadataFilters, MetadataFilter, FilterOperator
+from services.banks import bank_id
+from services.node_sync import parse_year
+from services.lexical_index import get_lexical_index
+from services.telemetry import stage
+
+logger = logging.getLogger(__name__)
+
+SEARCH_TIMEOUT_SECONDS = float(os.getenv("SEARCH_TIMEOUT_SECONDS", "20"))
+# "auto" = filter lewat bank_id/tahun_int bila semua point Qdrant sudah dimigrasi
+# (diperiksa saat startup), "1" = selalu, "0" = selalu field lama bank/tahun
+CANONICAL_FILTERS = os.getenv("CANONICAL_FILTERS", "auto")
+# Batas bawah rentang tahun terbuka pada mode field lama (tahun disimpan sebagai string)
+LEGACY_MIN_YEAR = int(os.getenv("LEGACY_MIN_YEAR", "2000"))
+# Gabungkan hasil dense dengan BM25 lewat reciprocal-rank fusion
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") == "1"
+# Kandidat yang diambil dari tiap daftar (dense dan BM25) sebelum digabung jadi top-k
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+_canonical_filters = CANONICAL_FILTERS != "0"
+_YEAR_RANGE = re.compile(r"^\s*(\d{4})\s*(?:-|–|—|s/d|sampai|hingga)\s*(\d{4})\s*$", re.IGNORECASE)
+
+
+def set_canonical_filters(enabled: bool):
+    global _canonical_filters
+    _canonical_filters = bool(enabled)
+
+
+def canonical_filters_enabled() -> bool:
+    return _canonical_filters
+
+
+def _is_empty(value):
+    return value is None or (isinstance(value, str) and not value.strip()) or (isinstance(value, (list, tuple, set)) and not value)
+
+
+def _match(key, value):
+    if isinstance(value, (list, tuple, set)):
+        return MetadataFilter(key=key, value=list(value), operator=FilterOperator.IN)
+    return MetadataFilter(key=key, value=value, operator=FilterOperator.EQ)
+
+
+def _bank_filter(value):
+    if not _canonical_filters:
+        return _match("bank", value)
+    if isinstance(value, (list, tuple, set)):
+        return _match("bank_id", [bank_id(v) for v in value])
+    return _match("bank_id", bank_id(value))
+
+
+def _year_filters(value, start=None, end=None):
+    # Tahun tunggal, daftar tahun, rentang "2022-2024" atau tahun_mulai/tahun_akhir
+    years = None
+    if isinstance(value, (list, tuple, set)):
+        years = [y for y in (parse_year(v) for v in value) if y is not None]
+    elif not _is_empty(value):
+        match = _YEAR_RANGE.match(str(value))
+        if match:
+            start, end = start or match.group(1), end or match.group(2)
+        elif parse_year(value) is not None:
+            years = [parse_year(value)]
+        else:
+            return [_match("tahun", value)]  # mis. "0000" atau format tak dikenal
+    start, end = parse_year(start), parse_year(end)
+
+    if _canonical_filters:
+        filters = []
+        if years:
+            filters.append(_match("tahun_int", years if len(years) > 1 else years[0]))
+        if start is not None:
+            filters.append(MetadataFilter(key="tahun_int", value=start, operator=FilterOperator.GTE))
+        if end is not None:
+            filters.append(MetadataFilter(key="tahun_int", value=end, operator=FilterOperator.LTE))
+        return filters
+
+    # Field lama berupa string: rentang dijabarkan menjadi daftar tahun
+    if start is not None or end is not None:
+        span = range(start or LEGACY_MIN_YEAR, (end or date.today().year) + 1)
+        years = [y for y in span if not years or y in years]
+    if not years:
+        return []
+    return [_match("tahun", [str(y) for y in years] if len(years) > 1 else str(years[0]))]
+
 
 def build_metadata_filters(filter_dict: dict) -> MetadataFilters:
-    return MetadataFilters(
-        filters=[
-            MetadataFilter(key=k, value=v, operator=FilterOperator.EQ)
-            for k, v in filter_dict.items()
-        ]
+    filters = []
+    filter_dict = dict(filter_dict or {})
+    start, end = filter_dict.pop("tahun_mulai", None), filter_dict.pop("tahun_akhir", None)
+    if not _is_empty(filter_dict.get("tahun")) or not _is_empty(start) or not _is_empty(end):
+        filters.extend(_year_filters(filter_dict.get("tahun"), start, end))
+    filter_dict.pop("tahun", None)
+
+    for k, v in filter_dict.items():
+        if _is_empty(v):
+            continue  # filter tanpa nilai tidak membatasi hasil
+        filters.append(_bank_filter(v) if k == "bank" else _match(k, v))
+    return MetadataFilters(filters=filters)
+
+def build_retriever(index, filter_dict: dict = None, similarity_top_k: int = 3):
+    filters = build_metadata_filters(filter_dict) if filter_dict else None
+    if filters is not None and not filters.filters:
+        filters = None
+    return VectorIndexRetriever(
+        index=index,
+        similarity_top_k=similarity_top_k,
+        filters=filters
     )
 
+def fuse_rrf(result_lists, top_k, k=RRF_K):
+    # Skor = jumlah 1/(k + peringkat) di setiap daftar; node dari daftar pertama
+    # (dense) dipertahankan bila muncul di keduanya
+    scores, nodes = {}, {}
+    for results in result_lists:
+        for rank, n in enumerate(results):
+            node_id = n.node.node_id
+            scores[node_id] = scores.get(node_id, 0.0) + 1.0 / (k + rank + 1)
+            nodes.setdefault(node_id, n.node)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [NodeWithScore(node=nodes[node_id], score=scores[node_id]) for node_id in ranked]
+
+def hybrid_lexical_index():
+    if not HYBRID_SEARCH:
+        return None
+    lexical = get_lexical_index()
+    return lexical if lexical is not None and len(lexical) else None
+
+def lexical_search(lexical, query, filter_dict, top_k=HYBRID_CANDIDATES):
+    try:
+        with stage("pencarian_bm25"):
+            return lexical.search(query, build_metadata_filters(filter_dict), top_k)
+    except Exception as e:
+        logger.warning("⚠️ Pencarian BM25 gagal, hanya memakai hasil dense: %s", e)
+        return []
+
+def retrieve_hybrid(index, query, filter_dict, similarity_top_k):
+    lexical = hybrid_lexical_index()
+    dense_k = max(similarity_top_k, HYBRID_CANDIDATES) if lexical else similarity_top_k
+    with stage("pencarian_dense"):
+        dense = build_retriever(index, filter_dict, dense_k).retrieve(query)
+    if lexical is None:
+        return dense
+    return fuse_rrf([dense, lexical_search(lexical, query, filter_dict)], similarity_top_k)
+
+async def aembed_queries(embed_model, queries):
+    # Satu panggilan embedding untuk semua sub-query (Voyage menerima batch)
+    batch_embed = getattr(embed_model, "aget_query_embedding_batch", None)
+    if batch_embed is not None:
+        return await batch_embed(queries)
+    if hasattr(embed_model, "_aembed"):
+        return await embed_model._aembed(queries, input_type="query")
+    return await asyncio.gather(*(embed_model.aget_query_embedding(q) for q in queries))
+
 def similarity_search_dual(
     index,
     query1: str = None,
@@ -21,30 +170,97 @@ def similarity_search_dual(
 
     try:
         if query1:
-            filters1 = build_metadata_filters(filter1) if filter1 else None
-            retriever1 = VectorIndexRetriever(
-                index=index,
-                similarity_top_k=similarity_top_k,
-                filters=filters1
-            )
-            print(f"🔍 Query 1: {query1} | Filter: {filter1 or '❌ Tidak ada filter'}")
-            nodes1 = retriever1.retrieve(query1)
+            logger.debug("🔍 Query 1: %s | Filter: %s", query1, filter1 or "❌ Tidak ada filter")
+            nodes1 = retrieve_hybrid(index, query1, filter1, similarity_top_k)
         else:
-            print("⚠️ Query 1 kosong, dilewati.")
+            logger.debug("⚠️ Query 1 kosong, dilewati.")
 
         if query2:
-            filters2 = build_metadata_filters(filter2) if filter2 else None
-            retriever2 = VectorIndexRetriever(
-                index=index,
-                similarity_top_k=similarity_top_k,
-                filters=filters2
-            )
-            print(f"🔍 Query 2: {query2} | Filter: {filter2 or '❌ Tidak ada filter'}")
-            nodes2 = retriever2.retrieve(query2)
+            logger.debug("🔍 Query 2: %s | Filter: %s", query2, filter2 or "❌ Tidak ada filter")
+            nodes2 = retrieve_hybrid(index, query2, filter2, similarity_top_k)
         else:
-            print("⚠️ Query 2 kosong, dilewati.")
+            logger.debug("⚠️ Query 2 kosong, dilewati.")
 
     except Exception as e:
-        print(f"❌ Error in similarity_search_dual: {e}")
+        logger.error("❌ Error in similarity_search_dual: %s", e)
 
     return nodes1, nodes2
+
+async def similarity_search_dual_async(
+    index,
+    query1: str = None,
+    query2: str = None,
+    filter1: dict = None,
+    filter2: dict = None,
+    similarity_top_k: int = 3
+):
+    nodes1, nodes2 = await similarity_search_multi_async(
+        index=index,
+        queries=[query1, query2],
+        filters=[filter1, filter2],
+        similarity_top_k=similarity_top_k
+    )
+    return nodes1, nodes2
+
+async def similarity_search_multi_async(
+    index,
+    queries: list,
+    filters: list = None,
+    similarity_top_k: int = 3,
+    timeout: float = SEARCH_TIMEOUT_SECONDS,
+    embed_model=None
+):
+    filters = filters or [None] * len(queries)
+    results = [[] for _ in queries]
+    active = [i for i, q in enumerate(queries) if q]
+    if not active:
+        logger.warning("⚠️ Semua query kosong, dilewati.")
+        return results
+
+    embed_model = embed_model or index._embed_model
+    embeddings = [None] * len(queries)
+    try:
+        with stage("embedding_query"):
+            batch = await asyncio.wait_for(
+                aembed_queries(embed_model, [queries[i] for i in active]),
+                timeout
+            )
+        for i, emb in zip(active, batch):
+            embeddings[i] = emb
+    except Exception as e:
+        # Retriever akan menghitung embedding masing-masing query
+        logger.warning("⚠️ Batch embedding query gagal, fallback per query: %r", e)
+
+    lexical = hybrid_lexical_index()
+    dense_k = max(similarity_top_k, HYBRID_CANDIDATES) if lexical else similarity_top_k
+
+    async def search_one(i):
+        retriever = build_retriever(index, filters[i], dense_k)
+        logger.debug("🔍 Query %d: %s | Filter: %s", i + 1, queries[i], filters[i] or "❌ Tidak ada filter")
+        bundle = QueryBundle(query_str=queries[i], embedding=embeddings[i])
+        dense = []
+        try:
+            with stage("pencarian_dense"):
+                dense = await asyncio.wait_for(retriever.aretrieve(bundle), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("⏱️ Query %d melebihi batas waktu %s detik", i + 1, timeout)
+        except Exception as e:
+            logger.error("❌ Error pada query %d: %s", i + 1, e)
+        if lexical is None:
+            return dense
+        # BM25 tetap memberi hasil walau pencarian dense gagal atau timeout. Skoring
+        # BM25 murni Python (di bawah lock indeks), jadi dijalankan di thread agar
+        # tidak menahan event loop
+        sparse = []
+        try:
+            sparse = await asyncio.wait_for(
+                asyncio.to_thread(lexical_search, lexical, queries[i], filters[i]), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("⏱️ BM25 query %d melebihi batas waktu %s detik", i + 1, timeout)
+        return fuse_rrf([dense, sparse], similarity_top_k)
+
+    found = await asyncio.gather(*(search_one(i) for i in active))
+    for i, nodes in zip(active, found):
+        results[i] = nodes
+    return results
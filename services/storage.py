@@ -0,0 +1,183 @@
+import os
+import json
+import logging
+import sqlite3
+import threading
+
+from llama_index.core import StorageContext, VectorStoreIndex, load_index_from_storage
+from llama_index.core.storage.docstore.keyval_docstore import KVDocumentStore
+from llama_index.core.storage.index_store.keyval_index_store import KVIndexStore
+from llama_index.core.storage.kvstore.types import DEFAULT_COLLECTION, BaseKVStore
+
+logger = logging.getLogger(__name__)
+
+# Docstore dan index store llama-index (pengganti docstore.json/index_store.json)
+STORAGE_DB_PATH = os.getenv("STORAGE_DB_PATH", "storage/docstore.sqlite3")
+# Direktori layout JSON lama yang dimigrasikan sekali saat database masih kosong
+LEGACY_PERSIST_DIR = os.getenv("LEGACY_PERSIST_DIR", "storage")
+LEGACY_FILES = ("docstore.json", "index_store.json")
+
+_META_COLLECTION = "storage/meta"
+
+
+# Key-value store llama-index di atas SQLite (WAL). Setiap put/delete langsung
+# ditulis sebagai baris sendiri, jadi tidak ada lagi persist() yang menulis ulang
+# seluruh file; lookup per id memakai primary key (collection, key). Pembaca di
+# proses lain tetap bisa membaca selama penulisan berlangsung.
+class SQLiteKVStore(BaseKVStore):
+    def __init__(self, path=STORAGE_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " collection TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " PRIMARY KEY (collection, key)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def put(self, key, val, collection=DEFAULT_COLLECTION):
+        self.put_all([(key, val)], collection=collection)
+
+    async def aput(self, key, val, collection=DEFAULT_COLLECTION):
+        self.put(key, val, collection=collection)
+
+    def put_all(self, kv_pairs, collection=DEFAULT_COLLECTION, batch_size=1):
+        # batch_size dari antarmuka llama-index diabaikan: semua pasangan satu transaksi
+        rows = [(collection, key, json.dumps(val, ensure_ascii=False)) for key, val in kv_pairs]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO kv (collection, key, value) VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+
+    async def aput_all(self, kv_pairs, collection=DEFAULT_COLLECTION, batch_size=1):
+        self.put_all(kv_pairs, collection=collection, batch_size=batch_size)
+
+    def get(self, key, collection=DEFAULT_COLLECTION):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM kv WHERE collection = ? AND key = ?", (collection, key)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def aget(self, key, collection=DEFAULT_COLLECTION):
+        return self.get(key, collection=collection)
+
+    def get_all(self, collection=DEFAULT_COLLECTION):
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM kv WHERE collection = ?", (collection,)).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    async def aget_all(self, collection=DEFAULT_COLLECTION):
+        return self.get_all(collection=collection)
+
+    def delete(self, key, collection=DEFAULT_COLLECTION):
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM kv WHERE collection = ? AND key = ?", (collection, key))
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    async def adelete(self, key, collection=DEFAULT_COLLECTION):
+        return self.delete(key, collection=collection)
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM kv LIMIT 1").fetchone() is None
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT collection, COUNT(*) FROM kv GROUP BY collection").fetchall()
+        return {collection: count for collection, count in rows}
+
+
+def migrate_json_storage(kvstore, persist_dir=LEGACY_PERSIST_DIR):
+    # docstore.json dan index_store.json berisi {collection: {key: value}} milik
+    # SimpleKVStore, jadi bisa disalin apa adanya per collection. File JSON tidak
+    # dihapus; penanda di collection meta mencegah migrasi berulang.
+    if kvstore.get("json_migrated", collection=_META_COLLECTION):
+        return 0
+    migrated = 0
+    for name in LEGACY_FILES:
+        path = os.path.join(persist_dir, name)
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for collection, values in data.items():
+            kvstore.put_all(list(values.items()), collection=collection)
+            migrated += len(values)
+        logger.info("📦 %s dimigrasikan ke %s", path, kvstore.path)
+    kvstore.put("json_migrated", {"persist_dir": persist_dir, "entri": migrated}, collection=_META_COLLECTION)
+    return migrated
+
+
+_kvstore = None
+_kvstore_lock = threading.Lock()
+# Mencegah dua ingest bersamaan membuat dua index struct di index store
+_index_lock = threading.Lock()
+
+
+def get_kvstore():
+    global _kvstore
+    with _kvstore_lock:
+        if _kvstore is None:
+            kvstore = SQLiteKVStore(STORAGE_DB_PATH)
+            if kvstore.is_empty():
+                migrate_json_storage(kvstore)
+            _kvstore = kvstore
+    return _kvstore
+
+
+def get_storage_context(vector_store):
+    kvstore = get_kvstore()
+    return StorageContext.from_defaults(
+        docstore=KVDocumentStore(kvstore),
+        index_store=KVIndexStore(kvstore),
+        vector_store=vector_store,
+    )
+
+
+def load_index(vector_store, embed_model):
+    # ValueError dari llama-index bila index store belum berisi index
+    return load_index_from_storage(storage_context=get_storage_context(vector_store), embed_model=embed_model)
+
+
+def load_or_create_index(vector_store, embed_model):
+    # Dipanggil setelah ingest: node sudah ada di vector store, index hanya
+    # membungkusnya. Index struct yang sudah ada dipakai ulang agar index store
+    # selalu berisi tepat satu index.
+    with _index_lock:
+        storage_context = get_storage_context(vector_store)
+        structs = storage_context.index_store.index_structs()
+        if structs:
+            return load_index_from_storage(
+                storage_context=storage_context, index_id=structs[0].index_id, embed_model=embed_model
+            )
+        return VectorStoreIndex(nodes=[], storage_context=storage_context, embed_model=embed_model)
+
+
+if __name__ == "__main__":
+    import argparse
+    from services.telemetry import configure_logging
+
+    configure_logging()
+
+    parser = argparse.ArgumentParser(description="Kelola docstore/index store SQLite")
+    parser.add_argument("command", choices=["stats", "migrate"])
+    parser.add_argument("--persist-dir", default=LEGACY_PERSIST_DIR, help="Direktori docstore.json/index_store.json lama")
+    parser.add_argument("--force", action="store_true", help="Migrasi ulang walaupun sudah pernah dilakukan")
+    args = parser.parse_args()
+
+    kvstore = get_kvstore()
+    if args.command == "migrate":
+        if args.force:
+            kvstore.delete("json_migrated", collection=_META_COLLECTION)
+        print(f"✅ {migrate_json_storage(kvstore, args.persist_dir)} entri dimigrasikan ke {kvstore.path}")
+    print(json.dumps(kvstore.stats(), indent=2))
@@ -0,0 +1,116 @@
+import asyncio
+import hashlib
+import json
+import time
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse
+
+
+# Provider lokal tanpa jaringan dan tanpa kredensial: meniru latensi Groq/Gemini,
+# dipilih lewat LLM_PROVIDER/EXTRACTOR_PROVIDER/EMBED_PROVIDER=stub (lihat
+# services/model_init.py) dan dipakai benchmark.
+class StubLLM:
+    def __init__(self, analysis_latency=0.05, answer_latency=0.1):
+        self.analysis_latency = analysis_latency
+        self.answer_latency = answer_latency
+
+    def _respond(self, messages):
+        prompt = messages[-1].content
+        if "Pertanyaan user:" in prompt:
+            content = json.dumps({
+                "num_queries": 1,
+                "query1": "Berapa laba bersih PT Bank Central Asia Tbk tahun 2024?",
+                "filter1": {"bank": "PT BANK CENTRAL ASIA TBK", "tahun": "2024"},
+            })
+            return self.analysis_latency, content
+        content = "<think>stub</think>Laba bersih BCA tahun 2024 adalah 54.836.341 (dalam jutaan Rupiah)."
+        return self.answer_latency, content
+
+    def chat(self, messages, **kwargs):
+        latency, content = self._respond(messages)
+        time.sleep(latency)
+        return ChatResponse(message=ChatMessage(role="assistant", content=content))
+
+    async def achat(self, messages, **kwargs):
+        latency, content = self._respond(messages)
+        await asyncio.sleep(latency)
+        return ChatResponse(message=ChatMessage(role="assistant", content=content))
+
+    async def astream_chat(self, messages, **kwargs):
+        latency, content = self._respond(messages)
+        pieces = [content[i:i + 4] for i in range(0, len(content), 4)]
+
+        async def gen():
+            text = ""
+            for piece in pieces:
+                await asyncio.sleep(latency / len(pieces))
+                text += piece
+                yield ChatResponse(message=ChatMessage(role="assistant", content=text), delta=piece)
+
+        return gen()
+
+
+class _StubGeminiResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class _StubGeminiModels:
+    def __init__(self, latency, failure_rate):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._calls = 0
+
+    def generate_content(self, model, contents):
+        self._calls += 1
+        time.sleep(self.latency)
+        if self.failure_rate and self._calls % int(1 / self.failure_rate) == 0:
+            raise RuntimeError("stub: 429 RESOURCE_EXHAUSTED")
+        return _StubGeminiResponse(
+            "Q: Berapa laba bersih PT Bank Central Asia Tbk tahun 2024?\n"
+            "A: Laba bersih PT Bank Central Asia Tbk tahun 2024 adalah 54.836.341 (dalam jutaan Rupiah).\n"
+            "Q: Berapa beban bunga PT Bank Central Asia Tbk tahun 2024?\n"
+            "A: Beban bunga PT Bank Central Asia Tbk tahun 2024 adalah (12.137.180) (dalam jutaan Rupiah)."
+        )
+
+
+class StubGeminiClient:
+    # Meniru gemini_client.models.generate_content dengan latensi buatan
+    def __init__(self, latency=0.5, failure_rate=0.0):
+        self.models = _StubGeminiModels(latency, failure_rate)
+
+
+class HashEmbedding(BaseEmbedding):
+    # Embedding lokal deterministik: kata + trigram karakter di-hash ke vektor
+    # berdimensi tetap. Cukup bermakna untuk membandingkan konfigurasi retrieval
+    # tanpa memanggil Voyage, dan tanpa latensi jaringan.
+    model_name: str = "hash-embedding"
+    dim: int = 256
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HashEmbedding"
+
+    def _vector(self, text):
+        from services.lexical_index import tokenize
+
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in tokenize(text):
+            features = [word] + [word[i:i + 3] for i in range(max(1, len(word) - 2))]
+            for feature in features:
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _get_query_embedding(self, query):
+        return self._vector(query)
+
+    async def _aget_query_embedding(self, query):
+        return self._vector(query)
+
+    def _get_text_embedding(self, text):
+        return self._vector(text)
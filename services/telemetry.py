@@ -0,0 +1,222 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# DEBUG menampilkan prompt, cuplikan konteks dan hasil pencarian per request;
+# pada INFO (default) pesan-pesan itu bahkan tidak diformat
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Sertakan rincian waktu per tahap di setiap respons /chat dan /search tanpa perlu diminta
+RESPONSE_TIMING = os.getenv("RESPONSE_TIMING", "0") == "1"
+
+# Batas bucket (detik) mengikuti default klien Prometheus, diperpanjang untuk LLM/ekstraksi
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+
+def configure_logging(level=LOG_LEVEL):
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # Log per request HTTP dari klien Qdrant/Voyage terlalu ramai di level INFO
+    logging.getLogger("httpx").setLevel(max(logging.WARNING, logging.getLogger().level))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self):
+        with self._lock:
+            return {key: {**s, "counts": list(s["counts"])} for key, s in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.samples().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series["counts"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram("rag_stage_seconds", "Durasi tiap tahap pipeline RAG", ("stage",))
+STAGE_ERRORS = REGISTRY.counter("rag_stage_errors_total", "Tahap yang berakhir dengan exception", ("stage",))
+STAGE_TOKENS = REGISTRY.histogram(
+    "rag_stage_tokens", "Jumlah token per tahap (prompt, konteks, jawaban)", ("stage", "jenis"), TOKEN_BUCKETS
+)
+CACHE_EVENTS = REGISTRY.counter("rag_cache_total", "Hit/miss cache per jenis cache", ("cache", "hasil"))
+REQUESTS = REGISTRY.counter("rag_requests_total", "Request per endpoint dan sumber jawaban", ("endpoint", "sumber"))
+REQUEST_SECONDS = REGISTRY.histogram("rag_request_seconds", "Durasi total request per endpoint", ("endpoint",))
+
+
+# Rekaman satu request. Disimpan di ContextVar sehingga ikut ke task asyncio
+# dan run_in_threadpool tanpa perlu dioper sebagai argumen ke setiap fungsi.
+class Trace:
+    def __init__(self):
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages = []
+        self.tokens = {}
+        self.cache = {}
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            self.stages.append({"tahap": name, "ms": round(seconds * 1000, 2)})
+
+    def add_tokens(self, stage, kind, count):
+        with self._lock:
+            key = f"{stage}.{kind}"
+            self.tokens[key] = self.tokens.get(key, 0) + count
+
+    def add_cache(self, cache, result, count):
+        with self._lock:
+            per_cache = self.cache.setdefault(cache, {})
+            per_cache[result] = per_cache.get(result, 0) + count
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def summary(self):
+        with self._lock:
+            return {
+                "total_ms": round(self.elapsed() * 1000, 2),
+                "tahap": list(self.stages),
+                "token": dict(self.tokens),
+                "cache": {name: dict(results) for name, results in self.cache.items()},
+            }
+
+
+_current_trace = contextvars.ContextVar("rag_trace", default=None)
+
+
+def start_trace():
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def observe_stage(name, seconds):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_stage(name, seconds)
+
+
+@contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+def record_tokens(stage_name, kind, count):
+    if count is None:
+        return
+    STAGE_TOKENS.observe(count, stage=stage_name, jenis=kind)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_tokens(stage_name, kind, count)
+
+
+def record_cache(cache, result, count=1):
+    if not count:
+        return
+    CACHE_EVENTS.inc(count, cache=cache, hasil=result)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_cache(cache, result, count)
+
+
+def finish_request(endpoint, source):
+    # Dipanggil sekali per request, tepat sebelum respons (atau event "done") dikirim
+    REQUESTS.inc(endpoint=endpoint, sumber=source)
+    trace = _current_trace.get()
+    if trace is not None:
+        REQUEST_SECONDS.observe(trace.elapsed(), endpoint=endpoint)
+        return trace.summary()
+    return None
+
+
+def render_metrics():
+    return REGISTRY.render()
@@ -0,0 +1,643 @@
+import os
+import json
+import base64
+import logging
+import time
+import threading
+from typing import Any, List, Optional
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode, TextNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+
+from services.node_sync import filter_payload
+
+logger = logging.getLogger(__name__)
+
+# "qdrant" = Qdrant dengan fallback lokal saat Qdrant gagal, "local" = tanpa Qdrant sama sekali
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant")
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", "storage/local_vectors")
+# Di bawah jumlah ini pencarian brute-force sudah cukup cepat dan selalu eksak
+LOCAL_VECTOR_IVF_MIN_POINTS = int(os.getenv("LOCAL_VECTOR_IVF_MIN_POINTS", "100000"))
+LOCAL_VECTOR_IVF_NPROBE = int(os.getenv("LOCAL_VECTOR_IVF_NPROBE", "16"))
+# Bila filter metadata menyisakan kandidat sebanyak ini atau kurang, IVF dilewati (hasil eksak)
+LOCAL_VECTOR_EXACT_MAX = int(os.getenv("LOCAL_VECTOR_EXACT_MAX", "50000"))
+# Setelah Qdrant gagal, jeda sebelum mencoba Qdrant lagi
+VECTOR_FAILOVER_RETRY_SECONDS = float(os.getenv("VECTOR_FAILOVER_RETRY_SECONDS", "30"))
+
+# Metadata yang dipakai filter retriever; masing-masing punya bitmap per nilai
+BITMAP_KEYS = ("bank", "tahun", "bank_id", "tahun_int", "source", "jenis_laporan")
+
+
+def _compare(operator, actual, expected):
+    if operator == FilterOperator.EQ:
+        return actual == expected
+    if operator == FilterOperator.NE:
+        return actual != expected
+    if operator == FilterOperator.IN:
+        return actual in expected
+    if operator == FilterOperator.NIN:
+        return actual not in expected
+    try:
+        actual, expected = float(actual), float(expected)
+    except (TypeError, ValueError):
+        return False
+    if operator == FilterOperator.GT:
+        return actual > expected
+    if operator == FilterOperator.GTE:
+        return actual >= expected
+    if operator == FilterOperator.LT:
+        return actual < expected
+    if operator == FilterOperator.LTE:
+        return actual <= expected
+    raise ValueError(f"Operator filter {operator} belum didukung backend lokal")
+
+
+def _normalize_filter_value(value):
+    if isinstance(value, (list, tuple, set)):
+        return {str(v) for v in value}
+    return str(value)
+
+
+def metadata_matches(metadata, filters):
+    # Evaluasi MetadataFilters pada satu dict metadata (dipakai indeks leksikal)
+    if filters is None or not filters.filters:
+        return True
+    results = []
+    for item in filters.filters:
+        if isinstance(item, MetadataFilters):
+            results.append(metadata_matches(metadata, item))
+            continue
+        if item.value is None:
+            continue
+        results.append(_compare(
+            item.operator, _normalize_filter_value(metadata.get(item.key)), _normalize_filter_value(item.value)
+        ))
+    if not results:
+        return True
+    return any(results) if filters.condition == FilterCondition.OR else all(results)
+
+
+# Cursor scroll bersifat opak bagi klien: nama backend + offset milik backend itu
+# (nomor baris untuk backend lokal, id point berikutnya untuk Qdrant).
+def encode_cursor(backend, offset):
+    raw = json.dumps({"b": backend, "o": offset}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    # (backend, offset); (None, None) untuk halaman pertama
+    if not cursor:
+        return None, None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return data["b"], data["o"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Cursor tidak valid")
+
+
+def cursor_offset(cursor, backend):
+    kind, offset = decode_cursor(cursor)
+    if kind is not None and kind != backend:
+        raise ValueError(f"Cursor milik backend {kind}, bukan {backend}")
+    return offset
+
+
+def project_node(node_id, text, metadata, fields=None):
+    # fields None = bentuk lengkap; selain "text"/"metadata", nama field dibaca dari metadata
+    if fields is None:
+        return {"id": node_id, "text": text, "metadata": metadata}
+    record = {"id": node_id}
+    for field in fields:
+        if field == "text":
+            record["text"] = text
+        elif field == "metadata":
+            record["metadata"] = metadata
+        else:
+            record[field] = metadata.get(field)
+    return record
+
+
+def iter_node_pages(vector_store, filters=None, page_size=500, fields=None, cursor=None):
+    # Seluruh isi vector store per halaman; memori tetap sebesar satu halaman
+    while True:
+        records, cursor = vector_store.scroll_nodes(filters=filters, limit=page_size, cursor=cursor, fields=fields)
+        if records:
+            yield records
+        if cursor is None:
+            return
+
+
+# Vector store di dalam proses: matriks float32 ternormalisasi, top-k brute-force
+# (atau IVF untuk koleksi besar), dan pre-filter metadata lewat bitmap per nilai.
+# Bisa dibangun dari arsip embedding sehingga tidak perlu mengembed ulang.
+class LocalVectorStore(BasePydanticVectorStore):
+    stores_text: bool = True
+    is_embedding_query: bool = True
+
+    _lock: Any = PrivateAttr()
+    _matrix: Any = PrivateAttr()
+    _alive: Any = PrivateAttr()
+    _count: int = PrivateAttr()
+    _ids: list = PrivateAttr()
+    _row_of: dict = PrivateAttr()
+    _texts: list = PrivateAttr()
+    _metadata: list = PrivateAttr()
+    _bitmaps: dict = PrivateAttr()
+    _ivf: Any = PrivateAttr()
+    _archive: Any = PrivateAttr()
+
+    def __init__(self, archive=None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._lock = threading.RLock()
+        self._matrix = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._count = 0
+        self._ids, self._texts, self._metadata = [], [], []
+        self._row_of = {}
+        self._bitmaps = {}
+        self._ivf = None
+        self._archive = archive
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LocalVectorStore"
+
+    @classmethod
+    def from_archive(cls, archive, persist=False):
+        # persist=True: penambahan/hapus berikutnya ikut ditulis ke arsip yang sama
+        store = cls(archive=archive if persist else None)
+        if archive is not None:
+            vectors = archive.vectors()
+            records = archive.records()
+            if records:
+                rows = np.asarray([r["row"] for r in records])
+                store._append(
+                    [r["id"] for r in records],
+                    [r["text"] for r in records],
+                    [r["metadata"] for r in records],
+                    np.asarray(vectors[rows], dtype=np.float32),
+                )
+            logger.info("📂 Backend lokal memuat %s node dari arsip %s", len(records), archive.directory)
+        return store
+
+    @property
+    def client(self) -> Any:
+        return None
+
+    def __len__(self):
+        return int(self._alive[:self._count].sum())
+
+    def _ensure_capacity(self, extra, dim):
+        needed = self._count + extra
+        capacity = 0 if self._matrix is None else self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        matrix = np.zeros((new_capacity, dim), dtype=np.float32)
+        alive = np.zeros(new_capacity, dtype=bool)
+        if self._matrix is not None:
+            matrix[:self._count] = self._matrix[:self._count]
+            alive[:self._count] = self._alive[:self._count]
+        self._matrix, self._alive = matrix, alive
+        for key, bitmap in self._bitmaps.items():
+            grown = np.zeros(new_capacity, dtype=bool)
+            grown[:len(bitmap)] = bitmap
+            self._bitmaps[key] = grown
+
+    def _append(self, ids, texts, metadatas, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            self._ensure_capacity(len(ids), vectors.shape[1])
+            for node_id in ids:
+                # Upsert: baris lama untuk id yang sama dimatikan
+                old = self._row_of.get(node_id)
+                if old is not None:
+                    self._alive[old] = False
+
+            start = self._count
+            end = start + len(ids)
+            self._matrix[start:end] = vectors
+            self._alive[start:end] = True
+            for offset, (node_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+                row = start + offset
+                # Node lama (mis. dari arsip) belum punya bank_id/tahun_int
+                metadata = {**filter_payload(metadata or {}), **(metadata or {})}
+                self._ids.append(node_id)
+                self._texts.append(text)
+                self._metadata.append(metadata or {})
+                self._row_of[node_id] = row
+                for key in BITMAP_KEYS:
+                    value = (metadata or {}).get(key)
+                    if value is None:
+                        continue
+                    bitmap = self._bitmaps.get((key, str(value)))
+                    if bitmap is None:
+                        bitmap = self._bitmaps[(key, str(value))] = np.zeros(self._matrix.shape[0], dtype=bool)
+                    bitmap[row] = True
+            self._count = end
+
+            if self._ivf is not None:
+                self._ivf_assign(start, end)
+            elif len(self) >= LOCAL_VECTOR_IVF_MIN_POINTS:
+                self.build_ivf()
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        self._append(
+            [node.node_id for node in nodes],
+            [node.get_content() for node in nodes],
+            [node.metadata for node in nodes],
+            [node.get_embedding() for node in nodes],
+        )
+        if self._archive is not None:
+            self._archive.append(nodes)
+        return [node.node_id for node in nodes]
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None, **kwargs: Any) -> None:
+        with self._lock:
+            rows = [self._row_of.pop(node_id) for node_id in node_ids or [] if node_id in self._row_of]
+            if filters is not None:
+                mask = self._filter_mask(filters)
+                rows.extend(np.flatnonzero(mask).tolist())
+                for row in rows:
+                    self._row_of.pop(self._ids[row], None)
+            self._alive[rows] = False
+        if self._archive is not None:
+            self._archive.delete([self._ids[row] for row in rows])
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        with self._lock:
+            rows = [
+                row for row in range(self._count)
+                if self._alive[row] and self._metadata[row].get("ref_doc_id", self._metadata[row].get("doc_id")) == ref_doc_id
+            ]
+        self.delete_nodes([self._ids[row] for row in rows])
+
+    def clear(self) -> None:
+        self.delete_nodes(list(self._row_of))
+
+    def node_ids_where(self, key, value):
+        with self._lock:
+            if key in BITMAP_KEYS:
+                bitmap = self._bitmaps.get((key, str(value)))
+                if bitmap is None:
+                    return set()
+                rows = np.flatnonzero(bitmap[:self._count] & self._alive[:self._count])
+            else:
+                rows = [r for r in range(self._count) if self._alive[r] and self._metadata[r].get(key) == value]
+            return {self._ids[row] for row in rows}
+
+    def _node(self, row, embedding=False):
+        return TextNode(
+            id_=self._ids[row],
+            text=self._texts[row],
+            metadata=dict(self._metadata[row]),
+            embedding=self._matrix[row].tolist() if embedding else None,
+        )
+
+    def get_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None, **kwargs: Any) -> List[BaseNode]:
+        with self._lock:
+            if node_ids is not None:
+                rows = [self._row_of[node_id] for node_id in node_ids if node_id in self._row_of]
+            else:
+                mask = self._filter_mask(filters) if filters else self._alive[:self._count]
+                rows = np.flatnonzero(mask).tolist()
+            return [self._node(row) for row in rows]
+
+    def scroll_nodes(self, filters: Optional[MetadataFilters] = None, limit: int = 100, cursor=None, fields=None):
+        # Baris baru selalu ditambahkan di akhir, jadi nomor baris aman dipakai sebagai cursor
+        start = cursor_offset(cursor, "lokal") or 0
+        with self._lock:
+            mask = self._filter_mask(filters) if filters else self._alive[:self._count]
+            rows = np.flatnonzero(mask[start:])[:limit + 1] + start
+            records = [
+                project_node(self._ids[row], self._texts[row], dict(self._metadata[row]), fields)
+                for row in rows[:limit]
+            ]
+        next_cursor = encode_cursor("lokal", int(rows[limit])) if len(rows) > limit else None
+        return records, next_cursor
+
+    def count_nodes(self, filters: Optional[MetadataFilters] = None):
+        with self._lock:
+            mask = self._filter_mask(filters) if filters else self._alive[:self._count]
+            return int(mask.sum())
+
+    def _bitmap_for(self, key, operator, value):
+        # Gabungan bitmap semua nilai yang memenuhi operator; tanpa menyentuh baris satu per satu
+        mask = np.zeros(self._count, dtype=bool)
+        for (bitmap_key, bitmap_value), bitmap in self._bitmaps.items():
+            if bitmap_key == key and _compare(operator, bitmap_value, value):
+                mask |= bitmap[:self._count]
+        if operator in (FilterOperator.NE, FilterOperator.NIN):
+            # Baris tanpa metadata ini juga lolos NE/NIN
+            has_key = np.zeros(self._count, dtype=bool)
+            for (bitmap_key, _), bitmap in self._bitmaps.items():
+                if bitmap_key == key:
+                    has_key |= bitmap[:self._count]
+            mask |= ~has_key
+        return mask
+
+    def _filter_mask(self, filters):
+        alive = self._alive[:self._count].copy()
+        if filters is None or not filters.filters:
+            return alive
+
+        masks = []
+        for item in filters.filters:
+            if isinstance(item, MetadataFilters):
+                masks.append(self._filter_mask(item))
+                continue
+            if item.value is None:
+                continue  # filter tanpa nilai tidak membatasi hasil
+            value = _normalize_filter_value(item.value)
+            if item.key in BITMAP_KEYS:
+                masks.append(self._bitmap_for(item.key, item.operator, value))
+            else:
+                masks.append(np.fromiter(
+                    (_compare(item.operator, _normalize_filter_value(m.get(item.key)), value) for m in self._metadata[:self._count]),
+                    dtype=bool, count=self._count,
+                ))
+        if not masks:
+            return alive
+
+        if filters.condition == FilterCondition.OR:
+            combined = np.logical_or.reduce(masks)
+        else:
+            combined = np.logical_and.reduce(masks)
+        return alive & combined
+
+    def build_ivf(self, nlist=None, iterations=8, seed=0):
+        # IVF sederhana: k-means pada vektor ternormalisasi, tiap baris masuk satu list
+        with self._lock:
+            rows = np.flatnonzero(self._alive[:self._count])
+            if len(rows) == 0:
+                self._ivf = None
+                return
+            nlist = nlist or max(1, int(np.sqrt(len(rows))))
+            rng = np.random.default_rng(seed)
+            data = self._matrix[rows]
+            centroids = data[rng.choice(len(rows), size=min(nlist, len(rows)), replace=False)].copy()
+            for _ in range(iterations):
+                assignment = np.argmax(data @ centroids.T, axis=1)
+                for c in range(len(centroids)):
+                    members = data[assignment == c]
+                    if len(members):
+                        centroid = members.mean(axis=0)
+                        centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+            assignment_all = np.full(self._matrix.shape[0], -1, dtype=np.int32)
+            assignment_all[rows] = np.argmax(data @ centroids.T, axis=1)
+            self._ivf = {"centroids": centroids, "assignment": assignment_all}
+            logger.info("🧭 IVF lokal dibangun: %s list untuk %s vektor", len(centroids), len(rows))
+
+    def _ivf_assign(self, start, end):
+        assignment = self._ivf["assignment"]
+        if len(assignment) < self._matrix.shape[0]:
+            grown = np.full(self._matrix.shape[0], -1, dtype=np.int32)
+            grown[:len(assignment)] = assignment
+            self._ivf["assignment"] = assignment = grown
+        assignment[start:end] = np.argmax(self._matrix[start:end] @ self._ivf["centroids"].T, axis=1)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.query_embedding is None or self._count == 0:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+
+        vector = np.asarray(query.query_embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        top_k = query.similarity_top_k or 1
+
+        with self._lock:
+            mask = self._filter_mask(query.filters)
+            if query.node_ids:
+                allowed = np.zeros(self._count, dtype=bool)
+                allowed[[self._row_of[i] for i in query.node_ids if i in self._row_of]] = True
+                mask &= allowed
+
+            rows = np.flatnonzero(mask)
+            if self._ivf is not None and len(rows) > LOCAL_VECTOR_EXACT_MAX:
+                # Hanya list dengan centroid terdekat yang diperiksa
+                probes = np.argsort(-(self._ivf["centroids"] @ vector))[:LOCAL_VECTOR_IVF_NPROBE]
+                probed = rows[np.isin(self._ivf["assignment"][rows], probes)]
+                if len(probed) >= top_k:
+                    rows = probed
+            if len(rows) == 0:
+                return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+            scores = self._matrix[rows] @ vector
+            k = min(top_k, len(rows))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+            nodes = [self._node(rows[i]) for i in best]
+
+        return VectorStoreQueryResult(
+            nodes=nodes,
+            similarities=[float(scores[i]) for i in best],
+            ids=[node.node_id for node in nodes],
+        )
+
+    async def aquery(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        return self.query(query, **kwargs)
+
+
+# Qdrant sebagai backend utama; bila query ke Qdrant gagal, pencarian dilayani
+# backend lokal (dibangun dari arsip embedding) sampai Qdrant bisa dicoba lagi.
+# Penulisan tetap hanya ke Qdrant agar ingest gagal dengan jelas saat Qdrant mati.
+class FailoverVectorStore(BasePydanticVectorStore):
+    stores_text: bool = True
+    is_embedding_query: bool = True
+
+    _primary: Any = PrivateAttr()
+    _fallback_factory: Any = PrivateAttr()
+    _fallback: Any = PrivateAttr()
+    _fallback_loaded: bool = PrivateAttr()
+    _fallback_lock: Any = PrivateAttr()
+    _retry_at: float = PrivateAttr()
+    _failures: int = PrivateAttr()
+
+    def __init__(self, primary, fallback_factory, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._primary = primary
+        self._fallback_factory = fallback_factory
+        self._fallback = None
+        self._fallback_loaded = False
+        self._fallback_lock = threading.Lock()
+        self._retry_at = 0.0
+        self._failures = 0
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "FailoverVectorStore"
+
+    @property
+    def primary(self):
+        return self._primary
+
+    @property
+    def client(self) -> Any:
+        return self._primary.client
+
+    @property
+    def collection_name(self):
+        return self._primary.collection_name
+
+    def _get_fallback(self):
+        # None bila tidak ada arsip berisi data; dimuat sekali saja
+        with self._fallback_lock:
+            if not self._fallback_loaded:
+                self._fallback = self._fallback_factory()
+                self._fallback_loaded = True
+        return self._fallback
+
+    def _fallback_or_raise(self, error):
+        # Tanpa fallback berisi data, gangguan Qdrant harus terlihat sebagai error,
+        # bukan hasil kosong. Selama jeda retry Qdrant tetap dicoba (error=None).
+        fallback = self._get_fallback()
+        if fallback is None and error is not None:
+            raise error
+        return fallback
+
+    def _primary_available(self):
+        return time.monotonic() >= self._retry_at
+
+    def _mark_failed(self, error):
+        self._failures += 1
+        self._retry_at = time.monotonic() + VECTOR_FAILOVER_RETRY_SECONDS
+        logger.warning("⚠️ Qdrant gagal (%s); dicoba lagi dalam %.0f detik", error, VECTOR_FAILOVER_RETRY_SECONDS)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        error = None
+        if self._primary_available():
+            try:
+                return self._primary.query(query, **kwargs)
+            except Exception as e:
+                self._mark_failed(e)
+                error = e
+        fallback = self._fallback_or_raise(error)
+        if fallback is None:
+            return self._primary.query(query, **kwargs)
+        return fallback.query(query, **kwargs)
+
+    async def aquery(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        error = None
+        if self._primary_available():
+            try:
+                return await self._primary.aquery(query, **kwargs)
+            except Exception as e:
+                self._mark_failed(e)
+                error = e
+        fallback = self._fallback_or_raise(error)
+        if fallback is None:
+            return await self._primary.aquery(query, **kwargs)
+        return await fallback.aquery(query, **kwargs)
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        return self._primary.add(nodes, **add_kwargs)
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self._primary.delete(ref_doc_id, **delete_kwargs)
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None, **kwargs: Any) -> None:
+        self._primary.delete_nodes(node_ids=node_ids, filters=filters, **kwargs)
+
+    def get_nodes(self, node_ids: Optional[List[str]] = None, filters: Optional[MetadataFilters] = None, **kwargs: Any) -> List[BaseNode]:
+        error = None
+        if self._primary_available():
+            try:
+                return self._primary.get_nodes(node_ids=node_ids, filters=filters, **kwargs)
+            except Exception as e:
+                self._mark_failed(e)
+                error = e
+        fallback = self._fallback_or_raise(error)
+        if fallback is None:
+            return self._primary.get_nodes(node_ids=node_ids, filters=filters, **kwargs)
+        return fallback.get_nodes(node_ids=node_ids, filters=filters, **kwargs)
+
+    def scroll_nodes(self, filters: Optional[MetadataFilters] = None, limit: int = 100, cursor=None, fields=None):
+        backend, _ = decode_cursor(cursor)
+        if backend == "lokal" and self._get_fallback() is not None:
+            return self._get_fallback().scroll_nodes(filters=filters, limit=limit, cursor=cursor, fields=fields)
+        error = None
+        if backend == "qdrant" or self._primary_available():
+            try:
+                return self._primary.scroll_nodes(filters=filters, limit=limit, cursor=cursor, fields=fields)
+            except Exception as e:
+                self._mark_failed(e)
+                if backend is not None:
+                    raise  # posisi cursor Qdrant tidak berlaku di backend lokal
+                error = e
+        fallback = self._fallback_or_raise(error)
+        if fallback is None:
+            return self._primary.scroll_nodes(filters=filters, limit=limit, fields=fields)
+        return fallback.scroll_nodes(filters=filters, limit=limit, fields=fields)
+
+    def count_nodes(self, filters: Optional[MetadataFilters] = None):
+        error = None
+        if self._primary_available():
+            try:
+                return self._primary.count_nodes(filters)
+            except Exception as e:
+                self._mark_failed(e)
+                error = e
+        fallback = self._fallback_or_raise(error)
+        if fallback is None:
+            return self._primary.count_nodes(filters)
+        return fallback.count_nodes(filters)
+
+    def clear(self) -> None:
+        self._primary.clear()
+
+    def node_ids_where(self, key, value):
+        return self._primary.node_ids_where(key, value)
+
+    def status(self):
+        return {
+            "backend": "qdrant",
+            "mode_darurat": not self._primary_available(),
+            "jumlah_gagal": self._failures,
+            "fallback_dimuat": self._fallback is not None,
+            "fallback_node": len(self._fallback) if self._fallback is not None else None,
+        }
+
+
+def create_vector_backend(qdrant_client=None, aqdrant_client=None, collection_name=None):
+    from services.embedding_archive import EmbeddingArchive, get_embedding_archive
+
+    if VECTOR_BACKEND == "local":
+        logger.info("💾 Memakai backend vektor lokal di %s", LOCAL_VECTOR_DIR)
+        return LocalVectorStore.from_archive(EmbeddingArchive(LOCAL_VECTOR_DIR), persist=True)
+
+    # Diimpor di sini agar backend lokal tidak memuat qdrant_client saat startup
+    from services.qdrant_backend import QdrantBackend
+    from services.qdrant_init import PAYLOAD_INDEXES
+
+    # Payload index ikut dibuat saat koleksi baru dibuat oleh upsert pertama
+    primary = QdrantBackend(
+        client=qdrant_client, aclient=aqdrant_client, collection_name=collection_name,
+        payload_indexes=PAYLOAD_INDEXES,
+    )
+
+    def fallback_factory():
+        # Backend lokal darurat hanya berguna bila arsip embedding berisi data;
+        # tanpa itu error Qdrant diteruskan ke pemanggil
+        archive = get_embedding_archive()
+        if archive is None:
+            logger.error("❌ EMBEDDING_ARCHIVE_DIR tidak diset: tidak ada backend lokal darurat, error Qdrant diteruskan")
+            return None
+        store = LocalVectorStore.from_archive(archive)
+        if not len(store):
+            logger.error("❌ Arsip embedding %s kosong: tidak ada backend lokal darurat, error Qdrant diteruskan", archive.directory)
+            return None
+        return store
+
+    return FailoverVectorStore(primary, fallback_factory)
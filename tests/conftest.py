@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+# Provider stub + backend lokal: tanpa jaringan dan tanpa kredensial. Semua path
+# storage/, cache/ dan jobs/ relatif terhadap cwd, jadi tes berjalan di direktori
+# sementara dan tidak menyentuh data aplikasi. Harus diset sebelum modul services
+# diimpor karena konfigurasi dibaca saat import.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="rag-tests-"))
+os.environ.update({
+    "LLM_PROVIDER": "stub",
+    "EMBED_PROVIDER": "stub",
+    "EXTRACTOR_PROVIDER": "stub",
+    "VECTOR_BACKEND": "local",
+    "LOG_LEVEL": "WARNING",
+})
@@ -0,0 +1,42 @@
+import asyncio
+import json
+
+import httpx
+
+from benchmarks.bench_startup import seed
+
+QUERY = "Jelaskan kinerja BCA tahun 2024"
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+async def chat_then_stream():
+    import main
+
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            chat = (await client.post("/chat", json={"query": QUERY})).json()
+            stream = await client.post("/chat/stream", json={"query": QUERY})
+    return chat, parse_sse(stream.text)
+
+
+def test_stream_cache_hit_after_chat_has_no_think_block():
+    seed()
+    chat, events = asyncio.run(chat_then_stream())
+
+    assert chat["sumber"] == "rag"
+    assert "<think>" not in chat["jawaban"]
+    assert "<think>" not in chat["history"][-1]["content"]
+
+    tokens = "".join(data["text"] for name, data in events if name == "token")
+    [done] = [data for name, data in events if name == "done"]
+    assert done["sumber"] == "cache"
+    assert tokens == done["jawaban"] == chat["jawaban"]
+    assert "<think>" not in tokens
@@ -0,0 +1,58 @@
+import pytest
+
+from services.facts import FactStore, fact_from_qna, parse_indonesian_number
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Titik pemisah ribuan, koma desimal
+    ("1.234,5", (1234.5, "")),
+    ("Laba bersih adalah 93.991.349 (dalam jutaan Rupiah).", (93991349.0, "jutaan Rupiah")),
+    # Kurung akuntansi dan tanda minus berarti negatif
+    ("(1.234)", (-1234.0, "")),
+    ("-1.234", (-1234.0, "")),
+    ("Rp 1,2 triliun", (1.2, "triliun")),
+    ("Laba bersih adalah Rp 1,2 triliun.", (1.2, "triliun")),
+    ("Rp 500", (500.0, "Rupiah")),
+    ("Rasio NPL sebesar 2,5 persen", (2.5, "%")),
+    # Tanggal dan tahun bukan nilai metrik
+    ("31 Desember 2024", (None, None)),
+    ("per 31/12/2023", (None, None)),
+    ("tahun 2024", (None, None)),
+    ("Laba per 31 Desember 2024 adalah 54.851 (dalam jutaan Rupiah).", (54851.0, "jutaan Rupiah")),
+    # "1.234" selalu ribuan, bukan 1,234
+    ("1.234", (1234.0, "")),
+    # Beberapa angka tanpa penanda nilai utama: ambigu
+    ("Aset 1.234 dan liabilitas 5.678", (None, None)),
+    ("Rasio NPL 2,5% dan CAR 25,1%", (None, None)),
+    # Penanda "adalah/menjadi" memilih angka utama
+    ("NPL adalah 2,5% sedangkan CAR 25,1%", (2.5, "%")),
+    ("Nilai 5 meningkat menjadi 7 triliun", (7.0, "triliun")),
+    ("", (None, None)),
+])
+def test_parse_indonesian_number(text, expected):
+    assert parse_indonesian_number(text) == expected
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FactStore(str(tmp_path / "facts.sqlite3"))
+    store.replace_source("qa.csv", [
+        fact_from_qna("Berapa laba bersih BCA tahun 2024?", "Laba bersih adalah 54.851 (dalam jutaan Rupiah).", "BCA", "2024", "qa.csv"),
+        fact_from_qna("Berapa laba bersih Mandiri tahun 2024?", "Laba bersih adalah 55.783 (dalam jutaan Rupiah).", "Mandiri", "2024", "qa.csv"),
+        fact_from_qna("Berapa total aset BCA tahun 2024?", "Total aset adalah 1.449.301 (dalam jutaan Rupiah).", "BCA", "2024", "qa.csv"),
+    ])
+    return store
+
+
+def test_lookup_resolves_metric_within_bank(store):
+    fact = store.lookup("PT Bank Central Asia Tbk", "laba bersih", "2024")
+    assert fact["value"] == 54851.0
+    assert store.lookup("bank mandiri", "laba bersih", 2024)["value"] == 55783.0
+    assert store.lookup("BCA", "aset", "2024")["value"] == 1449301.0
+    assert store.lookup("BCA", "laba bersih", "2023") is None
+    assert store.lookup("BNI", "laba bersih", "2024") is None
+
+
+def test_stats_and_all_facts(store):
+    assert store.stats() == {"jumlah_fakta": 3, "jumlah_kunci": 3}
+    assert len(store.all_facts()) == 3
@@ -0,0 +1,38 @@
+from llama_index.core.schema import TextNode
+
+from services.ingest_pipeline import IngestPipeline
+
+
+class RecordingEmbedding:
+    def __init__(self):
+        self.texts = []
+
+    def get_text_embedding_batch(self, texts):
+        self.texts.extend(texts)
+        return [[0.0, 1.0] for _ in texts]
+
+
+class RecordingVectorStore:
+    def __init__(self):
+        self.nodes = []
+
+    def add(self, nodes):
+        self.nodes.extend(nodes)
+
+
+def test_embeds_text_with_embeddable_metadata():
+    node = TextNode(
+        text="Laba bersih tahun 2024 adalah 54.851 miliar.",
+        metadata={"bank": "PT BANK CENTRAL ASIA TBK", "tahun": "2024", "bank_id": "BBCA"},
+        excluded_embed_metadata_keys=["bank_id"],
+    )
+    embed_model, vector_store = RecordingEmbedding(), RecordingVectorStore()
+
+    assert IngestPipeline(vector_store, embed_model, batch_size=1).run([node]) == 1
+
+    [sent] = embed_model.texts
+    assert "Laba bersih tahun 2024" in sent
+    assert "bank: PT BANK CENTRAL ASIA TBK" in sent
+    assert "tahun: 2024" in sent
+    assert "BBCA" not in sent
+    assert vector_store.nodes == [node]
@@ -0,0 +1,48 @@
+import csv
+
+from llama_index.core.schema import MetadataMode
+
+from services.create_vector_index_from_qa_csv import build_qa_node, create_vector_index_from_qa_csv, normalize_row
+from services.model_init import get_vector_store
+from services.stubs import HashEmbedding
+
+
+class RecordingEmbedding(HashEmbedding):
+    texts: list = []
+
+    def get_text_embedding_batch(self, texts, **kwargs):
+        self.texts.extend(texts)
+        return super().get_text_embedding_batch(texts, **kwargs)
+
+
+def test_question_is_part_of_embedded_content():
+    node = build_qa_node("qa.csv", *normalize_row({
+        "Pertanyaan": "Berapa laba bersih BCA tahun 2024?",
+        "Jawaban": "Laba bersih adalah 54.851 miliar.",
+        "Bank": "bca",
+        "Tahun": "2024.0",
+    }))
+
+    content = node.get_content(metadata_mode=MetadataMode.EMBED)
+    assert "Berapa laba bersih BCA tahun 2024?" in content
+    assert "Laba bersih adalah 54.851 miliar." in content
+    assert "PT BANK CENTRAL ASIA TBK" in content
+    assert "qa.csv" not in content
+    assert "BBCA" not in content
+
+
+def test_csv_ingest_sends_question_to_embed_model(tmp_path):
+    path = tmp_path / "qa_embed.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Pertanyaan", "Jawaban", "Bank", "Tahun"])
+        writer.writerow(["Berapa total aset Mandiri tahun 2023?", "Total aset adalah 2.174 triliun.", "Mandiri", "2023"])
+
+    embed_model = RecordingEmbedding(texts=[])
+    stats = {}
+    assert create_vector_index_from_qa_csv(str(path), get_vector_store(), embed_model, stats=stats) is not None
+
+    assert stats["node_baru"] == 1
+    [sent] = embed_model.texts
+    assert "Berapa total aset Mandiri tahun 2023?" in sent
+    assert "Total aset adalah 2.174 triliun." in sent
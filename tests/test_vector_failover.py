@@ -0,0 +1,63 @@
+import pytest
+from llama_index.core.schema import TextNode
+from llama_index.core.vector_stores.types import VectorStoreQuery
+
+import services.embedding_archive as embedding_archive
+import services.qdrant_backend as qdrant_backend
+import services.vector_backends as vector_backends
+
+
+class QdrantDown:
+    def __init__(self, **kwargs):
+        self.calls = 0
+
+    def query(self, query, **kwargs):
+        self.calls += 1
+        raise ConnectionError("Qdrant tidak bisa dihubungi")
+
+
+@pytest.fixture
+def qdrant_down(monkeypatch):
+    monkeypatch.setattr(vector_backends, "VECTOR_BACKEND", "qdrant")
+    monkeypatch.setattr(qdrant_backend, "QdrantBackend", QdrantDown)
+
+
+def query():
+    return VectorStoreQuery(query_embedding=[1.0, 0.0], similarity_top_k=1)
+
+
+def test_outage_without_archive_raises_primary_error(qdrant_down, monkeypatch):
+    monkeypatch.setattr(embedding_archive, "EMBEDDING_ARCHIVE_DIR", "")
+    store = vector_backends.create_vector_backend()
+
+    with pytest.raises(ConnectionError):
+        store.query(query())
+    # Selama jeda retry Qdrant tetap dicoba, bukan diganti hasil kosong
+    with pytest.raises(ConnectionError):
+        store.query(query())
+    assert store.primary.calls == 2
+    assert store.status()["fallback_node"] is None
+
+
+def test_outage_with_empty_archive_raises_primary_error(qdrant_down, monkeypatch, tmp_path):
+    monkeypatch.setattr(embedding_archive, "EMBEDDING_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(embedding_archive, "_archive", None)
+    store = vector_backends.create_vector_backend()
+
+    with pytest.raises(ConnectionError):
+        store.query(query())
+
+
+def test_outage_with_populated_archive_uses_local_backend(qdrant_down, monkeypatch, tmp_path):
+    monkeypatch.setattr(embedding_archive, "EMBEDDING_ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(embedding_archive, "_archive", None)
+    embedding_archive.get_embedding_archive().append([
+        TextNode(id_="a", text="Laba bersih BCA 2024", embedding=[1.0, 0.0]),
+        TextNode(id_="b", text="Total aset BCA 2024", embedding=[0.0, 1.0]),
+    ])
+    store = vector_backends.create_vector_backend()
+
+    result = store.query(query())
+    assert result.ids == ["a"]
+    assert store.status()["mode_darurat"] is True
+    assert store.status()["fallback_node"] == 2